@@ -0,0 +1,152 @@
+"""
+    Event loop stalls and throughput of asyncio clients using Database directly or through the AsyncDatabase facade.
+
+    --clients coroutines each send --requests requests from the --mix (view, reserve, info) on one event loop, while a
+    heartbeat task asks to wake up every millisecond and records how late it wakes up: calling Database from the
+    coroutines blocks the loop for every query and every ticket rendered, the facade runs them on its threads and
+    process pool. The throughput, the p50/p99 latency of the requests and the p99/max lateness of the heartbeat are
+    printed, then a query slower than --timeout is interrupted to show the timeouts.
+
+    Usage: python -m benchmarks.async_database_benchmark --clients 1000 --requests 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import pathlib
+import random
+import tempfile
+import time
+
+from typing import Awaitable, Callable
+
+from benchmarks.common import create_scratch_database, future_timestamp, percentile
+from benchmarks.load_generator import parse_mix
+from database.async_database import AsyncDatabase
+from database.database import Database
+from user.user import User
+
+DEFAULT_MIX: str = 'view=6,reserve=2,info=2'
+
+
+async def heartbeat(lateness: list[float], stop: asyncio.Event):
+    """
+        Wake up every millisecond and record how late every wake up is
+        :return: None
+    """
+    while not stop.is_set():
+        start: float = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lateness.append(time.perf_counter() - start - 0.001)
+
+
+async def client(call: Callable[[str, User, int], Awaitable], user: User, requests: int, mix: dict[str, float],
+                 events: int, generator: random.Random, latencies: list[float]):
+    actions: list[str] = list(mix)
+    weights: list[float] = list(mix.values())
+    for _ in range(requests):
+        start: float = time.perf_counter()
+        await call(generator.choices(actions, weights)[0], user, generator.randint(1, events))
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(call: Callable[[str, User, int], Awaitable], clients: int, users: list[User], requests: int,
+              mix: dict[str, float], events: int) -> tuple[float, list[float], list[float]]:
+    """
+        :return: seconds taken, latencies of the requests, lateness of the heartbeat
+    """
+    latencies: list[float] = []
+    lateness: list[float] = []
+    stop: asyncio.Event = asyncio.Event()
+    beat: asyncio.Task = asyncio.create_task(heartbeat(lateness=lateness, stop=stop))
+    start: float = time.perf_counter()
+    await asyncio.gather(*(
+        client(call=call, user=users[index % len(users)], requests=requests, mix=mix, events=events,
+               generator=random.Random(index), latencies=latencies)
+        for index in range(clients)
+    ))
+    elapsed: float = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, latencies, lateness
+
+
+async def main_async(arguments: argparse.Namespace, database_path: pathlib.Path, users: list[User]):
+    database: Database = Database(database_path=database_path)
+
+    async def direct(action: str, user: User, event: int):
+        # what a front end calling Database from its coroutines does, every call blocks the loop
+        match action:
+            case 'view':
+                return database.view_events()
+            case 'reserve':
+                return database.make_reservation(user=user, event=event, seats=1)
+            case 'info':
+                return database.get_user_info(user=user)
+
+    facade: AsyncDatabase = AsyncDatabase(database_path=database_path, threads=arguments.threads)
+
+    async def through_facade(action: str, user: User, event: int):
+        match action:
+            case 'view':
+                return await facade.view_events()
+            case 'reserve':
+                return await facade.make_reservation(user=user, event=event, seats=1)
+            case 'info':
+                return await facade.get_user_info(user=user)
+
+    for name, call in (('Database in the loop', direct), ('AsyncDatabase', through_facade)):
+        elapsed, latencies, lateness = await run(
+            call=call, clients=arguments.clients, users=users, requests=arguments.requests, mix=arguments.mix, events=arguments.events
+        )
+        print('{:<21} {:7.1f} requests/second  p50 {:8.2f} ms  p99 {:8.2f} ms  loop late p99 {:8.2f} ms  max {:8.2f} ms'.format(
+            name, len(latencies) / elapsed, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000,
+            percentile(lateness, 99) * 1000, max(lateness, default=0.0) * 1000
+        ))
+
+    # a query running longer than the timeout is interrupted, the thread is free again right after
+    slow_query: str = "WITH RECURSIVE counter(n) AS (SELECT 1 UNION ALL SELECT n+1 FROM counter) SELECT count(*) FROM counter"
+    start: float = time.perf_counter()
+    try:
+        await facade.run(lambda database: database.database.execute(slow_query).fetchone(), timeout=arguments.timeout)
+    except asyncio.TimeoutError:
+        pass
+    interrupted: float = time.perf_counter() - start
+    await facade.view_events()
+    print('slow query interrupted after {:.1f} ms, next call answered after {:.1f} ms'.format(
+        interrupted * 1000, (time.perf_counter() - start) * 1000
+    ))
+    database.close()
+    facade.close()
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='AsyncDatabase benchmark')
+    parser.add_argument('--clients', type=int, default=1000, help='concurrent client coroutines')
+    parser.add_argument('--requests', type=int, default=5, help='requests of every client')
+    parser.add_argument('--users', type=int, default=50, help='registered users the clients are')
+    parser.add_argument('--events', type=int, default=20, help='number of events')
+    parser.add_argument('--threads', type=int, default=4, help='database threads of the facade')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help='action weights, default {}'.format(DEFAULT_MIX))
+    parser.add_argument('--timeout', type=float, default=0.05, help='seconds after which the slow query is interrupted')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Async event {}'.format(event), future_timestamp(), 10.0, 100000) for event in range(arguments.events)]
+        )
+        os.chdir(directory)  # tickets are generated in the scratch directory
+        database: Database = Database(database_path=database_path)
+        users: list[User] = [User(user='async{}@example.com'.format(index), password='async') for index in range(arguments.users)]
+        for user in users:
+            database.register_user(user=user)
+        database.close()
+        asyncio.run(main_async(arguments=arguments, database_path=database_path, users=users))
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+    Cost of reading the seats available from the memory-mapped availability snapshot instead of SQLite.
+
+    A scratch database gets --events events. The seats left for an event are looked up --lookups times the way a new
+    process does it (open SQLite or map the snapshot, read, close) and the way a process already running does it, then
+    the view of all the events and a page of the listing are read from SQL and from the snapshot. The last lines are
+    what the writers pay: writing the seats of a reservation in place, and publishing the snapshot again.
+
+    Usage: python -m benchmarks.availability_snapshot_benchmark --events 10000 --lookups 20000
+"""
+import argparse
+import datetime
+import logging
+import os
+import pathlib
+import sqlite3
+import tempfile
+import time
+
+from typing import Callable
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.availability_snapshot import AvailabilitySnapshot, SnapshotWriter, publish_snapshot, snapshot_path
+from database.event_filter import EventFilter
+from event.event import EVENT_COLUMNS
+
+
+def sql_seats(connection: sqlite3.Connection, event_id: int) -> int | None:
+    row: tuple | None = connection.execute(
+        "SELECT seats_available FROM events WHERE id=? AND date>?", (event_id, datetime.datetime.now().timestamp())
+    ).fetchone()
+    return row[0] if row else None
+
+
+def sql_view(connection: sqlite3.Connection) -> list[dict]:
+    return [
+        {event_id: {'name': name, 'date': date, 'price': price, 'seats_available': seats_available}}
+        for event_id, name, date, price, seats_available in connection.execute(
+            "SELECT {} FROM events WHERE date>? AND seats_available>0 ORDER BY date, id".format(EVENT_COLUMNS),
+            (datetime.datetime.now().timestamp(), )
+        )
+    ]
+
+
+def sql_page(connection: sqlite3.Connection, page_size: int) -> list[tuple]:
+    return connection.execute(
+        "SELECT {} FROM events WHERE (date, id)>(?, ?) AND seats_available>=1 ORDER BY date, id LIMIT ?".format(EVENT_COLUMNS),
+        (datetime.datetime.now().timestamp(), 0, page_size)
+    ).fetchall()
+
+
+def cold_sql(database_path: pathlib.Path, event_id: int) -> int | None:
+    connection: sqlite3.Connection = sqlite3.connect(database_path)
+    seats: int | None = sql_seats(connection=connection, event_id=event_id)
+    connection.close()
+    return seats
+
+
+def cold_snapshot(database_path: pathlib.Path, event_id: int) -> int | None:
+    snapshot: AvailabilitySnapshot = AvailabilitySnapshot(database_path=database_path)
+    snapshot.refresh()
+    seats: int | None = snapshot.seats_available(event_id=event_id)
+    snapshot.close()
+    return seats
+
+
+def warm_snapshot(snapshot: AvailabilitySnapshot, event_id: int) -> int | None:
+    snapshot.refresh()
+    return snapshot.seats_available(event_id=event_id)
+
+
+def per_call(call: Callable[[int], object], calls: int) -> float:
+    """
+        :param call: callable taking the index of the call
+        :return: microseconds per call
+    """
+    start: float = time.perf_counter()
+    for index in range(calls):
+        call(index)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Availability snapshot benchmark')
+    parser.add_argument('--events', type=int, default=10000, help='upcoming events in the database')
+    parser.add_argument('--lookups', type=int, default=20000, help='seat lookups of every reader')
+    parser.add_argument('--views', type=int, default=20, help='views of all the events and pages of the listing')
+    parser.add_argument('--page-size', type=int, default=50, help='events of a page of the listing')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Snapshot event {}'.format(event), future_timestamp() + event, 10.0, 100) for event in range(arguments.events)]
+        )
+        connection: sqlite3.Connection = sqlite3.connect(database_path)
+        publish_snapshot(connection=connection, path=snapshot_path(database_path=database_path))
+        snapshot: AvailabilitySnapshot = AvailabilitySnapshot(database_path=database_path)
+        snapshot.refresh()
+        event: Callable[[int], int] = lambda index: 1 + index * 7919 % arguments.events
+
+        lookups: list[tuple[str, Callable[[int], object]]] = [
+            ('seats, new connection', lambda index: cold_sql(database_path=database_path, event_id=event(index))),
+            ('seats, new mapping', lambda index: cold_snapshot(database_path=database_path, event_id=event(index))),
+            ('seats, open connection', lambda index: sql_seats(connection=connection, event_id=event(index))),
+            ('seats, mapped snapshot', lambda index: warm_snapshot(snapshot=snapshot, event_id=event(index))),
+        ]
+        for name, call in lookups:
+            print('{:<24} {:10.2f} us/lookup'.format(name, per_call(call=call, calls=arguments.lookups)))
+        listings: list[tuple[str, Callable[[int], object]]] = [
+            ('view, SQL', lambda _: sql_view(connection=connection)),
+            ('view, snapshot', lambda _: snapshot.refresh() and snapshot.view()),
+            ('page, SQL', lambda _: sql_page(connection=connection, page_size=arguments.page_size)),
+            ('page, snapshot', lambda _: snapshot.refresh() and snapshot.page(after=None, page_size=arguments.page_size, event_filter=EventFilter())),
+        ]
+        for name, call in listings:
+            print('{:<24} {:10.2f} ms/read'.format(name, per_call(call=call, calls=arguments.views) / 1000))
+
+        writer: SnapshotWriter = SnapshotWriter(database_path=database_path)
+        version: int = snapshot.version
+        connection.execute('BEGIN IMMEDIATE')
+        print('{:<24} {:10.2f} us/commit'.format('write seats in place', per_call(
+            call=lambda index: writer.apply(connection=connection, changes=[({event(index): -1 if index % 2 else 1}, version + index + 1)]),
+            calls=arguments.lookups
+        )))
+        connection.rollback()
+        print('{:<24} {:10.2f} ms/publication'.format('publish again', per_call(
+            call=lambda _: publish_snapshot(connection=connection, path=snapshot_path(database_path=database_path)), calls=arguments.views
+        ) / 1000))
+        writer.close()
+        snapshot.close()
+        connection.close()
+        os.remove(snapshot_path(database_path=database_path))
+
+
+if __name__ == '__main__':
+    main()
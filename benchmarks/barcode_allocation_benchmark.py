@@ -0,0 +1,97 @@
+"""
+    Cost of giving out barcodes with the BarcodeAllocator against the random draw checked against the reservations.
+
+    The allocator never reads the reservation table, its cost only depends on the number of barcodes of an allocation,
+    so it is measured at several positions of the sequence up to the end of the EAN-8 space (10^7 - 1 barcodes) by
+    moving the persisted counter there. The random draw (8 random digits, then a SELECT on the reservation table and
+    a new draw on collision) is measured on a reservation table filled with --rows random barcodes.
+    Every row prints the mean and p99 time of one allocation of --seats barcodes.
+
+    Usage: python -m benchmarks.barcode_allocation_benchmark --allocations 2000 --seats 4 --rows 1000000
+"""
+import argparse
+import pathlib
+import random
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, percentile
+from database.barcodes import PAYLOADS, get_allocator
+
+
+def random_barcodes(cursor: sqlite3.Cursor, seats: int) -> list[int]:
+    """
+        The allocation used before the BarcodeAllocator: draw until none of the barcodes is already reserved
+        :return: list of barcodes
+    """
+    while True:
+        barcodes: list[int] = random.sample(range(10 ** 7, 10 ** 8), seats)
+        found: list = cursor.execute(
+            "SELECT barcode FROM reservation WHERE barcode IN ({})".format(', '.join('?' for _ in barcodes)), barcodes
+        ).fetchall()
+        if not found:
+            return barcodes
+
+
+def measure(connection: sqlite3.Connection, allocate, allocations: int) -> list[float]:
+    """
+        Time allocations inside one transaction, rolled back so every measure starts from the same state
+        :return: duration of every allocation in seconds
+    """
+    cursor: sqlite3.Cursor = connection.cursor()
+    durations: list[float] = []
+    cursor.execute("BEGIN IMMEDIATE")
+    for _ in range(allocations):
+        start: float = time.perf_counter()
+        allocate(cursor)
+        durations.append(time.perf_counter() - start)
+    connection.rollback()
+    return durations
+
+
+def report(name: str, durations: list[float]):
+    print('{:<40} mean {:8.1f}us  p99 {:8.1f}us'.format(
+        name, sum(durations) / len(durations) * 1e6, percentile(durations, 99) * 1e6
+    ))
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Barcode allocation benchmark')
+    parser.add_argument('--allocations', type=int, default=2000, help='allocations measured at every position')
+    parser.add_argument('--seats', type=int, default=4, help='barcodes of every allocation')
+    parser.add_argument('--rows', type=int, default=1000000, help='reservations in the table of the random draw')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    allocator = get_allocator()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(directory=pathlib.Path(directory), events=[])
+        connection: sqlite3.Connection = sqlite3.connect(database_path, isolation_level=None)
+
+        connection.execute("BEGIN IMMEDIATE")
+        allocator.allocate(cursor=connection.cursor(), count=1)  # starts the sequence
+        connection.execute("COMMIT")
+        for issued in (0, 1000000, 5000000, PAYLOADS - 1 - arguments.allocations * arguments.seats - 1):
+            connection.execute("UPDATE barcode_sequence SET next=? WHERE id=1", (issued + 1, ))
+            durations: list[float] = measure(
+                connection, lambda cursor: allocator.allocate(cursor=cursor, count=arguments.seats), arguments.allocations
+            )
+            report('allocator, {} issued'.format(issued), durations)
+
+        for rows in (0, arguments.rows):
+            connection.execute("BEGIN")
+            connection.execute("DELETE FROM reservation")
+            connection.executemany(
+                "INSERT INTO reservation (user_id, event_id, barcode) VALUES (1, 1, ?)",
+                ((barcode, ) for barcode in random.sample(range(10 ** 7, 10 ** 8), rows))
+            )
+            connection.execute("COMMIT")
+            durations: list[float] = measure(
+                connection, lambda cursor: random_barcodes(cursor=cursor, seats=arguments.seats), arguments.allocations
+            )
+            report('random draw, {} reserved'.format(rows), durations)
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
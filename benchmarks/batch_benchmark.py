@@ -0,0 +1,85 @@
+"""
+    Requests per second of the batch mode (service/batch.py) by batch size and number of workers.
+
+    A day of traffic is generated for --users users: their registrations followed by --requests reservations, views,
+    user information and cancellations, then replayed into a fresh scratch database by every configuration. A batch
+    size of 1 commits every request on its own. The time to the last response is printed along with the time until the
+    tickets of the reservations were rendered in the background as well.
+
+    Usage: python -m benchmarks.batch_benchmark --users 50 --requests 5000
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import pathlib
+import random
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from service.batch import BatchRunner
+
+CONFIGURATIONS: tuple[tuple[int, int], ...] = ((1, 1), (64, 1), (64, 4))  # (batch size, workers)
+
+
+class TimedOutput(io.StringIO):
+    """
+        Output stream remembering when the last response was written
+    """
+    last_write: float = 0.0
+
+    def write(self, text: str) -> int:
+        self.last_write = time.perf_counter()
+        return super().write(text)
+
+
+def traffic(users: int, requests: int, events: int) -> list[str]:
+    """
+        :return: JSON lines of the requests
+    """
+    emails: list[str] = ['batch{}@example.com'.format(index) for index in range(users)]
+    lines: list[dict] = [{'user': email, 'password': 'batch', 'action': 'register'} for email in emails]
+    for _ in range(requests):
+        request: dict = {'user': random.choice(emails), 'password': 'batch', 'action': random.choice(('reservation', 'reservation', 'view', 'info', 'cancel'))}
+        if request['action'] == 'reservation':
+            request.update(event=random.randint(1, events), seats=random.randint(1, 3))
+        elif request['action'] == 'cancel':
+            request['barcode'] = random.randint(1, 10 ** 8)
+        lines.append(request)
+    return [json.dumps(line) + '\n' for line in lines]
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Batch mode benchmark')
+    parser.add_argument('--users', type=int, default=50, help='users sending requests')
+    parser.add_argument('--requests', type=int, default=5000, help='requests after the registrations')
+    parser.add_argument('--events', type=int, default=20, help='events of the scratch database')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.ERROR)  # the failed cancellations are expected
+
+    random.seed(0)
+    lines: list[str] = traffic(users=arguments.users, requests=arguments.requests, events=arguments.events)
+    repository: str = os.getcwd()
+    for batch_size, workers in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as directory:
+            database_path: pathlib.Path = create_scratch_database(
+                directory=pathlib.Path(directory),
+                events=[('Batch event {}'.format(event), future_timestamp(), 10.0, 100000) for event in range(arguments.events)]
+            )
+            os.chdir(directory)
+            runner: BatchRunner = BatchRunner(database_path=database_path, batch_size=batch_size, workers=workers)
+            output: TimedOutput = TimedOutput()
+            start: float = time.perf_counter()
+            count: int = runner.run(lines=lines, output=output)
+            elapsed: float = time.perf_counter() - start
+            os.chdir(repository)
+        answered: float = output.last_write - start
+        print('batch size {:3}  workers {}  {:6} requests answered in {:6.2f}s -> {:8.1f} requests/second, tickets rendered after {:6.2f}s'.format(
+            batch_size, workers, count, answered, count / answered, elapsed
+        ))
+
+
+if __name__ == '__main__':
+    main()
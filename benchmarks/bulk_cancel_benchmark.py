@@ -0,0 +1,52 @@
+"""
+    Time to cancel a block of reservations one barcode at a time and with Database.cancel_reservations.
+
+    Every run reserves --seats seats of one event for one user, then cancels them: one cancel_reservation call (one
+    transaction) per barcode, the whole list of barcodes at once, and all the reservations of the event at once.
+
+    Usage: python -m benchmarks.bulk_cancel_benchmark --seats 200
+"""
+import argparse
+import logging
+import os
+import pathlib
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from user.user import User
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Bulk cancellation benchmark')
+    parser.add_argument('--seats', type=int, default=200, help='reservations cancelled by every run')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    repository: str = os.getcwd()
+    user: User = User(user='cancel@example.com', password='cancel')
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory), events=[('Bulk cancellation', future_timestamp(), 10.0, arguments.seats)]
+        )
+        os.chdir(directory)
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=user)
+        for name in ('one by one', 'barcode list', 'whole event'):
+            barcodes: list = database.make_reservation(user=user, event=1, seats=arguments.seats)
+            start: float = time.perf_counter()
+            if name == 'one by one':
+                cancelled: int = sum(database.cancel_reservation(user=user, barcode=barcode) for barcode in barcodes)
+            elif name == 'barcode list':
+                cancelled: int = sum(database.cancel_reservations(user=user, barcodes=barcodes).values())
+            else:
+                cancelled: int = sum(database.cancel_reservations(user=user, event=1).values())
+            elapsed: float = time.perf_counter() - start
+            print('{:<13} {:5} reservations cancelled in {:8.2f} ms'.format(name, cancelled, elapsed * 1000))
+        database.close()
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
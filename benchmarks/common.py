@@ -0,0 +1,55 @@
+import datetime
+import math
+import os
+import pathlib
+import sqlite3
+
+from create_env import create_tables
+
+
+def future_timestamp(days: int = 30) -> float:
+    """
+        Timestamp of a date in the future, used for events that can still be booked
+        :param days: number of days from now
+        :return: float value, epoch value
+    """
+    return (datetime.datetime.now() + datetime.timedelta(days=days)).timestamp()
+
+
+def create_scratch_database(directory: pathlib.Path, events: list[tuple], database_name: str = 'benchmark.db') -> pathlib.Path:
+    """
+        Create a fresh database with the application schema and the given events in a scratch directory.
+        The directory also gets the pdf_reservations folder, benchmarks are run with it as working directory so the
+        tickets they generate do not end up in the repository.
+
+        :param directory: scratch directory
+        :param events: list of (name, date, price, seats_available) tuples
+        :param database_name: path of the database file relative to the scratch directory
+        :return: path to the database file
+    """
+    database_path: pathlib.Path = directory / database_name
+    os.makedirs(database_path.parent, exist_ok=True)
+    os.makedirs(directory / 'pdf_reservations', exist_ok=True)
+    connection: sqlite3.Connection = sqlite3.connect(database_path)
+    create_tables(db_con=connection, db_cursor=connection.cursor())
+    connection.executemany(
+        "INSERT INTO events (name, date, price, seats_available) VALUES (?, ?, ?, ?)",
+        events
+    )
+    connection.commit()
+    connection.close()
+    return database_path
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """
+        Nearest-rank percentile of a list of values
+        :param values: measured values
+        :param percent: percentile to compute, between 0 and 100
+        :return: the percentile or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered: list[float] = sorted(values)
+    rank: int = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
@@ -0,0 +1,94 @@
+"""
+    Mixed read/write throughput with the legacy connection setup and with the pooled WAL connections.
+
+    Reader threads call view_events and get_user_info while writer threads reserve and cancel seats, for a fixed
+    duration. The writers run the transactional part of make_reservation/cancel_reservation, without the tickets, so
+    the numbers show the database and not reportlab.
+        - legacy: default rollback journal, synchronous=FULL, connections closed when released
+        - pooled: the configured pool, WAL, synchronous=NORMAL, mmap, connections reused
+
+    Usage: python -m benchmarks.connection_pool_benchmark --readers 4 --writers 2 --duration 5
+"""
+import argparse
+import pathlib
+import tempfile
+import threading
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.connection_pool import ConnectionPool
+from database.database import Database
+from user.user import User
+
+
+def reader(pool: ConnectionPool, database_path: pathlib.Path, user: User, stop: threading.Event, counts: list, index: int):
+    # one Database per thread, like the database threads of the service
+    database: Database = Database(database_path=database_path, pool=pool)
+    while not stop.is_set():
+        database.view_events()
+        database.get_user_info(user=user)
+        counts[index] += 2
+    database.close()
+
+
+def writer(pool: ConnectionPool, database_path: pathlib.Path, user: User, stop: threading.Event, counts: list, index: int):
+    database: Database = Database(database_path=database_path, pool=pool)
+    user_id: int = database.authenticate(user=user).user_id
+    while not stop.is_set():
+        reservation: tuple | None = database._run_in_transaction(lambda: database._reserve_seats(user_id=user_id, event=1, seats=1))
+        database._run_in_transaction(lambda: database._release_seat(user_id=user_id, barcode=reservation[1][0]))
+        counts[index] += 2
+    database.close()
+
+
+def run(pool_factory, arguments: argparse.Namespace) -> tuple[float, float]:
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Pool event {}'.format(event), future_timestamp(), 10.0, 1000) for event in range(200)]
+        )
+        pool: ConnectionPool = pool_factory(database_path)
+        user: User = User(user='pool@example.com', password='pool')
+        setup: Database = Database(database_path=database_path, pool=pool)
+        setup.register_user(user=user)
+        user_id: int = setup.authenticate(user=user).user_id
+        for event in range(1, 51):
+            setup._run_in_transaction(lambda: setup._reserve_seats(user_id=user_id, event=event, seats=2))
+        setup.close()
+
+        stop: threading.Event = threading.Event()
+        reads: list[int] = [0] * arguments.readers
+        writes: list[int] = [0] * arguments.writers
+        threads: list[threading.Thread] = [
+            threading.Thread(target=reader, args=(pool, database_path, user, stop, reads, index)) for index in range(arguments.readers)
+        ] + [
+            threading.Thread(target=writer, args=(pool, database_path, user, stop, writes, index)) for index in range(arguments.writers)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(arguments.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        pool.close()
+    return sum(reads) / arguments.duration, sum(writes) / arguments.duration
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Connection pool benchmark')
+    parser.add_argument('--readers', type=int, default=4, help='reader threads')
+    parser.add_argument('--writers', type=int, default=2, help='writer threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds every configuration runs')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    configurations: dict = {
+        'legacy': lambda path: ConnectionPool(database_path=path, size=0, journal_mode='DELETE', synchronous='FULL', mmap_size=0, cache_size=-2000),
+        'pooled WAL': lambda path: ConnectionPool(database_path=path),
+    }
+    for name, pool_factory in configurations.items():
+        reads, writes = run(pool_factory, arguments)
+        print('{:<10} reads/second: {:9.1f}   writes/second: {:9.1f}'.format(name, reads, writes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+    Deterministic synthetic data for the benchmarks.
+
+    generate_database fills a fresh database with the application schema with users, events and reservations drawn
+    from a random generator seeded with --seed: the same arguments give the same rows, except for the dates of the
+    events which are spread over the year following the generation so they can be booked. The user with id n is
+    user{n}@example.com with the password password{n}, the reservations take their barcodes from the allocator of
+    database/barcodes.py, whose counter is left after them so the application keeps issuing unique barcodes.
+
+    Usage: python -m benchmarks.data_generator scale.db --users 1000000 --events 100000 --reservations 10000000
+"""
+import argparse
+import hashlib
+import pathlib
+import random
+import sqlite3
+import time
+
+from typing import Iterator
+
+from create_env import create_tables
+from database.barcodes import PAYLOADS, get_allocator
+
+CHUNK_SIZE: int = 50000  # rows inserted per executemany
+EVENT_SPREAD: float = 365 * 24 * 3600.0  # seconds after the generation the events are spread over
+BARCODE_HEADROOM: int = 100000  # barcodes left to the application after the generated reservations
+MAX_RESERVATIONS: int = PAYLOADS - 1 - BARCODE_HEADROOM
+
+
+def user_email(user_id: int) -> str:
+    return 'user{}@example.com'.format(user_id)
+
+
+def user_password(user_id: int) -> str:
+    return 'password{}'.format(user_id)
+
+
+def chunks(rows: Iterator[tuple], size: int = CHUNK_SIZE) -> Iterator[list[tuple]]:
+    chunk: list[tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_database(database_path: pathlib.Path, users: int, events: int, reservations: int, seed: int = 0) -> pathlib.Path:
+    """
+        Create a database with the application schema and the synthetic rows
+        :param database_path: path of the new database file, it must not exist
+        :param users: number of users, none of them is an admin
+        :param events: number of events, all in the future
+        :param reservations: number of reservations, of random users for random events
+        :param seed: seed of the random generator
+        :return: path to the database file
+    """
+    if database_path.exists():
+        raise FileExistsError('{} already exists'.format(database_path))
+    if reservations > MAX_RESERVATIONS:
+        raise ValueError('At most {} reservations can be generated, the EAN-8 barcodes would run out'.format(MAX_RESERVATIONS))
+    if reservations and not (users and events):
+        raise ValueError('Reservations need at least one user and one event')
+
+    generator: random.Random = random.Random(seed)
+    connection: sqlite3.Connection = sqlite3.connect(database_path, isolation_level=None)
+    create_tables(db_con=connection, db_cursor=connection.cursor())
+    # the file is thrown away if the generation fails, it does not need a journal
+    connection.execute('PRAGMA journal_mode=OFF')
+    connection.execute('PRAGMA synchronous=OFF')
+    connection.execute('BEGIN')
+
+    for chunk in chunks(
+        (user_email(user_id), hashlib.sha256(user_password(user_id).encode()).hexdigest(), 0) for user_id in range(1, users + 1)
+    ):
+        connection.executemany("INSERT INTO users (email, password, is_admin) VALUES (?, ?, ?)", chunk)
+
+    now: float = time.time()
+    prices: list[float] = []
+    for chunk in chunks(
+        ('Event {}'.format(event_id), now + generator.uniform(3600.0, EVENT_SPREAD), round(generator.uniform(10.0, 500.0), 2),
+         generator.randint(0, 1000)) for event_id in range(1, events + 1)
+    ):
+        connection.executemany("INSERT INTO events (name, date, price, seats_available) VALUES (?, ?, ?, ?)", chunk)
+        prices.extend(event[2] for event in chunk)
+
+    allocator = get_allocator()
+
+    def reservation_rows() -> Iterator[tuple]:
+        # the reservations are sold at the price of their event
+        for counter in range(1, reservations + 1):
+            user_id: int = generator.randint(1, users)
+            event_id: int = generator.randint(1, events)
+            yield user_id, event_id, allocator.barcode(counter), prices[event_id - 1]
+
+    for chunk in chunks(reservation_rows()):
+        connection.executemany("INSERT INTO reservation (user_id, event_id, barcode, price) VALUES (?, ?, ?, ?)", chunk)
+    connection.execute("INSERT INTO barcode_sequence (id, next) VALUES (1, ?)", (reservations + 1, ))
+    connection.execute('COMMIT')
+    connection.execute('ANALYZE')
+    connection.close()
+    return database_path
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Generate a database of synthetic data')
+    parser.add_argument('path', type=pathlib.Path, help='database file to create')
+    parser.add_argument('--users', type=int, default=10000, help='number of users')
+    parser.add_argument('--events', type=int, default=1000, help='number of events')
+    parser.add_argument('--reservations', type=int, default=100000, help='number of reservations')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    start: float = time.perf_counter()
+    generate_database(
+        database_path=arguments.path, users=arguments.users, events=arguments.events,
+        reservations=arguments.reservations, seed=arguments.seed
+    )
+    print('{} generated in {:.1f}s'.format(arguments.path, time.perf_counter() - start))
@@ -0,0 +1,64 @@
+"""
+    Throughput of Database.view_events with and without the EventCatalogue.
+
+    Both run the same mix on the same scratch database: view requests and, every --write-every views, a reservation
+    followed by its cancellation made by the same Database, like the service does. The catalogue line also prints how
+    many views were served from memory and how many built a new snapshot.
+
+    Usage: python -m benchmarks.event_catalogue_benchmark --events 200 --views 5000 --write-every 20
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from database.event_catalogue import EventCatalogue
+from user.user import User
+
+
+def run(database: Database, views: int, write_every: int) -> float:
+    """
+        :return: seconds taken by the mix
+    """
+    user: User = User(user='catalogue@example.com', password='catalogue')
+    start: float = time.perf_counter()
+    for index in range(views):
+        database.view_events()
+        if write_every and index % write_every == 0:
+            barcodes: list = database.make_reservation(user=user, event=1 + index % 10, seats=1)
+            database.cancel_reservation(user=user, barcode=barcodes[0])
+    return time.perf_counter() - start
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Event catalogue benchmark')
+    parser.add_argument('--events', type=int, default=200, help='upcoming events in the database')
+    parser.add_argument('--views', type=int, default=5000, help='view requests of every run')
+    parser.add_argument('--write-every', type=int, default=20, help='a reservation and a cancellation every N views, 0 for none')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    repository: str = os.getcwd()
+    for name in ('SQL query', 'event catalogue'):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path: pathlib.Path = create_scratch_database(
+                directory=pathlib.Path(directory),
+                events=[('Catalogue event {}'.format(event), future_timestamp(days=1 + event), 10.0, 1000) for event in range(arguments.events)]
+            )
+            os.chdir(directory)
+            catalogue: EventCatalogue | None = EventCatalogue(database_path=database_path) if name == 'event catalogue' else None
+            database: Database = Database(database_path=database_path, event_catalogue=catalogue)
+            database.register_user(user=User(user='catalogue@example.com', password='catalogue'))
+            elapsed: float = run(database=database, views=arguments.views, write_every=arguments.write_every)
+            database.close()
+            os.chdir(repository)
+        statistics: str = ' ({} from memory, {} snapshots)'.format(catalogue.hits, catalogue.rebuilds) if catalogue else ''
+        print('{:<16} {:9.1f} views/second{}'.format(name, arguments.views / elapsed, statistics))
+        if catalogue:
+            catalogue.close()
+
+
+if __name__ == '__main__':
+    main()
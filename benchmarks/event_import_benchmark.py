@@ -0,0 +1,82 @@
+"""
+    Throughput and memory of the event importer for every file format.
+
+    A catalogue of --events events is written as a JSON array, JSON Lines and CSV file, then every file is imported into
+    a fresh scratch database twice: once timed, once with tracemalloc to measure the peak memory allocated by the
+    import, which depends on the chunk size and not on the size of the file.
+
+    Usage: python -m benchmarks.event_import_benchmark --events 200000 --chunk-size 5000
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from database.event_importer import EventImporter, FIELDS
+
+
+def write_files(directory: pathlib.Path, events: int) -> list[pathlib.Path]:
+    """
+        :return: paths of the JSON array, JSON Lines and CSV files holding the same events
+    """
+    date: float = future_timestamp()
+    rows = ((['Imported event {}'.format(index), date + index * 60, 10.0 + index % 90, 100]) for index in range(events))
+    paths: list[pathlib.Path] = [directory / 'events.json', directory / 'events.jsonl', directory / 'events.csv']
+    with open(paths[0], 'w') as json_file, open(paths[1], 'w') as jsonl_file, open(paths[2], 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(FIELDS)
+        json_file.write('[')
+        for index, row in enumerate(rows):
+            json_file.write('{}\n{}'.format(',' if index else '', json.dumps(row)))
+            jsonl_file.write(json.dumps(dict(zip(FIELDS, row))) + '\n')
+            writer.writerow(row)
+        json_file.write(']\n')
+    return paths
+
+
+def import_file(directory: pathlib.Path, path: pathlib.Path, chunk_size: int, name: str) -> dict:
+    """
+        Import a file into a new scratch database
+        :return: summary of the import, see EventImporter.run
+    """
+    database: Database = Database(database_path=create_scratch_database(directory=directory, events=[], database_name=name))
+    summary: dict = EventImporter(database=database, chunk_size=chunk_size).run(path=path)
+    database.close()
+    return summary
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Event import benchmark')
+    parser.add_argument('--events', type=int, default=200000, help='events of the imported files')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='events written by one transaction')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        directory: pathlib.Path = pathlib.Path(directory)
+        os.chdir(directory)
+        for path in write_files(directory=directory, events=arguments.events):
+            start: float = time.perf_counter()
+            summary: dict = import_file(directory=directory, path=path, chunk_size=arguments.chunk_size, name='{}.db'.format(path.suffix[1:]))
+            elapsed: float = time.perf_counter() - start
+
+            tracemalloc.start()
+            import_file(directory=directory, path=path, chunk_size=arguments.chunk_size, name='{}-memory.db'.format(path.suffix[1:]))
+            peak: int = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print('{:<6} {:>9} events {:10.0f} events/second   peak memory {:8.1f} KiB   file {:8.1f} KiB'.format(
+                path.suffix[1:], summary['written'], summary['records'] / elapsed, peak / 1024, path.stat().st_size / 1024
+            ))
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
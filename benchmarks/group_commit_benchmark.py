@@ -0,0 +1,95 @@
+"""
+    Throughput of the group-commit ReservationQueue against the per-call commit path of Database.make_reservation.
+
+    The per-call path runs every client as its own process with its own connection, like one main.py call per
+    reservation. The queued path runs the same clients as threads of one process sharing one ReservationQueue.
+    Both book the same number of single-seat reservations, tickets included.
+
+    Usage: python -m benchmarks.group_commit_benchmark --clients 16 --bookings 100 --batch-size 64 --max-wait 0.005
+"""
+import argparse
+import multiprocessing
+import os
+import pathlib
+import tempfile
+import threading
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from database.reservation_queue import ReservationQueue
+from user.user import User
+
+
+def per_call_client(database_path: pathlib.Path, client: int, bookings: int) -> int:
+    """
+        Client process of the per-call path, every reservation is its own transaction and commit
+        :return: number of successful reservations
+    """
+    database: Database = Database(database_path=database_path)
+    user: User = User(user='client{}@example.com'.format(client), password='client')
+    return sum(bool(database.make_reservation(user=user, event=1, seats=1)) for _ in range(bookings))
+
+
+def run_per_call(database_path: pathlib.Path, clients: int, bookings: int) -> tuple[float, int]:
+    start: float = time.perf_counter()
+    with multiprocessing.Pool(processes=clients) as pool:
+        successful: list[int] = pool.starmap(per_call_client, [(database_path, client, bookings) for client in range(clients)])
+    return time.perf_counter() - start, sum(successful)
+
+
+def run_queued(database_path: pathlib.Path, clients: int, bookings: int, batch_size: int, max_wait: float) -> tuple[float, int]:
+    reservation_queue: ReservationQueue = ReservationQueue(database_path=database_path, batch_size=batch_size, max_wait=max_wait)
+    successful: list[int] = [0] * clients
+
+    def client(index: int):
+        user: User = User(user='client{}@example.com'.format(index), password='client')
+        successful[index] = sum(bool(reservation_queue.make_reservation(user=user, event=1, seats=1)) for _ in range(bookings))
+
+    start: float = time.perf_counter()
+    threads: list[threading.Thread] = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reservation_queue.close()  # waits for the tickets of the last batch
+    return time.perf_counter() - start, sum(successful)
+
+
+def prepare(directory: pathlib.Path, clients: int, bookings: int) -> pathlib.Path:
+    database_path: pathlib.Path = create_scratch_database(
+        directory=directory,
+        events=[('Flash sale', future_timestamp(), 100.0, clients * bookings)]
+    )
+    database: Database = Database(database_path=database_path)
+    for client in range(clients):
+        database.register_user(user=User(user='client{}@example.com'.format(client), password='client'))
+    return database_path
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Group commit throughput benchmark')
+    parser.add_argument('--clients', type=int, default=16, help='number of concurrent clients')
+    parser.add_argument('--bookings', type=int, default=100, help='reservations made by every client')
+    parser.add_argument('--batch-size', type=int, default=64, help='maximum operations per transaction')
+    parser.add_argument('--max-wait', type=float, default=0.005, help='seconds the writer waits to fill a batch')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    repository: str = os.getcwd()
+    total: int = arguments.clients * arguments.bookings
+    for name in ('per-call commit', 'group commit'):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path: pathlib.Path = prepare(pathlib.Path(directory), arguments.clients, arguments.bookings)
+            os.chdir(directory)
+            if name == 'per-call commit':
+                elapsed, successful = run_per_call(database_path, arguments.clients, arguments.bookings)
+            else:
+                elapsed, successful = run_queued(database_path, arguments.clients, arguments.bookings, arguments.batch_size, arguments.max_wait)
+            os.chdir(repository)
+        print('{:<16} {}/{} reservations in {:.2f}s -> {:.1f} reservations/second'.format(
+            name, successful, total, elapsed, successful / elapsed
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+    Cost of the instrumentation of the Database layer.
+
+    The same mix (authentication, event listing, reservation and cancellation) runs on a scratch database with and
+    without Metrics. Both variants first run --warmup rounds, then --repeat times --operations rounds each, taking
+    turns on which one goes first so neither always runs on a colder cache; the median rate of every variant and the
+    overhead are printed, then the statements recorded by the instrumented runs with their mean latency.
+
+    Usage: python -m benchmarks.instrumentation_benchmark --operations 2000 [--repeat 5] [--top 10]
+"""
+import argparse
+import logging
+import os
+import pathlib
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from database.instrumentation import Metrics
+from user.user import User
+
+
+def run(database: Database, operations: int) -> float:
+    """
+        :return: seconds taken by the mix
+    """
+    user: User = User(user='metrics@example.com', password='metrics')
+    start: float = time.perf_counter()
+    for index in range(operations):
+        identity = database.authenticate(user=user)
+        database.list_events(page_size=10)
+        # the reservation without its ticket, rendering a pdf would hide the cost of the statements
+        _, barcodes = database._run_in_transaction(lambda: database._reserve_seats(user_id=identity.user_id, event=1 + index % 5, seats=1))
+        database.cancel_reservation(user=identity, barcode=barcodes[0])
+    return time.perf_counter() - start
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Instrumentation benchmark')
+    parser.add_argument('--operations', type=int, default=2000, help='rounds of the mix in every repetition')
+    parser.add_argument('--repeat', type=int, default=5, help='repetitions of every variant, the median is kept')
+    parser.add_argument('--warmup', type=int, default=200, help='rounds run by every variant before measuring')
+    parser.add_argument('--top', type=int, default=10, help='statements printed, by total time')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    metrics: Metrics = Metrics()
+    rates: dict[str, list[float]] = {'plain cursor': [], 'instrumented': []}
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Metrics event {}'.format(event), future_timestamp(), 10.0, 1000) for event in range(5)]
+        )
+        os.chdir(directory)
+        plain: Database = Database(database_path=database_path)
+        plain.register_user(user=User(user='metrics@example.com', password='metrics'))
+        # the warm-up of the instrumented variant is recorded apart, the statements printed are those of the runs
+        warming: Database = Database(database_path=database_path, metrics=Metrics())
+        run(database=plain, operations=arguments.warmup)
+        run(database=warming, operations=arguments.warmup)
+        warming.close()
+        instrumented: Database = Database(database_path=database_path, metrics=metrics)
+        variants: list[tuple[str, Database]] = [('plain cursor', plain), ('instrumented', instrumented)]
+        for repetition in range(arguments.repeat):
+            for name, database in variants if repetition % 2 == 0 else variants[::-1]:
+                rates[name].append(arguments.operations / run(database=database, operations=arguments.operations))
+        plain.close()
+        instrumented.close()
+        os.chdir(repository)
+
+    for name, values in rates.items():
+        print('{:<13} {:8.1f} rounds/second  (median of {}, min {:.1f}, max {:.1f})'.format(
+            name, statistics.median(values), len(values), min(values), max(values)
+        ))
+    print('overhead {:+.1f}%'.format((statistics.median(rates['plain cursor']) / statistics.median(rates['instrumented']) - 1) * 100))
+
+    statements: dict = metrics.snapshot()['statements']
+    for statement, values in sorted(statements.items(), key=lambda item: -item[1]['sum'])[:arguments.top]:
+        print('{:8.1f} us mean {:7} calls  {}'.format(values['sum'] / values['count'] * 1e6, values['count'], statement[:90]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+    End-to-end load generator for booking workloads.
+
+    --processes worker processes each simulate a stream of user sessions for --duration seconds: every step picks an
+    action from the --mix (register, view, reserve, cancel, info), sends it the way main.py would and waits an
+    exponentially distributed think time of mean --think-time before the next one. A worker starts with one registered
+    user, the users it registers join its pool and it only cancels reservations it made. With --hot-share a share of the
+    reservations goes to event 1 (a flash sale with --hot-seats seats), the others to random events. With --shards the
+    events are spread over that many shard files before the run (see database/shards.py).
+
+    The requests go through service.handlers.handle_request against a Database of the worker (--target database), or
+    run as "main.py --local" processes (--target cli, every request pays for starting the interpreter). At the end the
+    throughput, the p50/p99/max latency of every action, the failed requests and reservations, the transactions retried
+    or given up because the database was busy and the seat counts of every event are reported. The seats taken from an
+    event must match its reservations, otherwise the run is inconsistent and exits with status 1.
+
+    Usage: python -m benchmarks.load_generator --processes 8 --duration 30 --hot-share 0.8 --think-time 0.01
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp, percentile
+from database.connection_pool import get_pool
+from database.database import Database
+from database.instrumentation import Metrics
+from database.shards import ShardManager, shard_files
+from service.handlers import handle_request
+
+ACTIONS: tuple[str, ...] = ('register', 'view', 'reserve', 'cancel', 'info')
+DEFAULT_MIX: str = 'register=1,view=4,reserve=3,cancel=1,info=1'
+MAIN: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent / 'main.py'
+DATABASE_NAME: str = 'database/Spectacole-database.db'  # where main.py looks for it, relative to the scratch directory
+BARCODES: re.Pattern = re.compile(r'Barcodes: ([\d, ]+)')
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+        :param mix: comma separated action=weight pairs, e.g. "view=4,reserve=3"
+        :return: weight of every action
+    """
+    weights: dict[str, float] = {}
+    for pair in mix.split(','):
+        action, _, weight = pair.partition('=')
+        if action.strip() not in ACTIONS:
+            raise argparse.ArgumentTypeError('{} is not one of {}'.format(action.strip(), ', '.join(ACTIONS)))
+        try:
+            weights[action.strip()] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError('{} is not a valid weight'.format(weight))
+    if not any(weight > 0 for weight in weights.values()):
+        raise argparse.ArgumentTypeError('at least one action must have a positive weight')
+    return weights
+
+
+class DatabaseClient:
+    """
+        Runs requests in the worker process, through the handlers of the reservation service
+    """
+    def __init__(self, database_path: pathlib.Path):
+        self.metrics: Metrics = Metrics(slow_query_threshold=None)
+        self.database: Database = Database(database_path=database_path, metrics=self.metrics)
+
+    def send(self, request: dict) -> tuple[bool, list[int]]:
+        """
+            :return: whether the request succeeded and the barcodes it reserved
+        """
+        result: dict = handle_request(database=self.database, request=request)
+        barcodes: list[int] = result['data']['barcodes'] if request['action'] == 'reservation' and result['success'] else []
+        return result['success'], barcodes
+
+    def counters(self) -> dict[str, int]:
+        return self.metrics.snapshot()['counters']
+
+    def close(self):
+        self.database.close()
+
+
+class CliClient:
+    """
+        Runs every request as a main.py --local process in the scratch directory
+    """
+    def __init__(self, database_path: pathlib.Path):
+        self.directory: pathlib.Path = database_path.parent.parent
+
+    def send(self, request: dict) -> tuple[bool, list[int]]:
+        arguments: list[str] = [sys.executable, str(MAIN), '--local', '-u', request['user'], '-p', request['password'], '-a', request['action']]
+        for option, field in (('-e', 'event'), ('-s', 'seats'), ('-b', 'barcode')):
+            if field in request:
+                arguments += [option, str(request[field])]
+        completed: subprocess.CompletedProcess = subprocess.run(arguments, cwd=self.directory, capture_output=True, text=True)
+        found: re.Match | None = BARCODES.search(completed.stderr) if request['action'] == 'reservation' else None
+        barcodes: list[int] = [int(barcode) for barcode in found.group(1).split(',')] if found else []
+        return completed.returncode == 0, barcodes
+
+    @staticmethod
+    def counters() -> dict[str, int]:
+        return {}
+
+    def close(self):
+        pass
+
+
+def simulate(database_path: pathlib.Path, target: str, worker: int, duration: float, mix: dict[str, float],
+             think_time: float, events: int, hot_share: float, max_seats: int, seed: int) -> dict:
+    """
+        Worker process, runs user sessions until the duration is over
+        :return: dictionary with the latencies and the failures of every action, the reservations that failed, the
+        seconds the worker ran and the counters of its Metrics
+    """
+    logging.disable(logging.ERROR)
+    generator: random.Random = random.Random(seed * 1000 + worker)
+    client: DatabaseClient | CliClient = DatabaseClient(database_path=database_path) if target == 'database' else CliClient(database_path=database_path)
+    users: list[dict] = []
+    reservations: list[tuple[dict, int]] = []
+    latencies: dict[str, list[float]] = {action: [] for action in ACTIONS}
+    failures: dict[str, int] = {action: 0 for action in ACTIONS}
+    failed_reservations: int = 0
+
+    def register() -> tuple[bool, list[int]]:
+        credentials: dict = {'user': 'load{}-{}@example.com'.format(worker, len(users)), 'password': 'load'}
+        outcome: tuple[bool, list[int]] = client.send(request={**credentials, 'action': 'register'})
+        if outcome[0]:
+            users.append(credentials)
+        return outcome
+
+    register()
+    actions: list[str] = list(mix)
+    weights: list[float] = list(mix.values())
+    start: float = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        action: str = generator.choices(actions, weights)[0]
+        if action == 'cancel' and not reservations:
+            action = 'reserve'
+        request_start: float = time.perf_counter()
+        match action:
+            case 'register':
+                success, _ = register()
+            case 'reserve':
+                user: dict = generator.choice(users)
+                event: int = 1 if generator.random() < hot_share else generator.randint(1, events)
+                success, barcodes = client.send(request={
+                    **user, 'action': 'reservation', 'event': event, 'seats': generator.randint(1, max_seats)
+                })
+                reservations.extend((user, barcode) for barcode in barcodes)
+                failed_reservations += not success
+            case 'cancel':
+                user, barcode = reservations.pop(generator.randrange(len(reservations)))
+                success, _ = client.send(request={**user, 'action': 'cancel', 'barcode': barcode})
+            case _:
+                success, _ = client.send(request={**generator.choice(users), 'action': action})
+        latencies[action].append(time.perf_counter() - request_start)
+        failures[action] += not success
+        if think_time:
+            time.sleep(generator.expovariate(1 / think_time))
+    elapsed: float = time.perf_counter() - start
+    counters: dict[str, int] = client.counters()
+    client.close()
+    return {
+        'latencies': latencies, 'failures': failures, 'failed_reservations': failed_reservations, 'elapsed': elapsed,
+        'counters': counters
+    }
+
+
+def check_seats(database_path: pathlib.Path, seats: dict[int, int]) -> tuple[list[str], dict[int, int]]:
+    """
+        Verify that the seats taken from every event match its reservations, in the shard of the event if the database
+        has shards
+        :param seats: seats every event had before the run, by event id
+        :return: list of problems found, empty if the database is consistent, and the seats reserved by event id
+    """
+    connection: sqlite3.Connection = sqlite3.connect(database_path)
+    files: list[pathlib.Path] = shard_files(connection=connection, database_path=database_path) or [database_path]
+    connection.close()
+    problems: list[str] = []
+    reserved_seats: dict[int, int] = {}
+    for path in files:
+        connection = sqlite3.connect(path)
+        for event_id, seats_available, reserved in connection.execute(
+            "SELECT e.id, e.seats_available, (SELECT COUNT(*) FROM reservation r WHERE r.event_id=e.id) FROM events e"
+        ):
+            reserved_seats[event_id] = reserved
+            if seats_available < 0:
+                problems.append('event {} has {} seats available'.format(event_id, seats_available))
+            if seats_available + reserved != seats[event_id]:
+                problems.append('event {}: {} available + {} reserved != {} seats'.format(event_id, seats_available, reserved, seats[event_id]))
+        connection.close()
+    return problems, reserved_seats
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Concurrent booking load generator')
+    parser.add_argument('--processes', type=int, default=4, help='worker processes simulating users')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds every worker runs')
+    parser.add_argument('--target', choices=['database', 'cli'], default='database', help='Database in the worker or main.py processes')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help='action weights, default {}'.format(DEFAULT_MIX))
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean seconds a user waits between two requests')
+    parser.add_argument('--events', type=int, default=20, help='number of events')
+    parser.add_argument('--seats', type=int, default=1000, help='seats of every event')
+    parser.add_argument('--hot-share', type=float, default=0.0, help='share of the reservations for event 1, the flash sale')
+    parser.add_argument('--hot-seats', type=int, default=200, help='seats of event 1 when --hot-share is given')
+    parser.add_argument('--max-seats', type=int, default=4, help='maximum seats per reservation')
+    parser.add_argument('--shards', type=int, default=0, help='shard files the events are spread over, none by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random choices of the workers')
+    parser.add_argument('--output', type=pathlib.Path, help='JSON file the summary is written to')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    seats: dict[int, int] = {
+        event: arguments.hot_seats if event == 1 and arguments.hot_share else arguments.seats for event in range(1, arguments.events + 1)
+    }
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory), database_name=DATABASE_NAME,
+            events=[('Load event {}'.format(event), future_timestamp(), 10.0, seats[event]) for event in seats]
+        )
+        if arguments.shards:
+            manager: ShardManager = ShardManager(database_path=database_path)
+            manager.split(count=arguments.shards)
+            files: list[pathlib.Path] = manager.files()
+            manager.close()
+            # the workers are forked, they must not inherit the connections opened by the split
+            for path in [database_path] + files:
+                get_pool(database_path=path).close()
+        os.chdir(directory)  # tickets are generated in the scratch directory
+        with multiprocessing.Pool(processes=arguments.processes) as pool:
+            results: list[dict] = pool.starmap(simulate, [
+                (database_path, arguments.target, worker, arguments.duration, arguments.mix, arguments.think_time,
+                 arguments.events, arguments.hot_share, arguments.max_seats, arguments.seed)
+                for worker in range(arguments.processes)
+            ])
+        problems, reserved = check_seats(database_path=database_path, seats=seats)
+        os.chdir(repository)
+
+    elapsed: float = max(result['elapsed'] for result in results)
+    summary: dict = {'parameters': {**vars(arguments), 'output': None}, 'actions': {}, 'counters': {}}
+    for action in ACTIONS:
+        latencies: list[float] = [latency for result in results for latency in result['latencies'][action]]
+        if latencies:
+            summary['actions'][action] = {
+                'requests': len(latencies), 'failures': sum(result['failures'][action] for result in results),
+                'p50_ms': percentile(latencies, 50) * 1000, 'p99_ms': percentile(latencies, 99) * 1000,
+                'max_ms': max(latencies) * 1000
+            }
+    for result in results:
+        for name, value in result['counters'].items():
+            summary['counters'][name] = summary['counters'].get(name, 0) + value
+    requests: int = sum(values['requests'] for values in summary['actions'].values())
+    summary.update(
+        requests=requests, requests_per_second=requests / elapsed,
+        failed_reservations=sum(result['failed_reservations'] for result in results),
+        seats_reserved=reserved, consistent=not problems
+    )
+
+    print('{} processes, {} shards, {} target, {} requests in {:.1f}s -> {:.1f} requests/second'.format(
+        arguments.processes, arguments.shards, arguments.target, requests, elapsed, summary['requests_per_second']
+    ))
+    for action, values in summary['actions'].items():
+        print('{:<9} {:7} requests {:6} failed  p50 {:8.2f} ms  p99 {:8.2f} ms  max {:8.2f} ms'.format(
+            action, values['requests'], values['failures'], values['p50_ms'], values['p99_ms'], values['max_ms']
+        ))
+    print('failed reservations: {}, busy retries: {}, busy errors: {}'.format(
+        summary['failed_reservations'], summary['counters'].get('busy_retries', 0), summary['counters'].get('busy_errors', 0)
+    ))
+    if arguments.hot_share:
+        print('flash sale: {}/{} seats of event 1 reserved'.format(reserved.get(1, 0), seats[1]))
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(summary, output_file, indent=2, default=str)
+    if problems:
+        print('INCONSISTENT:\n\t{}'.format('\n\t'.join(problems)))
+        sys.exit(1)
+    print('consistent: the seats taken from every event match its reservations')
+
+
+if __name__ == '__main__':
+    main()
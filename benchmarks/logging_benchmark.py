@@ -0,0 +1,69 @@
+"""
+    Cost of a log call for the caller, with the queue of utilities/logging_util.py and with a handler formatting and
+    writing the record synchronously, as every logger had before. Records are written to /dev/null by a stream taking
+    --write-latency seconds per write, like a terminal or a pipe that is slow to read.
+
+    Usage: python -m benchmarks.logging_benchmark --messages 10000 --write-latency 0.00005
+"""
+import argparse
+import logging
+import os
+import time
+
+from typing import IO
+from utilities.logging_util import TEXT_FORMAT, configure_logging, init_logger, shutdown_logging
+
+
+class SlowStream:
+    """
+        Text stream waiting before every write
+    """
+    def __init__(self, stream: IO[str], latency: float):
+        self.stream: IO[str] = stream
+        self.latency: float = latency
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def log_calls(logger: logging.Logger, messages: int, level: int) -> float:
+    """
+        :return: microseconds per call
+    """
+    start: float = time.perf_counter()
+    for index in range(messages):
+        logger.log(level, 'Reservation {} committed'.format(index))
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Logging benchmark')
+    parser.add_argument('--messages', type=int, default=10000, help='log calls per measurement')
+    parser.add_argument('--write-latency', type=float, default=0.00005, help='seconds taken by every write of the stream')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    with open(os.devnull, 'w') as null_file:
+        stream: SlowStream = SlowStream(stream=null_file, latency=arguments.write_latency)
+        synchronous: logging.Logger = logging.getLogger('synchronous')
+        synchronous.propagate = False
+        synchronous.setLevel(logging.INFO)
+        handler: logging.StreamHandler = logging.StreamHandler(stream=stream)
+        handler.setFormatter(logging.Formatter(fmt=TEXT_FORMAT))
+        synchronous.addHandler(handler)
+        print('synchronous handler   info  {:8.2f} us/call'.format(log_calls(logger=synchronous, messages=arguments.messages, level=logging.INFO)))
+
+        configure_logging(level='INFO', stream=stream)
+        queued: logging.Logger = init_logger('queued')
+        print('queue and listener    info  {:8.2f} us/call'.format(log_calls(logger=queued, messages=arguments.messages, level=logging.INFO)))
+        print('below the level       debug {:8.2f} us/call'.format(log_calls(logger=queued, messages=arguments.messages, level=logging.DEBUG)))
+        start: float = time.perf_counter()
+        shutdown_logging()
+        print('records still queued written in {:.2f}s'.format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
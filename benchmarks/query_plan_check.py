@@ -0,0 +1,131 @@
+"""
+    Check that no query of database.py scans a whole table.
+
+    Every public method of Database runs once on a scratch database while the statements sent to SQLite are recorded
+    with a trace callback, then EXPLAIN QUERY PLAN is run on every recorded query. A plan step scanning a table
+    (instead of searching it through an index) is reported and makes the check fail, unless the query is one of the
+    ALLOWED_SCANS.
+
+    Usage: python -m benchmarks.query_plan_check [--verbose]
+"""
+import argparse
+import os
+import pathlib
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from database.event_catalogue import EventCatalogue
+from database.event_filter import EventFilter
+from user.identity import Identity
+from user.user import User
+
+# queries reading a whole table on purpose, with the reason
+ALLOWED_SCANS: dict[str, str] = {
+    'SELECT barcode FROM reservation': 'runs once per database, when the barcode sequence starts',
+    'SELECT e.id, e.name, e.date, e.price, coalesce(s.sold, 0), coalesce(s.cancelled, 0), coalesce(s.revenue, 0.0), '
+    's.last_sale FROM events e LEFT JOIN event_sales s ON s.event_id=e.id ORDER BY e.id': 'the sales report lists every event',
+}
+QUERY_PREFIXES: tuple[str, ...] = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def record_queries(database_path: pathlib.Path) -> list[str]:
+    """
+        Run the methods of Database once and record the queries they send
+        :return: list of queries, with their parameters, in the order they were first sent
+    """
+    statements: list[str] = []
+    database: Database = Database(database_path=database_path)
+    database.database.set_trace_callback(statements.append)
+
+    user: User = User(user='plans@example.com', password='plans')
+    database.register_user(user=user)
+    database.check_user(user=user)
+    database.view_events()
+    events, cursor = database.list_events(page_size=1)
+    database.list_events(after=(events[0].date, events[0].id), page_size=1,
+                         event_filter=EventFilter(date_to=events[0].date + 1, price_min=1.0, price_max=100.0))
+    barcodes: list = database.make_reservation(user=user, event=1, seats=2)
+    database.get_user_info(user=user)
+    database.list_reservations(user=user, page_size=1)
+    database.list_reservations(user=user, after=1, page_size=1, upcoming=True, event=1)
+    database.reservation_summary(user=user)
+    database.reservation_summary(user=user, upcoming=True, event=1)
+    database.get_ticket_status(user=user)
+    database.get_ticket_status(user=user, barcodes=barcodes[:1])
+    database.render_tickets()
+    database.cancel_reservation(user=user, barcode=barcodes[0])
+    database.import_events(events=[('Query plans', future_timestamp(), 12.0, 10)], source='events.json', records=1)
+    database.get_import_progress(source='events.json')
+    database.sales_report()
+    database.sales_report(event=1)
+    database.import_events(events=[], source='events.json', records=1, finished=True)
+    database.database.set_trace_callback(None)
+    database.close()
+
+    # with an event catalogue, the writes also read the version of the events table
+    catalogue: EventCatalogue = EventCatalogue(database_path=database_path)
+    database = Database(database_path=database_path, event_catalogue=catalogue)
+    database.database.set_trace_callback(statements.append)
+    barcodes = database.make_reservation(user=user, event=1, seats=1)
+    database.cancel_reservation(user=user, barcode=barcodes[0])
+    barcodes = database.make_reservation(user=user, event=1, seats=3)
+    database.cancel_reservations(user=user, barcodes=barcodes[:2])
+    database.cancel_reservations(user=user, event=1)
+    database.make_reservation(user=user, event=1, seats=2)
+    administrator: Identity = database.authenticate(user=user)
+    database.cancel_reservations(user=Identity(administrator.user_id, administrator.email, administrator.hashed_password, is_admin=True), event=1)
+    database.database.set_trace_callback(None)
+    database.close()
+    catalogue.close()
+
+    queries: list[str] = [statement.strip() for statement in statements if statement.lstrip().upper().startswith(QUERY_PREFIXES)]
+    return list(dict.fromkeys(queries))
+
+
+def full_scans(connection: sqlite3.Connection, query: str) -> tuple[list[str], list[str]]:
+    """
+        :return: tuple with all the steps of the plan of the query and the steps scanning a table
+    """
+    steps: list[str] = [row[3] for row in connection.execute('EXPLAIN QUERY PLAN {}'.format(query))]
+    # scanning a constant row or a table-valued function (json_each of a list of parameters) reads no table
+    return steps, [step for step in steps if step.startswith('SCAN ') and not step.startswith('SCAN CONSTANT ROW')
+                   and 'VIRTUAL TABLE' not in step]
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Query plan check')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every query')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    repository: str = os.getcwd()
+    failures: int = 0
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory), events=[('Query plans', future_timestamp(), 10.0, 10)]
+        )
+        os.chdir(directory)
+        queries: list[str] = record_queries(database_path=database_path)
+        os.chdir(repository)
+
+        connection: sqlite3.Connection = sqlite3.connect(database_path)
+        for query in queries:
+            steps, scans = full_scans(connection=connection, query=query)
+            allowed: str | None = ALLOWED_SCANS.get(query)
+            if scans and not allowed:
+                failures += 1
+                print('FULL SCAN  {}\n           {}'.format(query, '; '.join(scans)))
+            elif arguments.verbose:
+                print('ok         {}\n           {}{}'.format(
+                    query, '; '.join(steps), ' (allowed: {})'.format(allowed) if scans else ''
+                ))
+        connection.close()
+
+    print('{} queries checked, {} with a full table scan'.format(len(queries), failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
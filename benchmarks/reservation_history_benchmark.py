@@ -0,0 +1,95 @@
+"""
+    Time and memory of the reservation history of a user with many reservations.
+
+    A scratch database gets --events events and one user with --reservations reservations spread over them.
+    get_user_info, which reads all the reservations at once, is compared with a join of the reservations with their
+    events read at once, the first page of list_reservations, a walk over all its pages and reservation_summary. The
+    best time of --repeat runs, the peak of the memory allocated during a call and the memory held by its result are
+    printed.
+
+    Usage: python -m benchmarks.reservation_history_benchmark --reservations 100000 --events 1000
+"""
+import argparse
+import logging
+import os
+import pathlib
+import sqlite3
+import tempfile
+
+from typing import Callable
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from benchmarks.row_records_benchmark import measure
+from database.barcodes import get_allocator
+from database.database import Database
+from reservation.reservation import ReservationRecord
+from user.identity import Identity
+from user.user import User
+
+
+def joined_user_info(connection: sqlite3.Connection, user_id: int) -> list[ReservationRecord]:
+    return list(map(ReservationRecord._make, connection.execute(
+        "SELECT r.barcode, r.event_id, e.name, e.date FROM reservation r JOIN events e ON e.id=r.event_id WHERE r.user_id=?",
+        (user_id, )
+    ).fetchall()))
+
+
+def walk_history(database: Database, identity: Identity, page_size: int) -> list[int]:
+    """
+        :return: number of reservations of every page, the pages themselves are dropped once read
+    """
+    pages: list[int] = []
+    after: int | None = None
+    while True:
+        reservations, after = database.list_reservations(user=identity, after=after, page_size=page_size)
+        pages.append(len(reservations))
+        if after is None:
+            return pages
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Reservation history benchmark')
+    parser.add_argument('--reservations', type=int, default=100000, help='reservations of the user')
+    parser.add_argument('--events', type=int, default=1000, help='events the reservations are spread over')
+    parser.add_argument('--page-size', type=int, default=100, help='reservations of a page of the history')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every reader, the best time is kept')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('History event {}'.format(event), future_timestamp() + event, 10.0, 100) for event in range(arguments.events)]
+        )
+        os.chdir(directory)
+        user: User = User(user='history@example.com', password='history')
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=user)
+        allocator = get_allocator()
+        database.database.executemany(
+            "INSERT INTO reservation (user_id, event_id, barcode) VALUES (1, ?, ?)",
+            ((1 + index % arguments.events, allocator.barcode(1 + index)) for index in range(arguments.reservations))
+        )
+        database.database.commit()
+        database.database.execute('ANALYZE')
+        identity: Identity = database.authenticate(user=user)
+        connection: sqlite3.Connection = sqlite3.connect(database_path)
+
+        readers: list[tuple[str, Callable[[], object]]] = [
+            ('get_user_info', lambda: database.get_user_info(user=identity)['reservations']),
+            ('join of all reservations', lambda: joined_user_info(connection=connection, user_id=identity.user_id)),
+            ('list_reservations page', lambda: database.list_reservations(user=identity, page_size=arguments.page_size)[0]),
+            ('list_reservations walk', lambda: walk_history(database=database, identity=identity, page_size=arguments.page_size)),
+            ('reservation_summary', lambda: database.reservation_summary(user=identity)),
+        ]
+        for name, reader in readers:
+            elapsed, peak, held, items = measure(reader=reader, repeat=arguments.repeat)
+            print('{:<26} {:7} items  {:8.1f} ms  peak {:7.1f} MiB  held {:7.1f} MiB'.format(name, items, elapsed, peak, held))
+        connection.close()
+        database.close()
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
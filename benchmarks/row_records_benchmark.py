@@ -0,0 +1,122 @@
+"""
+    Time and memory of reading large result sets into records instead of sqlite3.Row objects converted to dictionaries.
+
+    A scratch database gets --rows events and one user with --rows reservations. The legacy readers below do what the
+    Database methods did before the records (sqlite3.Row rows, converted with dict() and then into the result format),
+    they are compared with view_events, list_events (one page of all the events) and get_user_info. The best time of
+    --repeat runs, the peak of the memory allocated during a call and the memory held by its result are printed.
+
+    Usage: python -m benchmarks.row_records_benchmark --rows 100000
+"""
+import argparse
+import datetime
+import gc
+import logging
+import os
+import pathlib
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from typing import Callable
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.barcodes import get_allocator
+from database.database import Database
+from user.user import User
+
+
+def legacy_view_events(connection: sqlite3.Connection) -> list[dict]:
+    rows: list[sqlite3.Row] = connection.execute(
+        "SELECT * FROM events WHERE date>? AND seats_available>0 ORDER BY date, id", (datetime.datetime.now().timestamp(), )
+    ).fetchall()
+    return [
+        {entry['id']: {'name': entry['name'], 'date': entry['date'], 'price': entry['price'], 'seats_available': entry['seats_available']}}
+        for entry in [dict(row) for row in rows]
+    ]
+
+
+def legacy_list_events(connection: sqlite3.Connection, page_size: int) -> list[dict]:
+    return [dict(event) for event in connection.execute(
+        "SELECT id, name, date, price, seats_available FROM events WHERE (date, id)>(?, ?) AND seats_available>=? "
+        "ORDER BY date, id LIMIT ?", (datetime.datetime.now().timestamp(), 0, 1, page_size)
+    ).fetchall()]
+
+
+def legacy_user_info(connection: sqlite3.Connection, user_id: int) -> list[dict]:
+    reservations: list[dict] = [dict(row) for row in connection.execute(
+        "SELECT event_id, barcode FROM reservation WHERE user_id=?", (user_id, )
+    ).fetchall()]
+    barcode_event_id: dict = {reservation['barcode']: reservation['event_id'] for reservation in reservations}
+    events: dict = {dict(event)['id']: dict(event) for event in connection.execute(
+        "SELECT * FROM events WHERE id IN (SELECT value FROM json_each(?))", (str(list(barcode_event_id.values())), )
+    ).fetchall()}
+    return [
+        {'name': events[event_id]['name'], 'date': events[event_id]['date'], 'barcode': barcode}
+        for barcode, event_id in barcode_event_id.items()
+    ]
+
+
+def measure(reader: Callable[[], object], repeat: int) -> tuple[float, float, float, int]:
+    """
+        :return: best time in milliseconds, peak and held memory in MiB, number of items of the result
+    """
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        reader()
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    before: int = tracemalloc.get_traced_memory()[0]
+    result = reader()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, (peak - before) / 2 ** 20, (held - before) / 2 ** 20, len(result)
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Row records benchmark')
+    parser.add_argument('--rows', type=int, default=100000, help='events, and reservations of the user')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every reader, the best time is kept')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Records event {}'.format(event), future_timestamp() + event, 10.0 + event % 100, 100) for event in range(arguments.rows)]
+        )
+        os.chdir(directory)
+        user: User = User(user='records@example.com', password='records')
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=user)
+        allocator = get_allocator()
+        database.database.executemany(
+            "INSERT INTO reservation (user_id, event_id, barcode) VALUES (1, ?, ?)",
+            ((1 + index, allocator.barcode(1 + index)) for index in range(arguments.rows))
+        )
+        database.database.commit()
+        legacy: sqlite3.Connection = sqlite3.connect(database_path)
+        legacy.row_factory = sqlite3.Row
+
+        readers: list[tuple[str, Callable[[], object]]] = [
+            ('view_events   rows/dict', lambda: legacy_view_events(connection=legacy)),
+            ('view_events   tuples', lambda: database.view_events()),
+            ('list_events   rows/dict', lambda: legacy_list_events(connection=legacy, page_size=arguments.rows)),
+            ('list_events   records', lambda: database.list_events(page_size=arguments.rows)[0]),
+            ('get_user_info rows/dict', lambda: legacy_user_info(connection=legacy, user_id=1)),
+            ('get_user_info records', lambda: database.get_user_info(user=user)['reservations']),
+        ]
+        for name, reader in readers:
+            elapsed, peak, held, items = measure(reader=reader, repeat=arguments.repeat)
+            print('{:<24} {:7} items  {:8.1f} ms  peak {:7.1f} MiB  held {:7.1f} MiB'.format(name, items, elapsed, peak, held))
+        legacy.close()
+        database.close()
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+    Time of the sales report read from the event_sales counters against the same report computed from the reservations,
+    and what the triggers keeping the counters add to a reservation.
+
+    A scratch database gets --events events and --reservations reservations spread over them, inserted through the
+    triggers. The report is read --repeat times both ways, then --bookings reservations of one seat followed by their
+    cancellation are made with the triggers and again after dropping them.
+
+    Usage: python -m benchmarks.sales_report_benchmark --events 1000 --reservations 1000000
+"""
+import argparse
+import logging
+import os
+import pathlib
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from typing import Callable
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.barcodes import get_allocator
+from database.database import Database
+from user.user import User
+
+
+def scanned_report(connection: sqlite3.Connection) -> list[tuple]:
+    return connection.execute(
+        "SELECT e.id, e.name, count(r.barcode), coalesce(sum(r.price), 0) FROM events e "
+        "LEFT JOIN reservation r ON r.event_id=e.id GROUP BY e.id ORDER BY e.id"
+    ).fetchall()
+
+
+def best_time(read: Callable[[], object], repeat: int) -> float:
+    """
+        :return: best time in milliseconds
+    """
+    times: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        read()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def bookings(database: Database, user: User, events: int, count: int) -> float:
+    """
+        :return: median milliseconds of a reservation of one seat and its cancellation
+    """
+    times: list[float] = []
+    for index in range(count):
+        start: float = time.perf_counter()
+        barcodes: list = database.make_reservation(user=user, event=1 + index % events, seats=1)
+        database.cancel_reservation(user=user, barcode=barcodes[0])
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Sales report benchmark')
+    parser.add_argument('--events', type=int, default=1000, help='number of events')
+    parser.add_argument('--reservations', type=int, default=1000000, help='reservations spread over the events')
+    parser.add_argument('--repeat', type=int, default=5, help='reads of the report, the best time is kept')
+    parser.add_argument('--bookings', type=int, default=200, help='reservations and cancellations timed')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Sales event {}'.format(event), future_timestamp() + event, 10.0 + event % 50, 10 ** 9) for event in range(arguments.events)]
+        )
+        os.chdir(directory)  # tickets are generated in the scratch directory
+        user: User = User(user='sales@example.com', password='sales')
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=user)
+        allocator = get_allocator()
+        start: float = time.perf_counter()
+        database.database.executemany(
+            "INSERT INTO reservation (user_id, event_id, barcode, price) VALUES (1, ?, ?, ?)",
+            ((1 + index % arguments.events, allocator.barcode(1 + index), 10.0 + index % arguments.events % 50) for index in range(arguments.reservations))
+        )
+        database.database.execute("INSERT INTO barcode_sequence (id, next) VALUES (1, ?)", (arguments.reservations + 1, ))
+        database.database.commit()
+        print('{} reservations inserted through the triggers in {:.2f}s'.format(arguments.reservations, time.perf_counter() - start))
+
+        connection: sqlite3.Connection = sqlite3.connect(database_path)
+        print('report from the counters     {:8.2f} ms'.format(best_time(lambda: database.sales_report(), arguments.repeat)))
+        print('report from the reservations {:8.2f} ms'.format(best_time(lambda: scanned_report(connection=connection), arguments.repeat)))
+        print('reservation and cancellation, triggers     {:6.2f} ms'.format(
+            bookings(database=database, user=user, events=arguments.events, count=arguments.bookings)
+        ))
+        database.database.execute("DROP TRIGGER reservation_price")
+        database.database.execute("DROP TRIGGER event_sales_insert")
+        database.database.execute("DROP TRIGGER event_sales_delete")
+        database.database.commit()
+        print('reservation and cancellation, no triggers  {:6.2f} ms'.format(
+            bookings(database=database, user=user, events=arguments.events, count=arguments.bookings)
+        ))
+        connection.close()
+        database.close()
+        os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
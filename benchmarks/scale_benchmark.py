@@ -0,0 +1,226 @@
+"""
+    Latency and throughput of every Database method on a database of synthetic data at scale.
+
+    The database is generated by benchmarks/data_generator.py (deterministic for a given --seed), then every operation
+    is called --iterations times, or for at most --duration seconds, with arguments drawn from the same seed: existing
+    users for check_user and get_user_info, new users for register_user, random events for make_reservation (one seat,
+    the ticket is rendered inline), existing reservations for cancel_reservation and the first page of the listing for
+    list_events. generate_pdf renders a ticket on its own. The p50/p99 latency and the calls per second of every
+    operation are printed and written to a JSON file along with the parameters and the environment of the run.
+
+    With --data-dir the generated database is kept there and copied for the next runs with the same parameters, every
+    run starts from the same rows. With --compare the results are compared with those of an earlier run: an operation
+    whose p50 or p99 grew by more than --threshold percent is reported and the benchmark exits with status 1.
+
+    Usage: python -m benchmarks.scale_benchmark --users 1000000 --events 100000 --reservations 10000000 \
+        --data-dir ~/benchmark-data --output results.json [--compare baseline.json]
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import pathlib
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from typing import Callable, Iterator
+
+from benchmarks.common import percentile
+from benchmarks.data_generator import generate_database, user_email, user_password
+from database.database import Database
+from user.user import User
+from utilities.utils import generate_pdf
+
+WARMUP: int = 3  # calls of every operation before the measured ones
+
+
+def measure(operation: Callable[[], object], iterations: int, duration: float) -> dict:
+    """
+        Call an operation until it ran the given number of times or for the given duration
+        :param operation: function without arguments
+        :param iterations: maximum number of measured calls
+        :param duration: maximum number of seconds, at least one call is measured
+        :return: dictionary with the number of calls, their p50, p99 and mean latency in milliseconds and the calls per
+        second
+    """
+    for _ in range(WARMUP):
+        operation()
+    latencies: list[float] = []
+    start: float = time.perf_counter()
+    while len(latencies) < iterations and (not latencies or time.perf_counter() - start < duration):
+        call_start: float = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - call_start)
+    return {
+        'calls': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'calls_per_second': len(latencies) / sum(latencies)
+    }
+
+
+def operations(database: Database, generator: random.Random, users: int, events: int, reservations: int, calls: int) -> dict[str, Callable[[], object]]:
+    """
+        :param calls: most calls of an operation, warm-up included
+        :return: the operations measured, by name, their arguments are drawn in advance so drawing them is not timed
+    """
+    accounts: Iterator[User] = itertools.cycle([
+        User(user=user_email(user_id), password=user_password(user_id))
+        for user_id in (generator.randint(1, users) for _ in range(min(users, calls)))
+    ])
+    booked: Iterator[int] = itertools.cycle([generator.randint(1, events) for _ in range(min(events, calls))])
+    # distinct reservations of the generated rows, with the credentials of their owner, every one is cancelled once
+    owned: Iterator[tuple[User, int]] = iter([
+        (User(user=user_email(row[0]), password=user_password(row[0])), row[1])
+        for row in (
+            database.database.execute("SELECT user_id, barcode FROM reservation WHERE rowid=?", (rowid, )).fetchone()
+            for rowid in generator.sample(range(1, reservations + 1), min(reservations, calls))
+        ) if row is not None
+    ])
+    registrations: Iterator[User] = (
+        User(user='new{}-{}-{}@example.com'.format(int(time.time()), os.getpid(), index), password='password')
+        for index in itertools.count()
+    )
+    barcodes: Iterator[int] = itertools.count(10000000)
+    event: sqlite3.Row = database.database.execute("SELECT name, date, price FROM events ORDER BY id LIMIT 1").fetchone()
+
+    def cancel():
+        user, barcode = next(owned, (None, None))
+        return user is not None and database.cancel_reservation(user=user, barcode=barcode)
+
+    return {
+        'check_user': lambda: database.check_user(user=next(accounts)),
+        'register_user': lambda: database.register_user(user=next(registrations)),
+        'view_events': lambda: database.view_events(),
+        'list_events': lambda: database.list_events(),
+        'get_user_info': lambda: database.get_user_info(user=next(accounts)),
+        'make_reservation': lambda: database.make_reservation(user=next(accounts), event=next(booked), seats=1),
+        'cancel_reservation': cancel,
+        'generate_pdf': lambda: generate_pdf(
+            event_name=event['name'], date=event['date'], price=event['price'], barcode=next(barcodes), email='pdf@example.com'
+        ),
+    }
+
+
+def prepare_database(directory: pathlib.Path, data_directory: pathlib.Path | None, users: int, events: int, reservations: int, seed: int) -> pathlib.Path:
+    """
+        Generate the database in the scratch directory, or copy the one generated earlier with the same parameters
+        :return: path to the database the benchmark runs on
+    """
+    database_path: pathlib.Path = directory / 'scale.db'
+    if data_directory is None:
+        return generate_database(database_path=database_path, users=users, events=events, reservations=reservations, seed=seed)
+    cached: pathlib.Path = data_directory / 'scale-u{}-e{}-r{}-s{}.db'.format(users, events, reservations, seed)
+    if not cached.exists():
+        os.makedirs(data_directory, exist_ok=True)
+        generate_database(database_path=cached, users=users, events=events, reservations=reservations, seed=seed)
+    shutil.copyfile(cached, database_path)
+    return database_path
+
+
+def environment() -> dict:
+    """
+        :return: what the results depend on besides the code: versions and revision of the repository
+    """
+    try:
+        revision: str | None = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+        'revision': revision, 'time': time.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+        :return: description of every operation whose p50 or p99 grew by more than threshold percent
+    """
+    found: list[str] = []
+    for name, values in results['operations'].items():
+        before: dict | None = baseline['operations'].get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms'):
+            if before[metric] > 0 and (values[metric] - before[metric]) / before[metric] * 100 > threshold:
+                found.append('{} {} {:.3f} ms -> {:.3f} ms'.format(name, metric, before[metric], values[metric]))
+    return found
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Scale benchmark of the Database methods')
+    parser.add_argument('--users', type=int, default=10000, help='users generated')
+    parser.add_argument('--events', type=int, default=1000, help='events generated')
+    parser.add_argument('--reservations', type=int, default=100000, help='reservations generated')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the data and of the arguments of the calls')
+    parser.add_argument('--iterations', type=int, default=200, help='maximum measured calls per operation')
+    parser.add_argument('--duration', type=float, default=10.0, help='maximum seconds per operation')
+    parser.add_argument('--operations', nargs='+', help='operations to measure, all of them by default')
+    parser.add_argument('--data-dir', type=pathlib.Path, help='directory keeping the generated databases between runs')
+    parser.add_argument('--output', type=pathlib.Path, default=pathlib.Path('scale_benchmark.json'), help='results file')
+    parser.add_argument('--compare', type=pathlib.Path, help='results file of an earlier run')
+    parser.add_argument('--threshold', type=float, default=20.0, help='percent of latency growth reported as a regression')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    output: pathlib.Path = arguments.output.resolve()
+    repository: str = os.getcwd()
+    results: dict = {
+        'parameters': {
+            name: getattr(arguments, name) for name in ('users', 'events', 'reservations', 'seed', 'iterations', 'duration')
+        },
+        'environment': environment(),
+        'operations': {}
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        start: float = time.perf_counter()
+        database_path: pathlib.Path = prepare_database(
+            directory=pathlib.Path(directory), data_directory=arguments.data_dir, users=arguments.users,
+            events=arguments.events, reservations=arguments.reservations, seed=arguments.seed
+        )
+        print('database ready in {:.1f}s'.format(time.perf_counter() - start))
+        os.makedirs(pathlib.Path(directory) / 'pdf_reservations', exist_ok=True)
+        os.chdir(directory)
+        database: Database = Database(database_path=database_path)
+        measured: dict[str, Callable[[], object]] = operations(
+            database=database, generator=random.Random(arguments.seed), users=arguments.users,
+            events=arguments.events, reservations=arguments.reservations, calls=arguments.iterations + WARMUP
+        )
+        for name in arguments.operations or measured:
+            values: dict = measure(operation=measured[name], iterations=arguments.iterations, duration=arguments.duration)
+            results['operations'][name] = values
+            print('{:<19} {:6} calls  p50 {:9.3f} ms  p99 {:9.3f} ms  {:9.1f} calls/second'.format(
+                name, values['calls'], values['p50_ms'], values['p99_ms'], values['calls_per_second']
+            ))
+        database.close()
+        os.chdir(repository)
+
+    with open(output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print('results written to {}'.format(output))
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline: dict = json.load(baseline_file)
+        if baseline['parameters'] != results['parameters']:
+            print('the baseline was run with other parameters: {}'.format(baseline['parameters']))
+        found: list[str] = regressions(results=results, baseline=baseline, threshold=arguments.threshold)
+        for regression in found:
+            print('REGRESSION {}'.format(regression))
+        if found:
+            sys.exit(1)
+        print('no operation slower than the baseline by more than {}%'.format(arguments.threshold))
+
+
+if __name__ == '__main__':
+    main()
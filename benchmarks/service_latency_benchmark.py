@@ -0,0 +1,110 @@
+"""
+    Latency of the reservation service against the cold-start command line.
+
+    Three ways of running the same "view" and "info" requests are measured on a scratch database:
+        - cold CLI: python main.py --local, a new interpreter, imports, connection and logger for every request
+        - CLI via service: python main.py talking to a running service, still a new interpreter every time
+        - service client: send_request from an already running process, the cost of the request itself
+
+    Usage: python -m benchmarks.service_latency_benchmark --requests 20
+"""
+import argparse
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp, percentile
+from configs.config import DATABASE_STR_PATH
+from database.database import Database
+from service.client import send_request
+from user.user import User
+
+MAIN: str = str(pathlib.Path(__file__).resolve().parent.parent / 'main.py')
+USER: str = 'latency@example.com'
+PASSWORD: str = 'latency'
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_service(port: int, timeout: float = 10.0):
+    deadline: float = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError('The service did not start on port {}'.format(port))
+
+
+def measure(run, requests: int) -> list[float]:
+    latencies: list[float] = []
+    for _ in range(requests):
+        start: float = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, action: str, latencies: list[float]):
+    print('{:<16} {:<5} p50 {:8.2f} ms   p99 {:8.2f} ms'.format(
+        name, action, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+    ))
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Service latency benchmark')
+    parser.add_argument('--requests', type=int, default=20, help='requests measured for every path and action')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # main.py and the service use the configured relative database path, so the scratch directory mirrors it
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Latency event {}'.format(event), future_timestamp(), 10.0, 100) for event in range(20)],
+            database_name=DATABASE_STR_PATH
+        )
+        repository: str = os.getcwd()
+        os.chdir(directory)  # the tickets of the reservation are generated in the scratch directory
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=User(user=USER, password=PASSWORD))
+        database.make_reservation(user=User(user=USER, password=PASSWORD), event=1, seats=3)
+        os.chdir(repository)
+
+        port: int = free_port()
+        environment: dict = dict(os.environ, SPECTACOLE_SERVICE_PORT=str(port), PYTHONPATH=os.getcwd())
+        service: subprocess.Popen = subprocess.Popen(
+            [sys.executable, '-m', 'service.server', '--port', str(port)],
+            cwd=directory, env=environment, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for_service(port=port)
+            for action in ('view', 'info'):
+                command: list[str] = [sys.executable, MAIN, '-u', USER, '-p', PASSWORD, '-a', action]
+                report('cold CLI', action, measure(
+                    lambda: subprocess.run(command + ['--local'], cwd=directory, env=environment, capture_output=True, check=True),
+                    arguments.requests
+                ))
+                report('CLI via service', action, measure(
+                    lambda: subprocess.run(command, cwd=directory, env=environment, capture_output=True, check=True),
+                    arguments.requests
+                ))
+                report('service client', action, measure(
+                    lambda: send_request(request={'user': USER, 'password': PASSWORD, 'action': action}, port=port),
+                    arguments.requests
+                ))
+        finally:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+    Startup time budget of the command line.
+
+    view, info and cancel run --runs times as "main.py --local" processes on a scratch database, with -X importtime.
+    The check fails when the median time of an action, from starting the interpreter to its exit, is over --budget
+    milliseconds, or when one of the HEAVY_MODULES is imported by an action that does not need it. The import time of
+    the modules imported directly by main.py and the slowest of them are printed.
+
+    Usage: python -m benchmarks.startup_check [--runs 5] [--budget 200]
+"""
+import argparse
+import logging
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from user.user import User
+
+MAIN: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent / 'main.py'
+DATABASE_NAME: str = 'database/Spectacole-database.db'  # where main.py looks for it, relative to the scratch directory
+HEAVY_MODULES: tuple[str, ...] = ('reportlab', 'PIL', 'pydantic')  # only loaded to render tickets, or never
+ACTIONS: dict[str, list[str]] = {
+    'view': ['-a', 'view'],
+    'info': ['-a', 'info'],
+    'cancel': ['-a', 'cancel', '-b', '12345670'],
+}
+
+
+def import_times(stderr: str) -> tuple[dict[str, int], set[str]]:
+    """
+        :param stderr: standard error of a process run with -X importtime
+        :return: cumulative microseconds of every module imported at the top level, and the names of all the modules
+        imported
+    """
+    times: dict[str, int] = {}
+    modules: set[str] = set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name.startswith('  '):  # nested imports are indented
+            times[name.strip()] = int(cumulative)
+    return times, modules
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Command line startup time check')
+    parser.add_argument('--runs', type=int, default=5, help='runs of every action')
+    parser.add_argument('--budget', type=float, default=200.0, help='milliseconds an action may take, median of the runs')
+    parser.add_argument('--top', type=int, default=5, help='slowest top-level imports printed')
+    arguments: argparse.Namespace = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    repository: str = os.getcwd()
+    failures: list[str] = []
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory), database_name=DATABASE_NAME,
+            events=[('Startup event', future_timestamp(), 10.0, 100)]
+        )
+        os.chdir(directory)
+        user: User = User(user='startup@example.com', password='startup')
+        database: Database = Database(database_path=database_path)
+        database.register_user(user=user)
+        database.make_reservation(user=user, event=1, seats=1)
+        database.close()
+
+        for action, options in ACTIONS.items():
+            durations: list[float] = []
+            imports: dict[str, int] = {}
+            modules: set[str] = set()
+            for _ in range(arguments.runs):
+                start: float = time.perf_counter()
+                completed: subprocess.CompletedProcess = subprocess.run(
+                    [sys.executable, '-X', 'importtime', str(MAIN), '--local', '-u', user.get_user(), '-p', 'startup'] + options,
+                    capture_output=True, text=True
+                )
+                durations.append(time.perf_counter() - start)
+                imports, modules = import_times(stderr=completed.stderr)
+            median: float = statistics.median(durations) * 1000
+            heavy: list[str] = sorted({name.split('.')[0] for name in modules if name.split('.')[0] in HEAVY_MODULES})
+            slowest: list[tuple[str, int]] = sorted(imports.items(), key=lambda item: -item[1])[:arguments.top]
+            print('{:<7} median {:7.1f} ms  imports {:6.1f} ms  slowest: {}'.format(
+                action, median, sum(imports.values()) / 1000,
+                ', '.join('{} {:.1f} ms'.format(name, cumulative / 1000) for name, cumulative in slowest)
+            ))
+            if median > arguments.budget:
+                failures.append('{} takes {:.1f} ms, the budget is {:.1f} ms'.format(action, median, arguments.budget))
+            if heavy:
+                failures.append('{} imports {}'.format(action, ', '.join(heavy)))
+        os.chdir(repository)
+
+    if failures:
+        print('OVER BUDGET:\n\t{}'.format('\n\t'.join(failures)))
+        sys.exit(1)
+    print('every action started within {:.0f} ms without heavy imports'.format(arguments.budget))
+
+
+if __name__ == '__main__':
+    main()
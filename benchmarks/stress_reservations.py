@@ -0,0 +1,112 @@
+"""
+    Multi-process stress test for Database.make_reservation.
+
+    Several processes book seats for the same few events at the same time until everything is sold out. At the end the
+    database is checked: no event may have a negative number of seats and the seats taken from every event must match
+    the reservations stored for it. The number of bookings per second is reported.
+
+    Usage: python -m benchmarks.stress_reservations --processes 8 --events 3 --seats 200
+"""
+import argparse
+import multiprocessing
+import os
+import pathlib
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp
+from database.database import Database
+from user.user import User
+
+
+def book_until_sold_out(database_path: pathlib.Path, worker: int, events: int, max_seats: int) -> tuple[int, int, int]:
+    """
+        Worker process, registers its own user and books random seats until all the events are sold out
+        :return: tuple with the number of successful bookings, seats booked and failed attempts
+    """
+    database: Database = Database(database_path=database_path)
+    user: User = User(user='stress{}@example.com'.format(worker), password='stress')
+    database.register_user(user=user)
+
+    bookings, seats_booked, failures = 0, 0, 0
+    sold_out: set[int] = set()
+    while len(sold_out) < events:
+        event: int = random.choice([event for event in range(1, events + 1) if event not in sold_out])
+        seats: int = random.randint(1, max_seats)
+        if database.make_reservation(user=user, event=event, seats=seats):
+            bookings += 1
+            seats_booked += seats
+            continue
+        failures += 1
+        remaining: tuple = database.database.execute(
+            "SELECT seats_available FROM events WHERE id=?", (event,)
+        ).fetchone()
+        if remaining[0] == 0:
+            sold_out.add(event)
+    return bookings, seats_booked, failures
+
+
+def check_consistency(database_path: pathlib.Path, seats: int) -> list[str]:
+    """
+        Verify that no event was oversold
+        :return: list of problems found, empty if the database is consistent
+    """
+    connection: sqlite3.Connection = sqlite3.connect(database_path)
+    problems: list[str] = []
+    for event_id, seats_available, reserved in connection.execute(
+        "SELECT e.id, e.seats_available, (SELECT COUNT(*) FROM reservation r WHERE r.event_id=e.id) FROM events e"
+    ):
+        if seats_available < 0:
+            problems.append('event {} has {} seats available'.format(event_id, seats_available))
+        if seats_available + reserved != seats:
+            problems.append('event {}: {} available + {} reserved != {} seats'.format(event_id, seats_available, reserved, seats))
+    connection.close()
+    return problems
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Concurrent reservation stress test')
+    parser.add_argument('--processes', type=int, default=8, help='number of booking processes')
+    parser.add_argument('--events', type=int, default=3, help='number of events competing for')
+    parser.add_argument('--seats', type=int, default=200, help='seats available for every event')
+    parser.add_argument('--max-seats', type=int, default=4, help='maximum seats per booking')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    repository: str = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path: pathlib.Path = create_scratch_database(
+            directory=pathlib.Path(directory),
+            events=[('Stress event {}'.format(event), future_timestamp(), 10.0, arguments.seats) for event in range(arguments.events)]
+        )
+        os.chdir(directory)  # tickets are generated in the scratch directory
+
+        start: float = time.perf_counter()
+        with multiprocessing.Pool(processes=arguments.processes) as pool:
+            results: list[tuple[int, int, int]] = pool.starmap(
+                book_until_sold_out,
+                [(database_path, worker, arguments.events, arguments.max_seats) for worker in range(arguments.processes)]
+            )
+        elapsed: float = time.perf_counter() - start
+
+        bookings: int = sum(result[0] for result in results)
+        seats_booked: int = sum(result[1] for result in results)
+        failures: int = sum(result[2] for result in results)
+        problems: list[str] = check_consistency(database_path=database_path, seats=arguments.seats)
+        os.chdir(repository)
+
+    print('processes: {}, bookings: {}, seats booked: {}/{}, failed attempts: {}'.format(
+        arguments.processes, bookings, seats_booked, arguments.events * arguments.seats, failures
+    ))
+    print('elapsed: {:.2f}s, bookings/second: {:.1f}'.format(elapsed, bookings / elapsed))
+    if problems or seats_booked != arguments.events * arguments.seats:
+        print('INCONSISTENT:\n\t{}'.format('\n\t'.join(problems) or 'seats booked do not match the seats sold'))
+        sys.exit(1)
+    print('consistent: no event was oversold')
+
+
+if __name__ == '__main__':
+    main()
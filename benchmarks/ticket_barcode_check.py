@@ -0,0 +1,73 @@
+"""
+    Check that the barcodes drawn by the template-cached renderer are the ones reportlab draws.
+
+    tickets/renderer.py draws the EAN-8 bars itself instead of drawing an Ean8BarcodeWidget for every ticket. For
+    --barcodes random barcodes, and the edge values, the bars of the renderer and of the widget are compared module by
+    module (position and height) along with the digits printed under them. The check fails on the first difference,
+    e.g. when a new reportlab release changes how the widget draws the barcode.
+
+    Usage: python -m benchmarks.ticket_barcode_check [--barcodes 10000]
+"""
+import argparse
+import random
+import sys
+
+import reportlab
+
+from reportlab.graphics.barcode import eanbc
+from reportlab.graphics.shapes import Rect, String
+
+from tickets.renderer import TicketRenderer
+
+EDGE_BARCODES: tuple[int, ...] = (0, 1, 9999999, 10000000, 12345670, 99999999)
+PRECISION: int = 6  # decimals of the coordinates compared
+
+
+def modules(rects: list[tuple[float, float, float, float]], bar_width: float) -> set[tuple[int, float, float]]:
+    """
+        :param rects: (x, y, width, height) of the bars
+        :return: (module, y, height) of every module covered by a bar, so bars merged differently compare equal
+    """
+    return {
+        (module, round(y, PRECISION), round(height, PRECISION))
+        for x, y, width, height in rects
+        for module in range(round(x / bar_width), round((x + width) / bar_width))
+    }
+
+
+def widget_shapes(barcode: int) -> tuple[list[tuple[float, float, float, float]], list[tuple[float, float, str]], float]:
+    """
+        :return: the bars and the texts drawn by reportlab's widget, and the width of a bar
+    """
+    widget: eanbc.Ean8BarcodeWidget = eanbc.Ean8BarcodeWidget(str(barcode).zfill(8)[:7])
+    shapes: list = widget.draw().contents
+    rects: list[tuple[float, float, float, float]] = [
+        (shape.x, shape.y, shape.width, shape.height) for shape in shapes if isinstance(shape, Rect)
+    ][1:]  # the first rectangle is the background
+    texts: list[tuple[float, float, str]] = [(shape.x, shape.y, shape.text) for shape in shapes if isinstance(shape, String)]
+    return rects, texts, widget.barWidth
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Ticket barcode check')
+    parser.add_argument('--barcodes', type=int, default=10000, help='random barcodes compared')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random barcodes')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    renderer: TicketRenderer = TicketRenderer()
+    generator: random.Random = random.Random(arguments.seed)
+    barcodes: list[int] = list(EDGE_BARCODES) + [generator.randrange(10 ** 8) for _ in range(arguments.barcodes)]
+    for barcode in barcodes:
+        expected_rects, expected_texts, bar_width = widget_shapes(barcode=barcode)
+        rects, texts = renderer.barcode_shapes(barcode=barcode)
+        rounded = lambda shapes: [(round(x, PRECISION), round(y, PRECISION), text) for x, y, text in shapes]
+        if modules(rects, bar_width) != modules(expected_rects, bar_width) or rounded(texts) != rounded(expected_texts):
+            print('Barcode {} differs from reportlab {}:\n  renderer {} {}\n  widget   {} {}'.format(
+                barcode, reportlab.Version, sorted(modules(rects, bar_width)), texts, sorted(modules(expected_rects, bar_width)), expected_texts
+            ))
+            sys.exit(1)
+    print('{} barcodes drawn like reportlab\'s Ean8BarcodeWidget'.format(len(barcodes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+    Reservation latency by number of seats, with the tickets rendered inline and by the background TicketWorker.
+
+    Usage: python -m benchmarks.ticket_latency_benchmark --repeat 10 --seats 1 5 10
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from benchmarks.common import create_scratch_database, future_timestamp, percentile
+from database.database import Database
+from tickets.worker import TicketWorker
+from user.user import User
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Reservation latency with background tickets')
+    parser.add_argument('--repeat', type=int, default=10, help='reservations measured for every number of seats')
+    parser.add_argument('--seats', type=int, nargs='+', default=[1, 5, 10], help='numbers of seats per reservation')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    repository: str = os.getcwd()
+    user: User = User(user='tickets@example.com', password='tickets')
+    for name in ('inline', 'ticket worker'):
+        with tempfile.TemporaryDirectory() as directory:
+            database_path: pathlib.Path = create_scratch_database(
+                directory=pathlib.Path(directory),
+                events=[('Ticket event', future_timestamp(), 10.0, arguments.repeat * sum(arguments.seats))]
+            )
+            os.chdir(directory)
+            worker: TicketWorker | None = TicketWorker(database_path=database_path) if name == 'ticket worker' else None
+            database: Database = Database(database_path=database_path, ticket_worker=worker)
+            database.register_user(user=user)
+            for seats in arguments.seats:
+                latencies: list[float] = []
+                for _ in range(arguments.repeat):
+                    start: float = time.perf_counter()
+                    database.make_reservation(user=user, event=1, seats=seats)
+                    latencies.append(time.perf_counter() - start)
+                print('{:<14} {:>3} seats   p50 {:8.2f} ms   p99 {:8.2f} ms'.format(
+                    name, seats, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+                ))
+            if worker:
+                worker.close()
+            database.close()
+            os.chdir(repository)
+
+
+if __name__ == '__main__':
+    main()
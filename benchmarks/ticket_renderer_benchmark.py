@@ -0,0 +1,59 @@
+"""
+    Tickets per second of utilities.utils.generate_pdf against the template-cached TicketRenderer.
+
+    Three ways of rendering the same tickets are measured:
+        - generate_pdf: the page and a new barcode widget built for every ticket, one file per ticket
+        - renderer, one file per ticket: the cached layout and barcode geometry, one file per ticket
+        - renderer, one file per order: the tickets of an order as the pages of one file
+
+    Usage: python -m benchmarks.ticket_renderer_benchmark --tickets 500 --order-size 10
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from benchmarks.common import future_timestamp
+from tickets.renderer import TicketRenderer
+from utilities.utils import generate_pdf
+
+
+def main():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Ticket renderer benchmark')
+    parser.add_argument('--tickets', type=int, default=500, help='tickets rendered by every method')
+    parser.add_argument('--order-size', type=int, default=10, help='tickets per order for the multi-page pdf')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    date: float = future_timestamp()
+    tickets: list[dict] = [
+        {'barcode': 10000000 + index, 'name': 'Benchmark event', 'date': date, 'price': 50.0, 'email': 'tickets@example.com'}
+        for index in range(arguments.tickets)
+    ]
+    renderer: TicketRenderer = TicketRenderer()
+    methods: dict = {
+        'generate_pdf': lambda: [
+            generate_pdf(event_name=ticket['name'], date=ticket['date'], price=ticket['price'], barcode=ticket['barcode'], email=ticket['email'])
+            for ticket in tickets
+        ],
+        'renderer, one file per ticket': lambda: [renderer.render(ticket=ticket) for ticket in tickets],
+        'renderer, one file per order': lambda: [
+            renderer.render_order(tickets=tickets[start:start + arguments.order_size])
+            for start in range(0, len(tickets), arguments.order_size)
+        ],
+    }
+
+    repository: str = os.getcwd()
+    for name, method in methods.items():
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(pathlib.Path(directory) / 'pdf_reservations')
+            os.chdir(directory)
+            start: float = time.perf_counter()
+            method()
+            elapsed: float = time.perf_counter() - start
+            os.chdir(repository)
+        print('{:<30} {:9.1f} tickets/second'.format(name, arguments.tickets / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,74 @@
+import os
 import pathlib
 
 DATABASE_STR_PATH: str = "./database/Spectacole-database.db"
 DATABASE: pathlib.Path = pathlib.Path(DATABASE_STR_PATH)  # we need a path-like object to feed to sqlite.connect() method
 EMAIL_REGEX: str = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
 DATE_FORMAT: str = "%Y-%m-%d %H:%M"
+EVENT_PAGE_SIZE: int = 50  # events of a page of the event listing, see Database.list_events
+EVENT_MAX_PAGE_SIZE: int = 1000  # largest page a request can ask for
+RESERVATION_PAGE_SIZE: int = 100  # reservations of a page of the reservation history, see Database.list_reservations
+RESERVATION_MAX_PAGE_SIZE: int = 1000  # largest page of the reservation history a request can ask for
+
+# connections, see database/connection_pool.py
+DATABASE_POOL_SIZE: int = 8  # idle connections kept open for reuse
+DATABASE_JOURNAL_MODE: str = 'WAL'  # readers do not wait for writers and writers do not wait for readers
+DATABASE_SYNCHRONOUS: str = 'NORMAL'  # with WAL, commits are durable across crashes of the application, not of the OS
+DATABASE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes of the database file read through memory mapping
+DATABASE_CACHE_SIZE: int = -16000  # page cache of every connection, negative values are KiB
+DATABASE_STATEMENT_CACHE_SIZE: int = 256  # prepared statements cached by every connection
+
+# write concurrency
+DATABASE_BUSY_TIMEOUT: float = 5.0  # seconds a connection waits for the write lock before SQLite reports it as busy
+WRITE_MAX_RETRIES: int = 5  # attempts for a write transaction that keeps failing with a busy/locked database
+WRITE_RETRY_BACKOFF: float = 0.01  # seconds to wait before the first retry, doubled for every following one
+
+# group commit of reservations, see database/reservation_queue.py
+RESERVATION_BATCH_SIZE: int = 64  # maximum number of reservations/cancellations committed together
+RESERVATION_BATCH_MAX_WAIT: float = 0.005  # seconds the writer waits for more requests before committing a batch
+
+# reservation service, see service/server.py
+SERVICE_HOST: str = os.environ.get('SPECTACOLE_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT: int = int(os.environ.get('SPECTACOLE_SERVICE_PORT', '8765'))
+SERVICE_UNIX_SOCKET: str | None = os.environ.get('SPECTACOLE_SERVICE_SOCKET')  # when set, used instead of host and port
+SERVICE_CLIENT_TIMEOUT: float = 30.0  # seconds the CLI waits for an answer from the service
+SERVICE_DATABASE_THREADS: int = 4  # threads running database work, each with its own pooled connection
+SERVICE_RESERVATION_QUEUE: bool = True  # the service commits reservations and cancellations in batches
+CREDENTIAL_CACHE_SIZE: int = 10000  # verified credentials kept by the service, see user/credential_cache.py
+CREDENTIAL_CACHE_TTL: float = 300.0  # seconds the service trusts verified credentials without checking the database
+
+# asyncio facade, see database/async_database.py
+ASYNC_DATABASE_THREADS: int = 4  # threads running the SQLite work of an AsyncDatabase, each with its own connection
+ASYNC_DATABASE_MAX_PENDING: int = 256  # calls handed to the threads at once, the others wait in the event loop
+ASYNC_DATABASE_TIMEOUT: float | None = 30.0  # seconds a call may take before its statement is interrupted, None for no limit
+
+# availability snapshot, see database/availability_snapshot.py
+AVAILABILITY_SNAPSHOT: bool = True  # commits changing events keep a memory-mapped snapshot of the seats available up to date
+AVAILABILITY_SNAPSHOT_READ_RETRIES: int = 100  # reads of a snapshot being written before the reader falls back to SQL
+
+# event shards, see database/shards.py
+SHARD_BARCODE_BLOCK: int = 100000  # barcode counters leased to a shard at a time, when it is created and then on demand
+SHARD_BARCODE_RENEW: int = 10000  # a shard with fewer counters left is leased a new block before its next reservation
+
+# event import, see database/event_importer.py
+IMPORT_CHUNK_SIZE: int = 5000  # events written by one transaction, the import resumes after the last one committed
+IMPORT_READ_SIZE: int = 64 * 1024  # bytes read at once from a JSON array file
+
+# logging, see utilities/logging_util.py
+LOG_LEVEL: str = os.environ.get('SPECTACOLE_LOG_LEVEL', 'INFO')  # lowest level logged, e.g. DEBUG or WARNING
+LOG_FORMAT: str = os.environ.get('SPECTACOLE_LOG_FORMAT', 'text')  # "text" or "json", one object per line
+
+# instrumentation, see database/instrumentation.py
+SLOW_QUERY_THRESHOLD: float = 0.1  # seconds above which a statement is logged as slow
+METRICS_LATENCY_BUCKETS: tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# barcodes, see database/barcodes.py
+# key of the permutation giving out the barcodes, set it once per deployment and never change it afterwards: another
+# key would issue again barcodes of existing reservations
+BARCODE_SECRET: str = os.environ.get('SPECTACOLE_BARCODE_SECRET', 'spectacole')
+
+# ticket rendering, see tickets/worker.py
+TICKET_WORKER_PROCESSES: int = 2  # processes rendering PDF tickets in the background
+TICKET_WORKER_POLL_INTERVAL: float = 1.0  # seconds between two checks for pending tickets of the standalone worker
+TICKET_ORDER_PDF: bool = False  # one pdf with a page per seat for every reservation instead of one pdf per seat
+TICKET_RENDER_TIMEOUT: float = 60.0  # seconds after which a ticket still rendering is considered lost and rendered again
@@ -1,39 +1,43 @@
+import pathlib
 import sqlite3
-import json
 
+from database.database import Database
+from database.event_importer import EventImporter
+from database.migrations import migrate
 
-def create_tables(db_con: sqlite3.Connection, db_cursor: sqlite3.Cursor):
-    db_cursor.execute(
-        'CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, email VARCHAR(255) NOT NULL UNIQUE, password VARCHAR(255) NOT NULL, is_admin INTEGER)'
-    )
-    db_cursor.execute(
-        'CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(255) UNIQUE, date REAL NOT NULL, price REAL NOT NULL, seats_available INTEGER)'
-    )
-    db_cursor.execute(
-        'CREATE TABLE IF NOT EXISTS reservation (user_id INTEGER, event_id INTEGER, barcode INTEGER UNIQUE, FOREIGN KEY (user_id) REFERENCES users(id), FOREIGN KEY (event_id) REFERENCES events(id))'
-    )
 
-    db_con.commit()
+def create_tables(db_con: sqlite3.Connection, db_cursor: sqlite3.Cursor):
+    # the schema is defined by the migrations, see database/migrations.py
+    if db_con.in_transaction:
+        db_con.commit()
+    migrate(connection=db_con)
 
 
 def insert_events(db_con: sqlite3.Connection, db_cursor: sqlite3.Cursor):
-    with open('./spectacole.json') as f:
-        events = json.load(f)
-
-    tuple_events = [tuple(event) for event in events]
-
-    db_cursor.executemany(
-        "INSERT INTO events (name, date, price, seats_available) VALUES (?, ?, ?, ?)",
-        tuple_events
-    )
-
-    db_con.commit()
+    # streamed in chunks and upserted on the name, see database/event_importer.py, so it can be run again
+    if db_con.in_transaction:
+        db_con.commit()
+    database_path: pathlib.Path = pathlib.Path(db_cursor.execute('PRAGMA database_list').fetchone()[2])
+    database: Database = Database(database_path=database_path)
+    EventImporter(database=database).run(path=pathlib.Path('./spectacole.json'))
+    database.close()
 
 
 def drop_tables(db_con: sqlite3.Connection, db_cursor: sqlite3.Cursor):
     db_cursor.execute("DROP TABLE users")
     db_cursor.execute("DROP TABLE events")
     db_cursor.execute("DROP TABLE reservation")
+    db_cursor.execute("DROP TABLE ticket_jobs")
+    db_cursor.execute("DROP TABLE barcode_sequence")
+    db_cursor.execute("DROP TABLE barcode_skips")
+    db_cursor.execute("DROP TABLE events_version")
+    db_cursor.execute("DROP TABLE event_imports")
+    db_cursor.execute("DROP TABLE event_sales")
+    db_cursor.execute("DROP TABLE event_shards")
+    db_cursor.execute("DROP TABLE shard_files")
+    db_cursor.execute("DROP TABLE barcode_lease")
+    db_cursor.execute("DROP TABLE barcode_blocks")
+    db_cursor.execute("DROP TABLE schema_migrations")
     db_con.commit()
 
 
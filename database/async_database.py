@@ -0,0 +1,192 @@
+"""
+    Asyncio facade of Database, for front ends serving many clients from one event loop.
+
+    Every call runs on a bounded pool of threads, each with its own Database and pooled connection, so the event loop
+    never waits for SQLite; the tickets of the reservations are rendered by a TicketWorker in a process pool. At most
+    max_pending calls are handed to the threads at once, the others wait in the event loop, where waiting costs
+    nothing. The timeout of a call includes its wait for a thread. A call cancelled, or taking longer than its timeout,
+    is dropped if no thread started it yet, otherwise the statements it is running are interrupted
+    (sqlite3.Connection.interrupt, on the connections of the shards too) and its transaction rolled back. A write
+    interrupted while it commits may still be committed: the caller gets the TimeoutError or CancelledError and should
+    check the reservations of the user before trying again.
+
+    Usage:
+        async with AsyncDatabase() as database:
+            barcodes = await database.make_reservation(user=user, event=3, seats=2, timeout=5.0)
+"""
+import asyncio
+import logging
+import pathlib
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from configs.config import DATABASE, ASYNC_DATABASE_THREADS, ASYNC_DATABASE_MAX_PENDING, ASYNC_DATABASE_TIMEOUT
+from database.database import Database
+from database.event_catalogue import EventCatalogue
+from database.instrumentation import Metrics
+from database.shards import is_sharded
+from tickets.worker import TicketWorker
+from user.credential_cache import CredentialCache
+from user.identity import Identity
+from user.user import User
+from utilities.logging_util import init_logger
+
+T = TypeVar('T')
+
+
+class AsyncDatabase:
+    def __init__(self, database_path: pathlib.Path = DATABASE, threads: int = ASYNC_DATABASE_THREADS,
+                 max_pending: int = ASYNC_DATABASE_MAX_PENDING, timeout: float | None = ASYNC_DATABASE_TIMEOUT,
+                 ticket_worker: TicketWorker | None = None, metrics: Metrics | None = None):
+        """
+            Constructor to initialize the logger, the database threads, the ticket worker and the event catalogue
+            :param database_path: path to the sqlite database file
+            :param threads: number of threads running database work, each with its own connection
+            :param max_pending: calls handed to the threads at once
+            :param timeout: seconds a call may take when it does not give its own timeout, None for no limit
+            :param ticket_worker: worker rendering the tickets, a worker of the facade is started when not given
+            :param metrics: metrics the statements, lock waits and commits of the threads are reported to
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = database_path
+        self.timeout: float | None = timeout
+        self.metrics: Metrics | None = metrics
+        self.__own_ticket_worker: bool = ticket_worker is None
+        self.ticket_worker: TicketWorker = ticket_worker or TicketWorker(database_path=database_path, metrics=metrics)
+        self.credential_cache: CredentialCache = CredentialCache()
+        # the events of a database with shards are in the shards, see ReservationServer
+        self.event_catalogue: EventCatalogue | None = None if is_sharded(database_path=database_path) \
+            else EventCatalogue(database_path=database_path)
+        self.__pending: asyncio.Semaphore = asyncio.Semaphore(max_pending)
+        self.__thread_state: threading.local = threading.local()
+        self.__databases: list[Database] = []
+        # Database of the thread running every call, to interrupt the statement of a call cancelled while it runs
+        self.__running: dict[object, Database] = {}
+        self.__lock: threading.Lock = threading.Lock()
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='async-database', initializer=self.__init_database
+        )
+
+    def __init_database(self):
+        database: Database = Database(
+            database_path=self.database_path, ticket_worker=self.ticket_worker, credential_cache=self.credential_cache,
+            event_catalogue=self.event_catalogue, metrics=self.metrics
+        )
+        self.__thread_state.database = database
+        with self.__lock:
+            self.__databases.append(database)
+
+    async def __aenter__(self) -> 'AsyncDatabase':
+        return self
+
+    async def __aexit__(self, *exception):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self):
+        """
+            Wait for the calls handed to the threads, then close the databases, the ticket worker and the catalogue
+            :return: None
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self.__lock:
+            databases, self.__databases = self.__databases, []
+        for database in databases:
+            database.close()
+        if self.__own_ticket_worker:
+            self.ticket_worker.close()
+        if self.event_catalogue is not None:
+            self.event_catalogue.close()
+
+    async def run(self, operation: Callable[[Database], T], timeout: float | None = None) -> T:
+        """
+            Run an operation with the Database of a database thread
+            :param operation: callable taking the Database, it must not keep it once it returns
+            :param timeout: seconds the call may take, waiting for a thread included, the timeout of the facade when
+            not given
+            :return: the value returned by the operation
+            :raises TimeoutError: if the call took longer than the timeout, its statement was interrupted
+        """
+        timeout = self.timeout if timeout is None else timeout
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        deadline: float | None = None if timeout is None else loop.time() + timeout
+        try:
+            await asyncio.wait_for(self.__pending.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning('Database call dropped after waiting {}s for a database thread'.format(timeout))
+            raise
+        call: object = object()
+        try:
+            future: Future = self.executor.submit(self.__execute, call, operation)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout=None if deadline is None else max(deadline - loop.time(), 0)
+                )
+            except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+                # a call not started yet is just dropped, a running one is interrupted
+                if not future.cancel():
+                    self.__interrupt(call=call)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.logger.warning('Database call interrupted after {}s'.format(timeout))
+                raise
+        finally:
+            self.__pending.release()
+
+    def __execute(self, call: object, operation: Callable[[Database], T]) -> T:
+        database: Database = self.__thread_state.database
+        with self.__lock:
+            self.__running[call] = database
+        try:
+            return operation(database)
+        finally:
+            with self.__lock:
+                del self.__running[call]
+
+    def __interrupt(self, call: object):
+        """
+            Interrupt the statements of a running call, on the connections of the shards it uses too. The lock keeps
+            the thread from starting another call meanwhile, and interrupting a connection running no statement does
+            nothing.
+            :return: None
+        """
+        with self.__lock:
+            database: Database | None = self.__running.get(call)
+            if database is not None:
+                database.interrupt()
+
+    async def check_user(self, user: User, timeout: float | None = None) -> bool:
+        """
+            See Database.check_user
+        """
+        return await self.run(lambda database: database.check_user(user=user), timeout=timeout)
+
+    async def register_user(self, user: User, timeout: float | None = None) -> bool | str:
+        """
+            See Database.register_user
+        """
+        return await self.run(lambda database: database.register_user(user=user), timeout=timeout)
+
+    async def view_events(self, timeout: float | None = None) -> bool | list[dict]:
+        """
+            See Database.view_events, the answer is shared by the callers so they must not modify it
+        """
+        return await self.run(lambda database: database.view_events(), timeout=timeout)
+
+    async def make_reservation(self, user: User | Identity, event: int, seats: int = 1, timeout: float | None = None) -> bool | list:
+        """
+            See Database.make_reservation, the tickets are rendered in the process pool of the ticket worker
+        """
+        return await self.run(lambda database: database.make_reservation(user=user, event=event, seats=seats), timeout=timeout)
+
+    async def cancel_reservation(self, user: User | Identity, barcode: int, timeout: float | None = None) -> bool:
+        """
+            See Database.cancel_reservation
+        """
+        return await self.run(lambda database: database.cancel_reservation(user=user, barcode=barcode), timeout=timeout)
+
+    async def get_user_info(self, user: User | Identity, timeout: float | None = None) -> bool | dict:
+        """
+            See Database.get_user_info
+        """
+        return await self.run(lambda database: database.get_user_info(user=user), timeout=timeout)
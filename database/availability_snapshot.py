@@ -0,0 +1,376 @@
+"""
+    Memory-mapped snapshot of the seats available, shared by every process using a database.
+
+    The snapshot is a binary file next to the database (<stem>-availability.snapshot) holding the upcoming events as
+    columns of fixed-size values, so a process can answer "how many seats are left for event X" or list the events by
+    mapping the file and reading the values in place, without opening SQLite or parsing rows:
+        - a header: magic, sequence, events_version the snapshot reflects, number of events, size of the names
+        - the id, date, price and seats_available of every event, each column in (date, id) order
+        - the ids sorted, with the position of every event in the columns, to find an event by bisection
+        - the offsets of the names of the events and the names, UTF-8 encoded
+
+    Database keeps the snapshot up to date while it holds the write lock, just before every commit changing events:
+        - the seats taken or given back by the transaction are written in place, as a sequence lock: the sequence is
+        odd while the seats are written, readers read again when it was odd or changed while they were reading, up to
+        AVAILABILITY_SNAPSHOT_READ_RETRIES times before they give up and read from SQL
+        - when the snapshot does not reflect exactly the version of the events table the transaction started from (the
+        events were changed by something else, e.g. an import, or a process died between writing the snapshot and
+        committing) or does not exist, or when its sequence is odd (a process died while writing it, the writers
+        hold the write lock so no other one is writing), it is published again: a new file is written then renamed
+        over the former one, readers map the new file on their next read
+    A transaction failing after the snapshot was written removes it, readers fall back to SQL until it is published
+    again. Readers given a connection do not use a snapshot whose version is ahead of the committed events_version:
+    its seats were written by a transaction not committed yet, or never committed, and are read from SQL instead.
+
+    Usage: python -m database.availability_snapshot [--database PATH]     publish the snapshot of a database
+"""
+import argparse
+import bisect
+import datetime
+import mmap
+import os
+import pathlib
+import sqlite3
+import struct
+import time
+
+from array import array
+
+from configs.config import DATABASE, AVAILABILITY_SNAPSHOT_READ_RETRIES
+from database.connection_pool import ConnectionPool, get_pool
+from database.event_filter import EventFilter
+from event.event import EventRecord
+
+MAGIC: bytes = b'SPECSNP1'
+# magic, sequence, events_version, number of events, bytes of the names
+HEADER: struct.Struct = struct.Struct('<8sQqQQ')
+SEQUENCE, VERSION = 1, 2  # indexes of the header fields in the 8-byte words of the file
+
+
+def snapshot_path(database_path: pathlib.Path) -> pathlib.Path:
+    """
+        :return: path of the availability snapshot of a database, next to it
+    """
+    database_path = pathlib.Path(database_path)
+    return database_path.with_name('{}-availability.snapshot'.format(database_path.stem))
+
+
+def publish_snapshot(connection: sqlite3.Connection, path: pathlib.Path) -> int:
+    """
+        Write the snapshot of the upcoming events to a new file and rename it over the snapshot. Inside a write
+        transaction the snapshot includes the changes of the transaction, otherwise the events are read in a read
+        transaction so they match the version recorded.
+        :param connection: connection to the database
+        :param path: path of the snapshot
+        :return: events_version of the snapshot
+    """
+    reading: bool = not connection.in_transaction
+    if reading:
+        connection.execute('BEGIN')
+    try:
+        version: int = connection.execute("SELECT version FROM events_version WHERE id=1").fetchone()[0]
+        cursor: sqlite3.Cursor = connection.cursor()
+        cursor.row_factory = None
+        events: list[tuple] = cursor.execute(
+            "SELECT id, name, date, price, seats_available FROM events WHERE date>? ORDER BY date, id",
+            (datetime.datetime.now().timestamp(), )
+        ).fetchall()
+    finally:
+        if reading:
+            connection.execute('COMMIT')
+    names: list[bytes] = [event[1].encode('utf-8') for event in events]
+    offsets: array = array('q', [0])
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    index: list[tuple[int, int]] = sorted((event[0], position) for position, event in enumerate(events))
+    sections: list[array] = [
+        array('q', [event[0] for event in events]), array('d', [event[2] for event in events]),
+        array('d', [event[3] for event in events]), array('q', [event[4] for event in events]),
+        array('q', [event_id for event_id, _ in index]), array('q', [position for _, position in index]), offsets
+    ]
+    path = pathlib.Path(path)
+    temporary: pathlib.Path = path.with_name('{}.{}.tmp'.format(path.name, os.getpid()))
+    with open(temporary, 'wb') as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, 0, version, len(events), offsets[-1]))
+        for section in sections:
+            snapshot_file.write(section.tobytes())
+        snapshot_file.write(b''.join(names))
+    os.replace(temporary, path)
+    return version
+
+
+def remove_snapshot(path: pathlib.Path):
+    """
+        Remove a snapshot that may no longer match its database, the next commit changing events publishes it again
+        :return: None
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class MappedSnapshot:
+    """
+        Snapshot file mapped in memory, with its columns as views of the mapping
+    """
+    def __init__(self, path: pathlib.Path, writable: bool = False):
+        with open(path, 'r+b' if writable else 'rb') as snapshot_file:
+            status: os.stat_result = os.fstat(snapshot_file.fileno())
+            self.identity: tuple[int, int] = (status.st_dev, status.st_ino)
+            self.__mapping: mmap.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, _, _, count, names_size = HEADER.unpack_from(self.__mapping)
+        if magic != MAGIC:
+            self.__mapping.close()
+            raise ValueError('{} is not an availability snapshot'.format(path))
+        self.count: int = count
+        view: memoryview = memoryview(self.__mapping)
+        self.words: memoryview = view[:HEADER.size].cast('q')
+        columns: list[memoryview] = []
+        offset: int = HEADER.size
+        for code, length in (('q', count), ('d', count), ('d', count), ('q', count), ('q', count), ('q', count), ('q', count + 1)):
+            columns.append(view[offset:offset + 8 * length].cast(code))
+            offset += 8 * length
+        self.ids, self.dates, self.prices, self.seats, self.index_ids, self.index_positions, self.name_offsets = columns
+        self.names: memoryview = view[offset:offset + names_size]
+        self.__views: list[memoryview] = [self.words, *columns, self.names, view]
+
+    def close(self):
+        # the views must be released before the mapping can be closed
+        for view in self.__views:
+            view.release()
+        self.__mapping.close()
+
+    def position(self, event_id: int) -> int | None:
+        """
+            :return: position of an event in the columns, None if it is not in the snapshot
+        """
+        index: int = bisect.bisect_left(self.index_ids, event_id)
+        if index < self.count and self.index_ids[index] == event_id:
+            return self.index_positions[index]
+        return None
+
+    def record(self, position: int, seats: int) -> EventRecord:
+        return EventRecord(
+            self.ids[position], bytes(self.names[self.name_offsets[position]:self.name_offsets[position + 1]]).decode('utf-8'),
+            self.dates[position], self.prices[position], seats
+        )
+
+
+class AvailabilitySnapshot:
+    """
+        Reader of the availability snapshot of a database. Every read checks that the mapped file is still the
+        snapshot (one stat of the file) and maps the new one when it was published again. A read that keeps finding
+        the seats being written raises TimeoutError, the caller reads them from SQL instead.
+    """
+    def __init__(self, database_path: pathlib.Path = DATABASE, retries: int = AVAILABILITY_SNAPSHOT_READ_RETRIES):
+        """
+            :param database_path: path of the database
+            :param retries: reads of values being written before giving up
+        """
+        self.path: pathlib.Path = snapshot_path(database_path=database_path)
+        self.retries: int = retries
+        self.__snapshot: MappedSnapshot | None = None
+        # version of the mapped snapshot last found committed in the database
+        self.__committed: int | None = None
+
+    def refresh(self, connection: sqlite3.Connection | None = None) -> bool:
+        """
+            Map the current snapshot if it was published since the last read
+            :param connection: connection to the database, to check that the version of the snapshot was committed
+            whenever it changed since the last check
+            :return: True if there is a snapshot to read, False if it does not exist or is ahead of the database
+        """
+        try:
+            status: os.stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            self.close()
+            return False
+        if self.__snapshot is None or self.__snapshot.identity != (status.st_dev, status.st_ino):
+            self.close()
+            try:
+                self.__snapshot = MappedSnapshot(path=self.path)
+            except (FileNotFoundError, ValueError):
+                return False  # removed or replaced meanwhile
+        if connection is None:
+            return True
+        try:
+            version: int = self.version
+        except TimeoutError:
+            return False
+        if version != self.__committed:
+            if version > connection.execute("SELECT version FROM events_version WHERE id=1").fetchone()[0]:
+                return False
+            self.__committed = version
+        return True
+
+    @property
+    def version(self) -> int:
+        """
+            events_version the snapshot reflects, call refresh() first
+        """
+        return self.__consistent(lambda snapshot: snapshot.words[VERSION])
+
+    def seats_available(self, event_id: int) -> int | None:
+        """
+            Seats left for an event, call refresh() first
+            :param event_id: event id
+            :return: seats available, None if the event is not in the snapshot or has passed
+        """
+        snapshot: MappedSnapshot = self.__snapshot
+        position: int | None = snapshot.position(event_id=event_id)
+        if position is None or snapshot.dates[position] <= datetime.datetime.now().timestamp():
+            return None
+        return self.__consistent(lambda mapped: mapped.seats[position])
+
+    def view(self) -> list[dict]:
+        """
+            Upcoming events with seats available in the format of Database.view_events, call refresh() first
+            :return: list of dictionaries {id: {"name", "date", "price", "seats_available"}}, ordered by date
+        """
+        snapshot: MappedSnapshot = self.__snapshot
+        start: int = bisect.bisect_right(snapshot.dates, datetime.datetime.now().timestamp())
+        seats: list[int] = self.__consistent(lambda mapped: mapped.seats[start:].tolist())
+        # the columns are read at once, the names from one copy of their bytes
+        names: bytes = bytes(snapshot.names)
+        offsets: list[int] = snapshot.name_offsets[start:].tolist()
+        return [
+            {event_id: {'name': names[offsets[index]:offsets[index + 1]].decode('utf-8'), 'date': date, 'price': price, 'seats_available': available}}
+            for index, (event_id, date, price, available) in enumerate(zip(
+                snapshot.ids[start:].tolist(), snapshot.dates[start:].tolist(), snapshot.prices[start:].tolist(), seats
+            ))
+            if available > 0
+        ]
+
+    def page(self, after: tuple[float, int] | None, page_size: int, event_filter: EventFilter) -> list[EventRecord]:
+        """
+            Page of the event listing, see Database.list_events, call refresh() first
+            :param after: (date, id) of the last event of the previous page, None for the first page
+            :param page_size: maximum number of events
+            :param event_filter: filters of the listing
+            :return: list of EventRecord
+        """
+        snapshot: MappedSnapshot = self.__snapshot
+        date, event_id = event_filter.start(now=datetime.datetime.now().timestamp(), after=after)
+        start: int = bisect.bisect_left(snapshot.dates, date)
+        while start < snapshot.count and snapshot.dates[start] == date and snapshot.ids[start] <= event_id:
+            start += 1
+
+        def read(mapped: MappedSnapshot) -> list[EventRecord]:
+            events: list[EventRecord] = []
+            for position in range(start, mapped.count):
+                if len(events) == page_size or (event_filter.date_to is not None and mapped.dates[position] > event_filter.date_to):
+                    break
+                seats: int = mapped.seats[position]
+                if seats >= event_filter.min_seats:
+                    event: EventRecord = mapped.record(position=position, seats=seats)
+                    if event_filter.matches(event):
+                        events.append(event)
+            return events
+        return self.__consistent(read)
+
+    def close(self):
+        if self.__snapshot is not None:
+            self.__snapshot.close()
+            self.__snapshot = None
+        self.__committed = None
+
+    def __consistent(self, read):
+        """
+            Read values the writers change in place, again until no writer changed them meanwhile
+            :param read: callable reading from the mapped snapshot
+            :return: the value read
+            :raises TimeoutError: the values were being written at every one of the retries, e.g. the writer died in
+            the middle of its write and the snapshot waits for the next writer to publish it again
+        """
+        snapshot: MappedSnapshot = self.__snapshot
+        for _ in range(self.retries):
+            sequence: int = snapshot.words[SEQUENCE]
+            if sequence % 2 == 0:
+                value = read(snapshot)
+                if snapshot.words[SEQUENCE] == sequence:
+                    return value
+            time.sleep(0)
+        raise TimeoutError('The availability snapshot {} is being written'.format(self.path))
+
+
+class SnapshotWriter:
+    """
+        Keeps the snapshot of a database up to date, see Database._run_in_transaction; every method must be called
+        while the write lock of the database is held
+    """
+    def __init__(self, database_path: pathlib.Path):
+        self.path: pathlib.Path = snapshot_path(database_path=database_path)
+        self.__snapshot: MappedSnapshot | None = None
+
+    def apply(self, connection: sqlite3.Connection, changes: list[tuple[dict[int, int], int]], republish: bool = False):
+        """
+            Write the seats changed by the open transaction in the snapshot, or publish it again
+            :param connection: connection of the open write transaction
+            :param changes: changes of seats_available by event id, each with the events_version after it
+            :param republish: publish the snapshot again, the events were changed by more than seats
+            :return: None
+        """
+        if republish or not self.__map():
+            self.close()
+            publish_snapshot(connection=connection, path=self.path)
+            return
+        snapshot: MappedSnapshot = self.__snapshot
+        for seats, version in changes:
+            # another writer changed the events without updating the snapshot, wrote it and did not commit, or died
+            # in the middle of the write
+            if snapshot.words[VERSION] != version - len(seats) or snapshot.words[SEQUENCE] % 2:
+                self.close()
+                publish_snapshot(connection=connection, path=self.path)
+                return
+            snapshot.words[SEQUENCE] += 1
+            for event_id, change in seats.items():
+                position: int | None = snapshot.position(event_id=event_id)
+                if position is not None:
+                    snapshot.seats[position] += change
+            snapshot.words[VERSION] = version
+            snapshot.words[SEQUENCE] += 1
+
+    def remove(self):
+        """
+            Remove the snapshot after a failed transaction wrote it
+            :return: None
+        """
+        self.close()
+        remove_snapshot(path=self.path)
+
+    def close(self):
+        if self.__snapshot is not None:
+            self.__snapshot.close()
+            self.__snapshot = None
+
+    def __map(self) -> bool:
+        """
+            Map the current snapshot if it was published since the last write
+            :return: True if there is a snapshot to write, False if it does not exist
+        """
+        try:
+            status: os.stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self.__snapshot is None or self.__snapshot.identity != (status.st_dev, status.st_ino):
+            self.close()
+            try:
+                self.__snapshot = MappedSnapshot(path=self.path, writable=True)
+            except (FileNotFoundError, ValueError):
+                return False
+        return True
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Publish the availability snapshot of a database')
+    parser.add_argument('--database', type=pathlib.Path, default=DATABASE, help='database the snapshot is published for')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    pool: ConnectionPool = get_pool(database_path=arguments.database)
+    database_connection: sqlite3.Connection = pool.acquire()
+    print('snapshot of events version {} published to {}'.format(
+        publish_snapshot(connection=database_connection, path=snapshot_path(database_path=arguments.database)),
+        snapshot_path(database_path=arguments.database)
+    ))
+    pool.release(connection=database_connection)
@@ -0,0 +1,247 @@
+"""
+    Barcode allocation.
+
+    A barcode is an EAN-8 code: 7 digits of payload followed by their check digit. The payload of the n-th ticket is
+    the image of n by a keyed permutation of [1, 10^7), so barcodes are unique by construction, without looking at the
+    reservations already made, and the next barcode cannot be guessed from the previous ones without the secret.
+
+    The permutation is a Feistel network on the two digits of a number written in mixed radix 3125 x 3200 (= 10^7):
+    every round adds a keyed function of one half to the other half, modulo its radix, and swaps them, so it is a
+    permutation of exactly [0, 10^7) without walking through values out of range. The round functions are tables
+    derived from the secret. The counter is persisted in the barcode_sequence table and advanced by one UPDATE per
+    allocation, whatever the size of the block. The counters of a shard (see database/shards.py) are blocks leased from
+    the sequence of the main database: barcode_lease holds the end of the block being used, barcode_blocks the blocks
+    leased after it, started in order once it is used up.
+"""
+import functools
+import hashlib
+import sqlite3
+
+from configs.config import BARCODE_SECRET
+
+PAYLOAD_DIGITS: int = 7
+PAYLOADS: int = 10 ** PAYLOAD_DIGITS  # payload 0 is never issued, a barcode of 0 is not a valid request value
+RADICES: tuple[int, int] = (3125, 3200)  # 3125 * 3200 = 10^7, the ranges of the two halves of the Feistel network
+ROUNDS: int = 4  # even, so the halves are in their original ranges after the last round
+# weighted digit sum of every 4 digit number, weights 3, 1, 3, 1 from the last digit
+_WEIGHTED_SUMS: tuple[int, ...] = tuple(
+    3 * (value % 10 + value // 100 % 10) + value // 10 % 10 + value // 1000 for value in range(10 ** 4)
+)
+
+
+def ean8_check_digit(payload: int) -> int:
+    """
+        Check digit of an EAN-8 code, the digits are weighted 3 and 1 alternately starting with the last one
+        :param payload: the 7 digits of the code before the check digit
+        :return: check digit
+    """
+    high, low = divmod(payload, 10 ** 4)  # both halves have their last digit at an odd position from the end
+    return -(_WEIGHTED_SUMS[high] + _WEIGHTED_SUMS[low]) % 10
+
+
+class BarcodeAllocator:
+    def __init__(self, secret: str = BARCODE_SECRET):
+        """
+            Constructor to compute the round functions of the permutation, a table with a value for every right half
+            :param secret: key of the permutation, the same secret must be used for the whole life of a database
+        """
+        self.__rounds: list[tuple[tuple[int, ...], int]] = []
+        for index in range(ROUNDS):
+            # the right half of even rounds is in [0, 3200) and their left half in [0, 3125), the other way round for
+            # odd rounds
+            size, modulus = RADICES[1 - index % 2], RADICES[index % 2]
+            digest: bytes = hashlib.blake2b(
+                'round{}'.format(index).encode(), key=secret.encode()[:64], digest_size=64
+            ).digest()
+            stream: bytes = b''.join(
+                hashlib.blake2b(block.to_bytes(4, 'big'), key=digest, digest_size=64).digest()
+                for block in range(size * 4 // 64 + 1)
+            )
+            self.__rounds.append((
+                tuple(int.from_bytes(stream[4 * value:4 * value + 4], 'big') % modulus for value in range(size)),
+                modulus
+            ))
+
+    def __feistel(self, value: int) -> int:
+        left, right = divmod(value, RADICES[1])
+        for table, modulus in self.__rounds:
+            left, right = right, (left + table[right]) % modulus
+        return left * RADICES[1] + right
+
+    def __feistel_inverse(self, value: int) -> int:
+        left, right = divmod(value, RADICES[1])
+        for table, modulus in reversed(self.__rounds):
+            left, right = (right - table[left]) % modulus, left
+        return left * RADICES[1] + right
+
+    def permute(self, counter: int) -> int:
+        """
+            Payload of the counter-th barcode
+            :param counter: value in [1, 10^7)
+            :return: payload in [1, 10^7)
+        """
+        payload: int = self.__feistel(counter)
+        while payload == 0:  # 0 is not issued, its counter gets the payload of the counter mapped to 0
+            payload = self.__feistel(payload)
+        return payload
+
+    def invert(self, payload: int) -> int:
+        """
+            Counter of a payload, inverse of permute()
+            :param payload: value in [1, 10^7)
+            :return: counter in [1, 10^7)
+        """
+        counter: int = self.__feistel_inverse(payload)
+        while counter == 0:
+            counter = self.__feistel_inverse(counter)
+        return counter
+
+    def barcode(self, counter: int) -> int:
+        """
+            :param counter: value in [1, 10^7)
+            :return: the counter-th barcode, payload followed by its check digit
+        """
+        payload: int = self.permute(counter)
+        return payload * 10 + ean8_check_digit(payload)
+
+    def counter_of(self, barcode: int) -> int | None:
+        """
+            :param barcode: any barcode, including the random ones issued before the allocator
+            :return: the counter the allocator would issue this barcode for, None if it never issues it
+        """
+        payload, check = divmod(barcode, 10)
+        if not 0 < payload < PAYLOADS or ean8_check_digit(payload) != check:
+            return None
+        return self.invert(payload)
+
+    def allocate(self, cursor: sqlite3.Cursor, count: int) -> list[int]:
+        """
+            Reserve a block of barcodes, must be called inside a write transaction so the block is given back if the
+            transaction is rolled back
+            :param cursor: cursor of the connection running the transaction
+            :param count: number of barcodes
+            :return: list of barcodes
+        """
+        barcodes: list[int] = []
+        while len(barcodes) < count:
+            # the barcodes of a shard may come from the end of a block and the start of the next one
+            start, end = self.__reserve_counters(cursor=cursor, count=count - len(barcodes), partial=True)
+            skipped: set[int] = {row[0] for row in cursor.execute(
+                "SELECT counter FROM barcode_skips WHERE counter>=? AND counter<?", (start, end)
+            )}
+            barcodes.extend(self.barcode(counter) for counter in range(start, end) if counter not in skipped)
+        return barcodes
+
+    def lease(self, cursor: sqlite3.Cursor, count: int) -> tuple[int, int]:
+        """
+            Take a block of counters out of the sequence of this database for the sequence of another one, must be
+            called inside a write transaction
+            :param cursor: cursor of the connection running the transaction
+            :param count: number of counters
+            :return: tuple with the first counter of the block and the counter after its end
+        """
+        return self.__reserve_counters(cursor=cursor, count=count)
+
+    @staticmethod
+    def start_lease(cursor: sqlite3.Cursor, start: int, end: int, skipped: list[int]):
+        """
+            Start the sequence of a database with a block leased from another one, must be called inside a write
+            transaction of a database whose sequence did not start
+            :param cursor: cursor of the connection running the transaction
+            :param start: first counter of the block
+            :param end: counter after the end of the block
+            :param skipped: counters of the block skipped by the database it was leased from
+            :return: None
+        """
+        cursor.execute("INSERT INTO barcode_sequence (id, next) VALUES (1, ?)", (start, ))
+        cursor.execute("INSERT INTO barcode_lease (id, end) VALUES (1, ?)", (end, ))
+        cursor.executemany("INSERT OR IGNORE INTO barcode_skips (counter) VALUES (?)", [(counter, ) for counter in skipped])
+
+    @staticmethod
+    def extend_lease(cursor: sqlite3.Cursor, start: int, end: int, skipped: list[int]):
+        """
+            Add a block leased from another database to the sequence of a database, it is started once the blocks before
+            it are used up, or starts the sequence with start_lease if it was not leased a block yet; must be called
+            inside a write transaction
+            :param cursor: cursor of the connection running the transaction
+            :param start: first counter of the block
+            :param end: counter after the end of the block
+            :param skipped: counters of the block skipped by the database it was leased from
+            :return: None
+        """
+        if cursor.execute("SELECT 1 FROM barcode_lease WHERE id=1").fetchone() is None:
+            BarcodeAllocator.start_lease(cursor=cursor, start=start, end=end, skipped=skipped)
+            return
+        cursor.execute("INSERT INTO barcode_blocks (start, end) VALUES (?, ?)", (start, end))
+        cursor.executemany("INSERT OR IGNORE INTO barcode_skips (counter) VALUES (?)", [(counter, ) for counter in skipped])
+
+    @staticmethod
+    def leased_left(cursor: sqlite3.Cursor) -> int | None:
+        """
+            :param cursor: cursor of a connection to the database
+            :return: counters of the blocks leased to the database not issued yet, None for a database whose sequence
+            is not leased from another one
+        """
+        row: tuple | None = cursor.execute(
+            "SELECT l.end - s.next + (SELECT coalesce(sum(b.end - b.start), 0) FROM barcode_blocks b) "
+            "FROM barcode_lease l JOIN barcode_sequence s ON s.id=1 WHERE l.id=1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def __reserve_counters(self, cursor: sqlite3.Cursor, count: int, partial: bool = False) -> tuple[int, int]:
+        """
+            Advance the persisted counter by count, up to the end of the lease of a shard; the next block leased to the
+            shard is started when the current one is used up
+            :param partial: when the current block has fewer than count counters left, take the ones it has
+            :return: tuple with the first counter of the block and the counter after its end
+        """
+        row: sqlite3.Row | None = cursor.execute(
+            "UPDATE barcode_sequence SET next=next+? WHERE id=1 AND next+?<=coalesce((SELECT end FROM barcode_lease WHERE id=1), ?) "
+            "RETURNING next",
+            (count, count, PAYLOADS)
+        ).fetchone()
+        if row:
+            return row[0] - count, row[0]
+        row = cursor.execute(
+            "SELECT s.next, coalesce(l.end, ?) FROM barcode_sequence s LEFT JOIN barcode_lease l ON l.id=1 WHERE s.id=1",
+            (PAYLOADS, )
+        ).fetchone()
+        if row is None:
+            self.__initialize(cursor=cursor)
+            return self.__reserve_counters(cursor=cursor, count=count, partial=partial)
+        start, end = row
+        if partial and start < end:
+            cursor.execute("UPDATE barcode_sequence SET next=? WHERE id=1", (end, ))
+            return start, end
+        # a database without a lease, or a block of a shard too short for count, has no next block to go on with
+        block: tuple | None = None if start < end else cursor.execute(
+            "DELETE FROM barcode_blocks WHERE start=(SELECT min(start) FROM barcode_blocks) RETURNING start, end"
+        ).fetchone()
+        if block is None:
+            raise RuntimeError('Cannot allocate {} barcodes, the barcodes of this database are almost all issued'.format(count))
+        cursor.execute("UPDATE barcode_sequence SET next=? WHERE id=1", (block[0], ))
+        cursor.execute("UPDATE barcode_lease SET end=? WHERE id=1", (block[1], ))
+        return self.__reserve_counters(cursor=cursor, count=count, partial=partial)
+
+    def __initialize(self, cursor: sqlite3.Cursor):
+        """
+            Start the sequence of a database, the counters of the barcodes issued before the allocator existed are
+            skipped so they are never issued twice
+            :return: None
+        """
+        legacy: list[tuple[int]] = [
+            (counter, ) for counter in (self.counter_of(row[0]) for row in cursor.execute("SELECT barcode FROM reservation"))
+            if counter is not None
+        ]
+        cursor.executemany("INSERT OR IGNORE INTO barcode_skips (counter) VALUES (?)", legacy)
+        cursor.execute("INSERT INTO barcode_sequence (id, next) VALUES (1, 1)")
+
+
+@functools.lru_cache
+def get_allocator(secret: str = BARCODE_SECRET) -> BarcodeAllocator:
+    """
+        Allocator shared by the connections of a process, building one computes its round tables
+        :param secret: key of the permutation
+        :return: BarcodeAllocator
+    """
+    return BarcodeAllocator(secret=secret)
@@ -0,0 +1,129 @@
+import contextlib
+import pathlib
+import sqlite3
+import threading
+
+from typing import Iterator
+
+from configs.config import DATABASE_BUSY_TIMEOUT, DATABASE_JOURNAL_MODE, DATABASE_SYNCHRONOUS, DATABASE_MMAP_SIZE, \
+    DATABASE_CACHE_SIZE, DATABASE_STATEMENT_CACHE_SIZE, DATABASE_POOL_SIZE
+from database.migrations import migrate
+
+
+class ConnectionPool:
+    """
+        Pool of configured connections to one database file.
+        A connection is checked out by one thread (or task) at a time and given back when it is done, so opening the
+        file and setting up the pragmas is paid once per connection instead of once per Database instance. Every
+        connection keeps its own cache of prepared statements.
+    """
+    def __init__(self, database_path: pathlib.Path, size: int = DATABASE_POOL_SIZE, journal_mode: str = DATABASE_JOURNAL_MODE,
+                 synchronous: str = DATABASE_SYNCHRONOUS, mmap_size: int = DATABASE_MMAP_SIZE,
+                 cache_size: int = DATABASE_CACHE_SIZE, busy_timeout: float = DATABASE_BUSY_TIMEOUT,
+                 cached_statements: int = DATABASE_STATEMENT_CACHE_SIZE):
+        """
+            :param database_path: path to the sqlite database file
+            :param size: maximum number of idle connections kept open, 0 closes every connection when it is released
+            :param journal_mode: PRAGMA journal_mode, WAL lets readers run while a writer commits
+            :param synchronous: PRAGMA synchronous, NORMAL only syncs the WAL at checkpoints
+            :param mmap_size: PRAGMA mmap_size in bytes, 0 disables memory-mapped reads
+            :param cache_size: PRAGMA cache_size, negative values are KiB
+            :param busy_timeout: seconds a statement waits for a lock held by another connection
+            :param cached_statements: number of prepared statements cached by every connection
+        """
+        self.database_path: pathlib.Path = database_path
+        self.size: int = size
+        self.journal_mode: str = journal_mode
+        self.synchronous: str = synchronous
+        self.mmap_size: int = mmap_size
+        self.cache_size: int = cache_size
+        self.busy_timeout: float = busy_timeout
+        self.cached_statements: int = cached_statements
+        self.__idle: list[sqlite3.Connection] = []
+        self.__lock: threading.Lock = threading.Lock()
+        self.__migrated: bool = False
+
+    def connect(self) -> sqlite3.Connection:
+        """
+            Open a new connection with the configured pragmas
+            :return: sqlite3.Connection returning rows along with the column names
+        """
+        # a pooled connection is used by one thread at a time, but not always by the thread that opened it
+        connection: sqlite3.Connection = sqlite3.connect(
+            self.database_path, timeout=self.busy_timeout, cached_statements=self.cached_statements, check_same_thread=False
+        )
+        connection.row_factory = sqlite3.Row  # we would like to return the column names as well, not just the values
+        connection.execute('PRAGMA journal_mode={}'.format(self.journal_mode))
+        connection.execute('PRAGMA synchronous={}'.format(self.synchronous))
+        connection.execute('PRAGMA mmap_size={}'.format(self.mmap_size))
+        connection.execute('PRAGMA cache_size={}'.format(self.cache_size))
+        # the first connection of the pool brings the schema of the database up to date
+        if not self.__migrated:
+            with self.__lock:
+                if not self.__migrated:
+                    migrate(connection=connection)
+                    self.__migrated = True
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+            Check out an idle connection or open a new one
+            :return: sqlite3.Connection owned by the caller until it is released
+        """
+        with self.__lock:
+            if self.__idle:
+                return self.__idle.pop()
+        return self.connect()
+
+    def release(self, connection: sqlite3.Connection):
+        """
+            Give a connection back to the pool, an unfinished transaction is rolled back
+            :param connection: connection returned by acquire()
+            :return: None
+        """
+        if connection.in_transaction:
+            connection.rollback()
+        with self.__lock:
+            if len(self.__idle) < self.size:
+                self.__idle.append(connection)
+                return
+        connection.close()
+
+    @contextlib.contextmanager
+    def checkout(self) -> Iterator[sqlite3.Connection]:
+        """
+            Check out a connection for the duration of a with block, e.g. for one task
+            :return: sqlite3.Connection released when the block exits
+        """
+        connection: sqlite3.Connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection=connection)
+
+    def close(self):
+        """
+            Close all the idle connections
+            :return: None
+        """
+        with self.__lock:
+            idle, self.__idle = self.__idle, []
+        for connection in idle:
+            connection.close()
+
+
+_pools: dict[pathlib.Path, ConnectionPool] = {}
+_pools_lock: threading.Lock = threading.Lock()
+
+
+def get_pool(database_path: pathlib.Path) -> ConnectionPool:
+    """
+        Get the pool of a database file, the pool is created the first time it is needed
+        :param database_path: path to the sqlite database file
+        :return: ConnectionPool shared by everything in the process using that file
+    """
+    key: pathlib.Path = pathlib.Path(database_path).resolve()
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(database_path=key)
+        return _pools[key]
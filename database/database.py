@@ -1,49 +1,697 @@
 import datetime
+import heapq
+import itertools
+import json
+import pathlib
+import random
 import sqlite3
 import logging
+import time
 
-from configs.config import DATABASE
+from typing import Callable, Iterator, TypeVar, TYPE_CHECKING
+
+from configs.config import DATABASE, WRITE_MAX_RETRIES, WRITE_RETRY_BACKOFF, TICKET_RENDER_TIMEOUT, EVENT_PAGE_SIZE, \
+    RESERVATION_PAGE_SIZE, AVAILABILITY_SNAPSHOT, SHARD_BARCODE_BLOCK, SHARD_BARCODE_RENEW
+from database.availability_snapshot import AvailabilitySnapshot, SnapshotWriter
+from database.barcodes import get_allocator
+from database.connection_pool import ConnectionPool, get_pool
+from database.event_catalogue import EventCatalogue
+from database.event_filter import EventFilter
+from database.instrumentation import InstrumentedCursor, Metrics
+from database.shards import CURSOR_SPAN, shard_files
+from event.event import EVENT_COLUMNS, EventRecord, EventSales
+from reservation.reservation import ReservationRecord, ReservationSummary
 from utilities.logging_util import init_logger
+from user.credential_cache import CredentialCache
+from user.identity import Identity
 from user.user import User
-from utilities.utils import generate_barcodes, generate_pdf
+
+if TYPE_CHECKING:
+    from tickets.worker import TicketWorker
+
+T = TypeVar('T')
+# insert an imported event, or update the date and price of the event with the same name when they changed; the seats
+# of the file only apply to a new event, an existing one keeps its live counter of the seats left
+EVENT_UPSERT: str = "INSERT INTO events (name, date, price, seats_available) VALUES (?, ?, ?, ?) " \
+                    "ON CONFLICT (name) DO UPDATE SET date=excluded.date, price=excluded.price " \
+                    "WHERE date IS NOT excluded.date OR price IS NOT excluded.price"
+
+
+def is_busy_error(error: sqlite3.OperationalError) -> bool:
+    """
+        Check if an operational error was raised because another connection holds the lock on the database
+        :param error: sqlite3.OperationalError raised by a statement
+        :return: True if the statement can be retried later, False otherwise
+    """
+    message: str = str(error).lower()
+    return 'locked' in message or 'busy' in message
 
 
 class Database:
-    def __init__(self):
+    def __init__(self, database_path: pathlib.Path = DATABASE, pool: ConnectionPool | None = None,
+                 ticket_worker: 'TicketWorker | None' = None, credential_cache: CredentialCache | None = None,
+                 event_catalogue: EventCatalogue | None = None, metrics: Metrics | None = None):
         """
             Constructor to initialize the logger, database connection and cursor
+            :param database_path: path to the sqlite database file, defaults to the configured database
+            :param pool: pool to check out the connection from, defaults to the shared pool of the database file
+            :param ticket_worker: worker rendering the tickets of new reservations in the background, when not given
+            the tickets are rendered by make_reservation after the commit
+            :param credential_cache: cache of verified credentials used by authenticate, shared by the instances of a
+            long-running process
+            :param event_catalogue: catalogue serving view_events from memory, shared by the instances of a long-running
+            process, the seats reserved and cancelled by this instance are applied to it once committed
+            :param metrics: metrics the latency of the statements, the lock waits, the commits and the ticket rendering
+            are reported to, see database/instrumentation.py
         """
         self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = database_path
+        self.pool: ConnectionPool = pool or get_pool(database_path=database_path)
+        self.ticket_worker: 'TicketWorker | None' = ticket_worker
+        self.credential_cache: CredentialCache | None = credential_cache
+        self.event_catalogue: EventCatalogue | None = event_catalogue
+        self.metrics: Metrics | None = metrics
+        # changes of seats made by the open transaction, given to the event catalogue once it is committed and written
+        # to the availability snapshot before
+        self.__catalogue_changes: list[tuple[dict[int, int], int]] = []
+        # barcodes reserved by make_reservation inside a transaction of the caller, their tickets wait for its commit
+        self.__pending_tickets: list = []
+        # Databases of the shards opened so far and shard of the events routed so far, see database/shards.py
+        self.__shards: dict[int, Database] = {}
+        self.__event_shards: dict[int, int | None] = {}
+        # for the Database of a shard, the main database, holding the users
+        self.__users_database: Database | None = None
+        # Database of the events of this database a split has not moved to a shard yet, and whether all of them were
+        # moved; for that Database, True so the rows of the events already moved are left out
+        self.__unmoved: Database | None = None
+        self.__split_done: bool = False
+        self.__unmoved_only: bool = False
         self.database: sqlite3.Connection | None = None
-        self.database_cursor: sqlite3.Cursor | None = None
+        self.database_cursor: sqlite3.Cursor | InstrumentedCursor | None = None
+        self.record_cursor: sqlite3.Cursor | InstrumentedCursor | None = None
         self.__init_connection()
         self.__init_cursor()
+        # with shards, the events and their reservations are in the files of the shards instead of this database
+        self.__shard_files: list[pathlib.Path] = shard_files(connection=self.database, database_path=database_path)
+        # availability snapshot of the events, see database/availability_snapshot.py; the events of a database with
+        # shards are in the snapshots of the shards
+        self.__snapshot_enabled: bool = AVAILABILITY_SNAPSHOT and not self.__shard_files
+        self.__snapshot_writer: SnapshotWriter | None = None
+        self.__snapshot_reader: AvailabilitySnapshot | None = None
+        # the events were changed by more than seats, the open transaction publishes the snapshot again
+        self.__snapshot_stale: bool = False
 
     def __del__(self):
         """
-            Destructor -> close connection and cursor
+            Destructor -> close the cursor and give the connection back to the pool
         """
-        self.logger.info('Closing database connection and cursor')
+        self.close()
+
+    def close(self):
+        """
+            Close the cursor and give the connection back to the pool, the instance cannot be used afterwards
+            :return: None
+        """
+        if self.database is None:
+            return
+        self.logger.info('Closing cursor and releasing database connection')
+        for shard in self.__shards.values():
+            shard.close()
+        self.__shards.clear()
+        if self.__unmoved is not None:
+            self.__unmoved.close()
+            self.__unmoved = None
+        for snapshot in (self.__snapshot_writer, self.__snapshot_reader):
+            if snapshot is not None:
+                snapshot.close()
         self.database_cursor.close()
-        self.database.close()
+        self.record_cursor.close()
+        self.pool.release(connection=self.database)
+        self.database, self.database_cursor, self.record_cursor = None, None, None
+
+    def interrupt(self):
+        """
+            Interrupt the statements running on the connection of this Database and on the connections of its shards,
+            called from another thread; a connection running no statement is not affected
+            :return: None
+        """
+        # the thread running the Database may open a shard meanwhile, the shards are copied at once
+        for database in list(self.__shards.values()) + ([self.__unmoved] if self.__unmoved is not None else []):
+            database.interrupt()
+        connection: sqlite3.Connection | None = self.database
+        if connection is not None:
+            connection.interrupt()
 
     def __init_connection(self):
         """
-            Private method to initialize connection to the database and explicitly set the query results to be returned
+            Private method to check out a connection to the database from the pool, the query results are returned
             along with the column names
             :return: None
         """
         self.logger.info('Initialising database connection ...')
-        self.database: sqlite3.Connection | None = sqlite3.connect(DATABASE)
-        self.database.row_factory = sqlite3.Row  # we would like to return the column names as well, not just the values
+        # the pool configures the connection (pragmas, busy timeout) and sets sqlite3.Row as row factory
+        self.database: sqlite3.Connection | None = self.pool.acquire()
 
     def __init_cursor(self):
         """
-            Private method to initialize a cursor from the database connection
+            Private method to initialize the cursors from the database connection: the cursor returning sqlite3.Row
+            objects and the one returning plain tuples, for the results read into records (EventRecord,
+            ReservationRecord, Identity) without a sqlite3.Row or a dictionary per row
             :return: None
         """
         self.logger.info('Initialising cursor ...')
-        self.database_cursor: sqlite3.Cursor | None = self.database.cursor()
+        cursor: sqlite3.Cursor = self.database.cursor()
+        record_cursor: sqlite3.Cursor = self.database.cursor()
+        record_cursor.row_factory = None
+        if self.metrics is not None:
+            cursor, record_cursor = InstrumentedCursor(cursor=cursor, metrics=self.metrics), InstrumentedCursor(cursor=record_cursor, metrics=self.metrics)
+        self.database_cursor: sqlite3.Cursor | InstrumentedCursor | None = cursor
+        self.record_cursor: sqlite3.Cursor | InstrumentedCursor | None = record_cursor
+
+    def _run_in_transaction(self, operation: Callable[[], T]) -> T:
+        """
+            Run the given operation inside a write transaction and commit it.
+            The transaction is started with BEGIN IMMEDIATE, so the write lock is taken before anything is read and
+            two writers can never interleave a read-modify-write. If the lock cannot be acquired within the busy timeout
+            the whole transaction is retried with an exponential backoff.
+            When a transaction is already open (the caller batches several operations), the operation runs inside a
+            savepoint instead and the caller is responsible for the commit, the tickets of the reservations made
+            meanwhile are generated once it is committed.
+
+            :param operation: callable doing the reads and writes, its return value is returned
+            :return: the value returned by the operation
+        """
+        if self.database.in_transaction:
+            changes: int = len(self.__catalogue_changes)
+            self.database_cursor.execute('SAVEPOINT operation')
+            try:
+                result: T = operation()
+            except BaseException:
+                self.database_cursor.execute('ROLLBACK TO operation')
+                self.database_cursor.execute('RELEASE operation')
+                del self.__catalogue_changes[changes:]
+                raise
+            self.database_cursor.execute('RELEASE operation')
+            return result
+
+        attempt: int = 1
+        while True:
+            self.__catalogue_changes.clear()
+            self.__pending_tickets.clear()
+            self.__snapshot_stale = False
+            snapshot_written: bool = False
+            try:
+                start: float = time.perf_counter()
+                self.database_cursor.execute('BEGIN IMMEDIATE')
+                if self.metrics is not None:
+                    self.metrics.observe(name='lock_wait', seconds=time.perf_counter() - start)
+                result: T = operation()
+                snapshot_written = self.__write_snapshot()
+                start = time.perf_counter()
+                self.database.commit()
+                if self.metrics is not None:
+                    self.metrics.observe(name='commit', seconds=time.perf_counter() - start)
+                self.__publish_catalogue_changes()
+                if self.__pending_tickets:
+                    barcodes, self.__pending_tickets = self.__pending_tickets, []
+                    self.generate_tickets(barcodes=barcodes)
+                return result
+            except sqlite3.OperationalError as e:
+                if self.database.in_transaction:
+                    self.database.rollback()
+                if snapshot_written:
+                    self.__snapshot_writer.remove()
+                if not is_busy_error(e):
+                    raise
+                if attempt >= WRITE_MAX_RETRIES:
+                    if self.metrics is not None:
+                        self.metrics.increment(name='busy_errors')
+                    raise
+                self.logger.warning('Database is busy, retrying transaction ({}/{})'.format(attempt, WRITE_MAX_RETRIES))
+                if self.metrics is not None:
+                    self.metrics.increment(name='busy_retries')
+                # jitter spreads the retries of writers that collided at the same moment
+                time.sleep(WRITE_RETRY_BACKOFF * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+                attempt += 1
+            except BaseException:
+                if self.database.in_transaction:
+                    self.database.rollback()
+                if snapshot_written:
+                    self.__snapshot_writer.remove()
+                raise
+
+    def __record_catalogue_change(self, changes: dict[int, int]):
+        """
+            Remember a change of seats made by the open transaction, with the version of the events table after it
+            :param changes: change of seats_available by event id, one updated row of events per entry
+            :return: None
+        """
+        if self.event_catalogue is None and not self.__snapshot_enabled:
+            return
+        self.database_cursor.execute("SELECT version FROM events_version WHERE id=1")
+        self.__catalogue_changes.append((changes, self.database_cursor.fetchone()['version']))
+
+    def __publish_catalogue_changes(self):
+        """
+            Apply the changes of the transaction just committed to the event catalogue
+            :return: None
+        """
+        if self.event_catalogue is not None:
+            for changes, version in self.__catalogue_changes:
+                self.event_catalogue.apply(changes=changes, version=version)
+        self.__catalogue_changes.clear()
+
+    def __write_snapshot(self) -> bool:
+        """
+            Write the changes of the open transaction to the availability snapshot, while the write lock is held so
+            the writers of every process write it one at a time
+            :return: True if the snapshot was written, it is removed if the transaction then fails
+        """
+        if not self.__snapshot_enabled or not (self.__catalogue_changes or self.__snapshot_stale):
+            return False
+        self.__snapshot_writer = self.__snapshot_writer or SnapshotWriter(database_path=self.database_path)
+        try:
+            self.__snapshot_writer.apply(connection=self.database, changes=self.__catalogue_changes, republish=self.__snapshot_stale)
+        except Exception as e:
+            # the snapshot only spares reads, a reservation does not fail because of it
+            self.logger.warning('Could not write the availability snapshot: {}'.format(str(e)))
+            self.__snapshot_writer.remove()
+            return False
+        return True
+
+    def __availability(self) -> AvailabilitySnapshot | None:
+        """
+            :return: the availability snapshot to read the events from, None if there is none
+        """
+        if not self.__snapshot_enabled:
+            return None
+        self.__snapshot_reader = self.__snapshot_reader or AvailabilitySnapshot(database_path=self.database_path)
+        return self.__snapshot_reader if self.__snapshot_reader.refresh(connection=self.database) else None
+
+    @property
+    def sharded(self) -> bool:
+        """
+            True if the events and their reservations are in shards, see database/shards.py
+        """
+        return bool(self.__shard_files)
+
+    def __shard(self, shard: int) -> 'Database':
+        """
+            Database of a shard, its connection is checked out the first time the shard is used
+            :param shard: index of the shard
+            :return: Database of the file of the shard, reporting to the same metrics and rendering the tickets with the
+            same ticket worker
+        """
+        if shard not in self.__shards:
+            if shard >= len(self.__shard_files):
+                # shards were added since this instance read the directory
+                self.__read_shard_files()
+            self.__shards[shard] = Database(database_path=self.__shard_files[shard], ticket_worker=self.ticket_worker, metrics=self.metrics)
+            self.__shards[shard].__users_database = self
+        return self.__shards[shard]
+
+    def __read_shard_files(self):
+        """
+            Read the directory of the shards again, shards may have been added since this instance read it
+            :return: None
+        """
+        self.__shard_files = shard_files(connection=self.database, database_path=self.database_path)
+        # the events of a database with shards are in the snapshots of the shards
+        self.__snapshot_enabled = self.__snapshot_enabled and not self.__shard_files
+
+    def __unmoved_events(self) -> 'Database':
+        """
+            Database of the events of this database a split has not moved to a shard yet, see database/shards.py: they
+            are reserved and listed in this database until their move is committed
+            :return: Database of this database file ignoring its shards and the rows of the events already moved
+        """
+        if self.__unmoved is None:
+            unmoved: Database = Database(
+                database_path=self.database_path, pool=self.pool, ticket_worker=self.ticket_worker, metrics=self.metrics
+            )
+            unmoved.__shard_files, unmoved.__snapshot_enabled, unmoved.__unmoved_only = [], False, True
+            self.__unmoved = unmoved
+        return self.__unmoved
+
+    def __homes(self) -> list['Database']:
+        """
+            Databases holding events and their reservations: the shards, read again from the directory, then this
+            database while a split has not moved all its events yet; once they are all moved no event comes back, the
+            imports write the new events to the shards
+            :return: list of Database, the index of a shard is its index in the list
+        """
+        self.__read_shard_files()
+        homes: list[Database] = [self.__shard(shard) for shard in range(len(self.__shard_files))]
+        if not self.__split_done:
+            self.record_cursor.execute(
+                "SELECT 1 FROM events e WHERE NOT EXISTS (SELECT 1 FROM event_shards s WHERE s.event_id=e.id) LIMIT 1"
+            )
+            self.__split_done = self.record_cursor.fetchone() is None
+            if not self.__split_done:
+                homes.append(self.__unmoved_events())
+        return homes
+
+    def __moved_events_excluded(self, table: str) -> str:
+        """
+            :param table: name or alias of the events table in the query
+            :return: condition starting with AND leaving out the rows of the events moved to a shard, for the Database
+            of the events a split has not moved yet; empty for any other Database
+        """
+        if not self.__unmoved_only:
+            return ''
+        return ' AND NOT EXISTS (SELECT 1 FROM event_shards s WHERE s.event_id={}.id)'.format(table)
+
+    def __shard_of(self, event: int, refresh: bool = False) -> 'Database':
+        """
+            Find the shard of an event in the directory, the shard of an event is remembered until a refresh
+            :param event: event id
+            :param refresh: read the directory again, the event may have been moved since
+            :return: Database of the shard of the event, the Database of the events not moved yet if the event is in no
+            shard (a split did not move it yet, or it does not exist)
+        """
+        if refresh or event not in self.__event_shards:
+            self.record_cursor.execute("SELECT shard FROM event_shards WHERE event_id=?", (event, ))
+            row: tuple | None = self.record_cursor.fetchone()
+            self.__event_shards[event] = row[0] if row else None
+        shard: int | None = self.__event_shards[event]
+        return self.__unmoved_events() if shard is None else self.__shard(shard)
+
+    def __gather(self, read: Callable[['Database'], T]) -> bool | list[T]:
+        """
+            Run a read on every shard, one after the other
+            :param read: callable reading from the Database of a shard, False when it fails
+            :return: list with the result of every shard, in the order of the shards, or False if a read failed
+        """
+        results: list[T] = []
+        for home in self.__homes():
+            result: T = read(home)
+            if result is False:
+                return False
+            results.append(result)
+        return results
+
+    def __shards_of_barcodes(self, barcodes: list) -> dict['Database', list[int]]:
+        """
+            Find the shards holding the reservations of the given barcodes, every shard is asked with one read
+            :return: barcodes held by every shard holding some of them
+        """
+        held: dict[Database, list[int]] = {}
+        for database in self.__homes():
+            database.record_cursor.execute(
+                "SELECT barcode FROM reservation WHERE barcode IN (SELECT value FROM json_each(?))", (json.dumps(barcodes), )
+            )
+            found: list[int] = [row[0] for row in database.record_cursor.fetchall()]
+            if found:
+                held[database] = found
+        return held
+
+    def authenticate(self, user: User | Identity) -> Identity | None:
+        """
+            Verify the credentials of a user, the Identity returned can be given to the other methods instead of the
+            User so they do not look the user up again
+            :param user: User object containing the email and hashed password, an Identity is returned as it is
+            :return: Identity of the user or None if the credentials are not valid
+        """
+        if isinstance(user, Identity):
+            return user
+        if self.credential_cache is not None:
+            identity: Identity | None = self.credential_cache.get(email=user.get_user(), hashed_password=user.get_hashed_password())
+            if identity:
+                return identity
+        self.record_cursor.execute(
+            "SELECT id, email, is_admin FROM users WHERE email=? and password=?",
+            (user.get_user(), user.get_hashed_password())
+        )
+        user_information: tuple | None = self.record_cursor.fetchone()
+        if not user_information:
+            return None
+        user_id, email, is_admin = user_information
+        identity: Identity = Identity(user_id=user_id, email=email, hashed_password=user.get_hashed_password(), is_admin=bool(is_admin))
+        if self.credential_cache is not None:
+            self.credential_cache.put(identity=identity)
+        return identity
+
+    def _claim_ticket_jobs(self, barcodes: list | None = None, limit: int = 100, stale_after: float = TICKET_RENDER_TIMEOUT) -> list[dict]:
+        """
+            Mark ticket jobs as rendering and get what is needed to render them.
+            A job is claimed if it is pending or if it is rendering for longer than stale_after seconds (the process
+            rendering it died), so a job is never lost and never rendered twice at the same time.
+
+            :param barcodes: claim only the jobs of these barcodes, all the claimable jobs if None
+            :param limit: maximum number of jobs claimed when no barcodes are given
+            :param stale_after: seconds after which a job still rendering can be claimed again
+            :return: list of dictionaries with the barcode, name, date and price of the event and the email of the user
+        """
+        now: float = datetime.datetime.now().timestamp()
+        claimable: str = "(status='pending' OR (status='rendering' AND updated<?))"
+        if barcodes is not None:
+            query: str = "UPDATE ticket_jobs SET status='rendering', updated=? WHERE barcode IN ({}) AND {} RETURNING barcode"\
+                .format(', '.join('?' for _ in barcodes), claimable)
+            parameters: list = [now] + list(barcodes) + [now - stale_after]
+        else:
+            query: str = "UPDATE ticket_jobs SET status='rendering', updated=? " \
+                         "WHERE barcode IN (SELECT barcode FROM ticket_jobs WHERE {} LIMIT ?) RETURNING barcode".format(claimable)
+            parameters: list = [now, now - stale_after, limit]
+
+        def claim() -> list[int]:
+            self.database_cursor.execute(query, parameters)
+            return [row['barcode'] for row in self.database_cursor.fetchall()]
+
+        claimed: list[int] = self._run_in_transaction(claim)
+        if not claimed:
+            return []
+        if self.__users_database is not None:
+            return self.__shard_tickets(barcodes=claimed)
+        self.database_cursor.execute(
+            "SELECT r.barcode, e.name, e.date, e.price, u.email FROM reservation r "
+            "JOIN events e ON e.id=r.event_id JOIN users u ON u.id=r.user_id "
+            "WHERE r.barcode IN ({})".format(', '.join('?' for _ in claimed)),
+            claimed
+        )
+        return [dict(ticket) for ticket in self.database_cursor.fetchall()]
+
+    def __shard_tickets(self, barcodes: list[int]) -> list[dict]:
+        """
+            What is needed to render the tickets of a shard, the shard has no users so their emails are read from the
+            main database
+            :param barcodes: barcodes of the claimed tickets
+            :return: see _claim_ticket_jobs
+        """
+        self.database_cursor.execute(
+            "SELECT r.barcode, e.name, e.date, e.price, r.user_id FROM reservation r JOIN events e ON e.id=r.event_id "
+            "WHERE r.barcode IN (SELECT value FROM json_each(?))", (json.dumps(barcodes), )
+        )
+        tickets: list[dict] = [dict(ticket) for ticket in self.database_cursor.fetchall()]
+        self.__users_database.record_cursor.execute(
+            "SELECT id, email FROM users WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list({ticket['user_id'] for ticket in tickets})), )
+        )
+        emails: dict[int, str] = dict(self.__users_database.record_cursor.fetchall())
+        for ticket in tickets:
+            ticket['email'] = emails.get(ticket.pop('user_id'))
+        return tickets
+
+    def _ticket_databases(self, barcodes: list | None = None) -> list[tuple['Database', list | None]]:
+        """
+            Databases holding ticket jobs: this database, or its shards with shards
+            :param barcodes: barcodes of the jobs, every shard is returned if None
+            :return: list of tuples with a Database and the barcodes of its jobs, None for all its jobs
+        """
+        if not self.__shard_files:
+            return [(self, barcodes)]
+        if barcodes is None:
+            return [(home, None) for home in self.__homes()]
+        return list(self.__shards_of_barcodes(barcodes=barcodes).items())
+
+    def _finish_ticket_job(self, barcode: int, pdf_path: str | None = None, error: str | None = None):
+        """
+            Record the outcome of rendering a ticket
+            :param barcode: barcode of the ticket
+            :param pdf_path: path of the rendered pdf, if it was rendered
+            :param error: error message, if it could not be rendered
+            :return: None
+        """
+        self._run_in_transaction(lambda: self.database_cursor.execute(
+            "UPDATE ticket_jobs SET status=?, pdf_path=?, error=?, updated=? WHERE barcode=?",
+            ('failed' if error else 'done', pdf_path, error, datetime.datetime.now().timestamp(), barcode)
+        ))
+
+    def generate_tickets(self, barcodes: list):
+        """
+            Render the tickets of committed reservations, in the background if there is a ticket worker
+            :param barcodes: barcodes of the tickets
+            :return: None
+        """
+        if self.ticket_worker:
+            self.ticket_worker.submit(barcodes=barcodes)
+            return
+        self.render_tickets(barcodes=barcodes)
+
+    def render_tickets(self, barcodes: list | None = None, limit: int = 100) -> int:
+        """
+            Render tickets in this process and record the outcome of every one
+            :param barcodes: barcodes of the tickets, all the pending tickets (up to limit) if None
+            :param limit: maximum number of pending tickets rendered when no barcodes are given
+            :return: number of tickets rendered, of every shard with shards
+        """
+        if self.__shard_files:
+            return sum(self.__gather(lambda shard: shard.render_tickets(barcodes=barcodes, limit=limit)))
+        # the renderer loads reportlab, imported on the first render so the commands not rendering do not pay for it
+        from tickets.renderer import render_document, split_into_documents
+
+        rendered: int = 0
+        for document in split_into_documents(tickets=self._claim_ticket_jobs(barcodes=barcodes, limit=limit)):
+            try:
+                start: float = time.perf_counter()
+                pdf_path: str = render_document(tickets=document)
+                if self.metrics is not None:
+                    self.metrics.observe(name='ticket_render', seconds=time.perf_counter() - start)
+            except Exception as e:
+                self.logger.exception('Could not render the tickets {}: {}'.format([ticket['barcode'] for ticket in document], str(e)))
+                for ticket in document:
+                    self._finish_ticket_job(barcode=ticket['barcode'], error=str(e))
+                continue
+            for ticket in document:
+                self._finish_ticket_job(barcode=ticket['barcode'], pdf_path=pdf_path)
+            rendered += len(document)
+        return rendered
+
+    def get_ticket_status(self, user: User | Identity, barcodes: list | None = None) -> bool | list[dict]:
+        """
+            Method used for finding out which tickets of a user are rendered
+            :param user: User object containing information to query the database, or its Identity
+            :param barcodes: barcodes to look up, all the tickets of the user if None
+            :return: list of dictionaries with the barcode, status and pdf_path of every ticket or False if the user
+            could not be found or an error occurred
+        """
+        try:
+            identity: Identity | None = self.authenticate(user=user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+                return False
+            if self.__shard_files:
+                tickets: bool | list[list[dict]] = self.__gather(lambda shard: shard.get_ticket_status(user=identity, barcodes=barcodes))
+                return tickets and [ticket for shard_tickets in tickets for ticket in shard_tickets]
+            query: str = "SELECT t.barcode, t.status, t.pdf_path FROM reservation r JOIN ticket_jobs t ON t.barcode=r.barcode WHERE r.user_id=?"
+            parameters: list = [identity.user_id]
+            if barcodes:
+                query += " AND r.barcode IN ({})".format(', '.join('?' for _ in barcodes))
+                parameters += list(barcodes)
+            self.database_cursor.execute(query, parameters)
+            return [dict(ticket) for ticket in self.database_cursor.fetchall()]
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
+
+    def _reserve_seats(self, user_id: int, event: int, seats: int) -> tuple[dict, list] | None:
+        """
+            Take the given number of seats of an event for a user, must be called inside a write transaction.
+            The availability check and the decrement are done by a single conditional UPDATE, so two concurrent
+            reservations can never both see the same free seats.
+
+            :param user_id: id of the user making the reservation
+            :param event: event id
+            :param seats: number of seats to reserve
+            :return: tuple with the event information and the barcodes reserved or None if the seats are not available
+        """
+        # the row of an event moved to a shard stays in the main database, see database/shards.py, it is not reserved
+        self.database_cursor.execute(
+            "UPDATE events SET seats_available=seats_available - ? "
+            "WHERE id=? AND seats_available>=? AND date>? AND NOT EXISTS (SELECT 1 FROM event_shards WHERE event_id=?) "
+            "RETURNING id, name, date, price",
+            (seats, event, seats, datetime.datetime.now().timestamp(), event)
+        )
+        event_information: sqlite3.Row | None = self.database_cursor.fetchone()
+        if not event_information:
+            return None
+        event_information: dict = dict(event_information)
+        self.__record_catalogue_change(changes={event: -seats})
+
+        # the allocator never gives out the same barcode twice, all the seats get their barcodes from one block
+        barcodes: list = get_allocator().allocate(cursor=self.database_cursor, count=seats)
+
+        # make reservations, at the price the tickets are sold at
+        self.database_cursor.executemany(
+            "INSERT INTO reservation (user_id, event_id, barcode, price) VALUES (?, ?, ?, ?)",
+            [(user_id, event, barcode, event_information['price']) for barcode in barcodes]
+        )
+        # the tickets are rendered after the commit, the jobs make sure none is forgotten if the process stops before
+        now: float = datetime.datetime.now().timestamp()
+        self.database_cursor.executemany(
+            "INSERT INTO ticket_jobs (barcode, status, updated) VALUES (?, 'pending', ?)",
+            [(barcode, now) for barcode in barcodes]
+        )
+        return event_information, barcodes
+
+    def _release_seat(self, user_id: int, barcode: int) -> int | None:
+        """
+            Delete the reservation of a user identified by the barcode and give the seat back to its event, must be
+            called inside a write transaction.
+
+            :param user_id: id of the user owning the reservation
+            :param barcode: barcode of the reservation
+            :return: the event id of the cancelled reservation or None if there is no such reservation
+        """
+        # delete the reservation and find out its event in one statement, a barcode cancelled twice at the same
+        # time is only given back once
+        table_reservation: sqlite3.Cursor = self.database_cursor.execute(
+            "DELETE FROM reservation WHERE user_id=? AND barcode=? RETURNING event_id",
+            (user_id, barcode)
+        )
+        reservation: sqlite3.Row | None = table_reservation.fetchone()
+        if not reservation:
+            return None
+        event_id: int = reservation['event_id']
+        self.database_cursor.execute("DELETE FROM ticket_jobs WHERE barcode=?", (barcode, ))
+
+        # update event table, increment nr of seats available
+        self.database_cursor.execute(
+            "UPDATE events SET seats_available=seats_available + 1 WHERE id=?",
+            (event_id, )
+        )
+        self.__record_catalogue_change(changes={event_id: 1})
+        return event_id
+
+    def _release_seats(self, user_id: int | None, barcodes: list | None = None, event: int | None = None) -> dict[int, int]:
+        """
+            Delete several reservations and give their seats back with set-based statements, must be called inside a
+            write transaction. The reservations are chosen by barcode or by event, and are restricted to the ones of
+            the user unless user_id is None.
+
+            :param user_id: id of the user owning the reservations, None for the reservations of every user
+            :param barcodes: barcodes of the reservations
+            :param event: event id, all its reservations are deleted when no barcodes are given
+            :return: dictionary with the event id of every reservation deleted, by barcode
+        """
+        conditions: list[str] = ["barcode IN (SELECT value FROM json_each(?))" if barcodes is not None else "event_id=?"]
+        parameters: list = [json.dumps(barcodes) if barcodes is not None else event]
+        if user_id is not None:
+            # with barcodes, the unary plus keeps the planner on the barcode index instead of reading every
+            # reservation of the user
+            conditions.append("+user_id=?" if barcodes is not None else "user_id=?")
+            parameters.append(user_id)
+        released: dict[int, int] = {
+            row['barcode']: row['event_id'] for row in self.database_cursor.execute(
+                "DELETE FROM reservation WHERE {} RETURNING barcode, event_id".format(' AND '.join(conditions)), parameters
+            ).fetchall()
+        }
+        if not released:
+            return released
+        self.database_cursor.execute(
+            "DELETE FROM ticket_jobs WHERE barcode IN (SELECT value FROM json_each(?))", (json.dumps(list(released)), )
+        )
+
+        # one update for all the events, each gets back the number of seats released
+        seats: dict[int, int] = {}
+        for event_id in released.values():
+            seats[event_id] = seats.get(event_id, 0) + 1
+        self.database_cursor.execute(
+            "UPDATE events SET seats_available=seats_available + released.value "
+            "FROM json_each(?) AS released WHERE events.id=CAST(released.key AS INTEGER)",
+            (json.dumps(seats), )
+        )
+        self.__record_catalogue_change(changes=seats)
+        return released
 
     def check_user(self, user: User) -> bool:
         """
@@ -52,76 +700,189 @@ class Database:
             :return: True if it is a valid user, False if not or an unexpected error occurs
         """
         try:
-            table_user: sqlite3.Cursor = self.database_cursor.execute(
-                "SELECT email, password FROM users WHERE email=? AND password=?",
-                (user.get_user(), user.get_hashed_password())
-            )
-            if table_user.fetchone():
-                return True
-            return False
+            return self.authenticate(user=user) is not None
         except Exception as e:
             self.logger.exception('Unexpected error occurred: {}'.format(str(e)))
             return False
 
-    def get_user_info(self, user: User) -> bool | dict:
+    def get_user_info(self, user: User | Identity) -> bool | dict:
         """
             Method used for getting a user information, including reservations made.
-            :param user: User object containing information to query the database
-            :return: False if information couldn't be queried or dictionary containing information about the user
+            :param user: User object containing information to query the database, or its Identity
+            :return: False if information couldn't be queried or dictionary containing information about the user, its
+            "reservations" are ReservationRecord tuples
         """
-        table_user: sqlite3.Cursor = self.database_cursor.execute(
-            "SELECT id FROM users WHERE email=? AND password=?",
-            (user.get_user(), user.get_hashed_password())
-        )
-
-        user_information: None | sqlite3.Row = table_user.fetchone()
-        if not user_information:
+        identity: Identity | None = self.authenticate(user=user)
+        if not identity:
             self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
             return False
-        user_id: int = dict(user_information).get('id')
-        table_reservation: sqlite3.Cursor = self.database_cursor.execute(
-            "SELECT event_id, barcode FROM reservation WHERE user_id=?",
-            (user_id,)
-        )
-        reservations: list[sqlite3.Row] = table_reservation.fetchall()
         view_user_information: dict = {
             'email': user.get_user(),
             'hashed_password': user.get_hashed_password(),
             'reservations': 'There are no reservations for the user.'
         }
+        if self.__shard_files:
+            # every shard lists the reservations of the user for its events
+            gathered: bool | list[dict] = self.__gather(lambda shard: shard.get_user_info(user=identity))
+            if gathered is False:
+                return False
+            records: list[ReservationRecord] = [
+                record for information in gathered if isinstance(information['reservations'], list) for record in information['reservations']
+            ]
+            view_user_information['reservations'] = records or view_user_information['reservations']
+            return view_user_information
+        self.record_cursor.execute("SELECT barcode, event_id FROM reservation WHERE user_id=?", (identity.user_id, ))
+        reservations: list[tuple[int, int]] = self.record_cursor.fetchall()
         if len(reservations) == 0:
             self.logger.info('No reservations for {}'.format(user.get_user()))
             return view_user_information
 
-        # transform sqlite3.Row to dictionaries
-        reservations: list[dict] = [dict(res) for res in reservations]
+        # name and date of every event reserved, read once per event whatever the number of its reservations; the
+        # records of an event share its name, which a join would read again for every reservation
+        self.record_cursor.execute(
+            "SELECT id, name, date FROM events WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list({event_id for _, event_id in reservations})), )
+        )
+        events: dict[int, tuple[str, float]] = {event_id: (name, date) for event_id, name, date in self.record_cursor.fetchall()}
+        view_user_information['reservations'] = [
+            ReservationRecord(barcode, event_id, *events[event_id]) for barcode, event_id in reservations
+        ]
+        return view_user_information
 
-        # create dictionary for faster later lookup operations
-        barcode_event_id_dict: dict = {ev['barcode']: ev['event_id'] for ev in reservations}
+    @staticmethod
+    def __history_conditions(upcoming: bool, event: int | None) -> tuple[str, list]:
+        """
+            :return: tuple with the conditions of the reservation history, each one starting with AND, and their parameters
+        """
+        conditions: str = ''
+        parameters: list = []
+        if event is not None:
+            conditions += ' AND r.event_id=?'
+            parameters.append(event)
+        if upcoming:
+            conditions += ' AND e.date>?'
+            parameters.append(datetime.datetime.now().timestamp())
+        return conditions, parameters
 
-        # get all the values from dict (event_id) apply the .join() function to create a valid SQL query
-        table_events: sqlite3.Cursor = self.database_cursor.execute(
-            "SELECT * FROM events WHERE id IN ({})"
-            .format(', '.join('?' for _ in barcode_event_id_dict)),
-            list(barcode_event_id_dict.values())
-        )
+    def list_reservations(self, user: User | Identity, after: int | None = None, page_size: int = RESERVATION_PAGE_SIZE,
+                          upcoming: bool = False, event: int | None = None) -> bool | tuple[list[ReservationRecord], int | None]:
+        """
+            Method used for listing the reservations of a user a page at a time, in the order they were made. A page is
+            read by one join of the reservations with their events, starting after the last reservation of the previous
+            page, so a request holds a single page whatever the number of reservations of the user.
+            :param user: User object containing information to query the database, or its Identity
+            :param after: cursor returned with the previous page, None for the first page
+            :param page_size: maximum number of reservations of the page
+            :param upcoming: only list the reservations of the events still to come
+            :param event: only list the reservations of this event
+            :return: tuple with the list of ReservationRecord and the cursor of the next page (None after the last
+            page), or False if an error occurred
+        """
+        identity: Identity | None = self.authenticate(user=user)
+        if not identity:
+            self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+            return False
+        if self.__shard_files:
+            return self.__list_reservations_in_shards(identity=identity, after=after, page_size=page_size, upcoming=upcoming, event=event)
+        try:
+            conditions, parameters = self.__history_conditions(upcoming=upcoming, event=event)
+            # the rowid of a reservation is its position in the history, the reservations of the user are found with
+            # reservation_user
+            self.record_cursor.execute(
+                "SELECT r.rowid, r.barcode, r.event_id, e.name, e.date FROM reservation r JOIN events e ON e.id=r.event_id "
+                "WHERE r.user_id=? AND r.rowid>?{} ORDER BY r.rowid LIMIT ?".format(conditions),
+                [identity.user_id, after or 0, *parameters, page_size]
+            )
+            rows: list[tuple] = self.record_cursor.fetchall()
+            cursor: int | None = rows[-1][0] if len(rows) == page_size else None
+            return [ReservationRecord._make(row[1:]) for row in rows], cursor
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
 
-        events_fetched: list[sqlite3.Row] = table_events.fetchall()
-        ev_info: dict = {
-            dict(ev)['id']: dict(ev) for ev in events_fetched
-        }
+    def __list_reservations_in_shards(self, identity: Identity, after: int | None, page_size: int, upcoming: bool,
+                                      event: int | None) -> bool | tuple[list[ReservationRecord], int | None]:
+        """
+            List the reservations of a user shard after shard, a page continues in the next shard when the reservations
+            of a shard end before it is full
+            :return: see list_reservations, the cursor is shard * CURSOR_SPAN + rowid
+        """
+        first_shard, rowid = divmod(after or 0, CURSOR_SPAN)
+        owner: Database | None = self.__shard_of(event=event) if event is not None else None
+        homes: list[Database] = self.__homes()
+        reservations: list[ReservationRecord] = []
+        for shard in range(first_shard, len(homes)):
+            if event is not None and homes[shard] is not owner:
+                rowid = 0
+                continue
+            page: bool | tuple[list[ReservationRecord], int | None] = homes[shard].list_reservations(
+                user=identity, after=rowid, page_size=page_size - len(reservations), upcoming=upcoming, event=event
+            )
+            if page is False:
+                return False
+            records, cursor = page
+            reservations.extend(records)
+            if cursor is not None:
+                return reservations, shard * CURSOR_SPAN + cursor
+            rowid = 0
+        return reservations, None
 
-        view_user_information.update({
-            'reservations': [
-                {
-                    'name': ev_info[barcode_event_id_dict[barcode]]['name'],
-                    'date': ev_info[barcode_event_id_dict[barcode]]['date'],
-                    'barcode': barcode
-                } for barcode in barcode_event_id_dict.keys()
-            ]
-        })
+    def reservation_summary(self, user: User | Identity, upcoming: bool = False, event: int | None = None) -> bool | list[ReservationSummary]:
+        """
+            Method used for counting the seats reserved by a user for every event, the counts are aggregated by SQLite
+            while it reads the reservations of the user in the order of their event
+            :param user: User object containing information to query the database, or its Identity
+            :param upcoming: only count the reservations of the events still to come
+            :param event: only count the reservations of this event
+            :return: list of ReservationSummary ordered by the date of the event, or False if an error occurred
+        """
+        identity: Identity | None = self.authenticate(user=user)
+        if not identity:
+            self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+            return False
+        if self.__shard_files:
+            # an event is in one shard, the summaries of the shards only need to be merged in the order of the dates
+            summaries: bool | list[list[ReservationSummary]] = self.__gather(
+                lambda shard: shard.reservation_summary(user=identity, upcoming=upcoming, event=event)
+            )
+            return summaries and list(heapq.merge(*summaries, key=lambda seats: (seats.date, seats.event_id)))
+        try:
+            conditions, parameters = self.__history_conditions(upcoming=upcoming, event=event)
+            self.record_cursor.execute(
+                "SELECT r.event_id, e.name, e.date, count(*) FROM reservation r JOIN events e ON e.id=r.event_id "
+                "WHERE r.user_id=?{} GROUP BY r.event_id ORDER BY e.date, r.event_id".format(conditions),
+                [identity.user_id, *parameters]
+            )
+            return list(map(ReservationSummary._make, self.record_cursor.fetchall()))
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
 
-        return view_user_information
+    def sales_report(self, event: int | None = None) -> bool | list[EventSales]:
+        """
+            Method used for reporting the sales of the events from the counters of the event_sales table, one row per
+            event whatever the number of reservations, see database/sales.py. The caller checks that the user is an
+            admin.
+            :param event: only report the sales of this event
+            :return: list of EventSales ordered by event id, the events without sales included, or False if an error
+            occurred
+        """
+        if self.__shard_files:
+            reports: bool | list[list[EventSales]] = self.__gather(lambda shard: shard.sales_report(event=event))
+            return reports and list(heapq.merge(*reports, key=lambda sales: sales.id))
+        try:
+            conditions: str = ('' if event is None else ' AND e.id=?') + self.__moved_events_excluded(table='e')
+            self.record_cursor.execute(
+                "SELECT e.id, e.name, e.date, e.price, coalesce(s.sold, 0), coalesce(s.cancelled, 0), coalesce(s.revenue, 0.0), "
+                "s.last_sale FROM events e LEFT JOIN event_sales s ON s.event_id=e.id{} ORDER BY e.id".format(
+                    conditions.replace(' AND', ' WHERE', 1)
+                ),
+                () if event is None else (event, )
+            )
+            return list(map(EventSales._make, self.record_cursor.fetchall()))
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
 
     def register_user(self, user: User) -> bool | str:
         """
@@ -129,22 +890,51 @@ class Database:
             :param user: User object containing information for registering a user
             :return: False if we couldn't register the user or an error occurred, True if a successful registration was done
         """
-        try:
+        def insert() -> bool:
             # check if user already exists with the given email
             self.database_cursor.execute(
                 "SELECT email FROM users WHERE email=?",
                 (user.get_user(),)
             )
             if self.database_cursor.fetchone():
-                self.logger.error('Could not insert user because it already exists.')
                 return False
             # insert the user in the database
             self.database_cursor.execute(
                 "INSERT INTO users (email, password, is_admin) VALUES (?, ?, ?)",
                 (user.get_user(), user.get_hashed_password(), 0)
             )
-            # commit the registration
-            self.database.commit()
+            return True
+
+        try:
+            # the check and the insert run in one write transaction, or in a savepoint of the caller's transaction
+            if not self._run_in_transaction(insert):
+                self.logger.error('Could not insert user because it already exists.')
+                return False
+            if self.credential_cache is not None:
+                self.credential_cache.invalidate(email=user.get_user())
+            return True
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
+
+    def change_password(self, user: User | Identity, new_password: str) -> bool:
+        """
+            Method used for changing the password of a user, the credentials cached for the user are forgotten
+            :param user: User object with the current credentials, or its Identity
+            :param new_password: the new password, in clear
+            :return: False if the user could not be found or an error occurred, True if the password was changed
+        """
+        try:
+            identity: Identity | None = self.authenticate(user=user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+                return False
+            self._run_in_transaction(lambda: self.database_cursor.execute(
+                "UPDATE users SET password=? WHERE id=?",
+                (User(user=identity.email, password=new_password).get_hashed_password(), identity.user_id)
+            ))
+            if self.credential_cache is not None:
+                self.credential_cache.invalidate(email=identity.email)
             return True
         except Exception as e:
             self.logger.exception('Exception occurred: {}'.format(str(e)))
@@ -157,151 +947,437 @@ class Database:
             :return: list of dictionaries containing information about events or False if an error occurs
         """
         try:
-            # ensure we get available events
-            self.database_cursor.execute(
-                "SELECT * FROM events WHERE date>? AND seats_available>0",
+            if self.__shard_files:
+                listings: bool | list[list[dict]] = self.__gather(lambda shard: shard.view_events())
+                return listings and list(heapq.merge(*listings, key=lambda entry: next(
+                    (information['date'], event_id) for event_id, information in entry.items()
+                )))
+            if self.event_catalogue is not None:
+                return self.event_catalogue.view()
+            snapshot: AvailabilitySnapshot | None = self.__availability()
+            if snapshot is not None:
+                try:
+                    return snapshot.view()
+                except TimeoutError as e:
+                    self.logger.warning('{}, reading the events from the database'.format(str(e)))
+            # ensure we get available events, the entries are built straight from the row tuples
+            self.record_cursor.execute(
+                "SELECT {} FROM events WHERE date>? AND seats_available>0{} ORDER BY date, id".format(
+                    EVENT_COLUMNS, self.__moved_events_excluded(table='events')
+                ),
                 (datetime.datetime.now().timestamp(), )
             )
             return [
-                {
-                    entry['id']: {
-                        'name': entry['name'],
-                        'date': entry['date'],
-                        'price': entry['price'],
-                        'seats_available': entry['seats_available']
-                    }
-                } for entry in [
-                    dict(ev) for ev in self.database_cursor.fetchall()
-                ]
+                {event_id: {'name': name, 'date': date, 'price': price, 'seats_available': seats_available}}
+                for event_id, name, date, price, seats_available in self.record_cursor.fetchall()
             ]
         except Exception as e:
             self.logger.exception('Exception occurred: {}'.format(str(e)))
             return False
 
-    def make_reservation(self, user: User, event: int, seats: int = 1):
+    def seats_available(self, event: int) -> bool | int | None:
         """
-            Method to make a reservation for a user that provides an event id and a number of seats to reserve.
-            If the event has the number of seats available, generate valid barcodes for each reservation and create a
-            pdf for each reservation with all the details that are needed. Otherwise, return False because no such reservations
-            can be made or an unexpected error occurred.
-
-            :param user: User object with user information
+            Method used for checking the seats left for an event, from the availability snapshot when there is one
             :param event: event id
-            :param seats: number of seats to reserve for a given event
-            :return: True and generate PDFs for every reservation or return False if not possible or an unexpected error occurred/
+            :return: number of seats available, None if the event does not exist or has passed, False if an error
+            occurred
         """
         try:
-            # ensure nr of seats is valid
-            if seats < 1:
-                self.logger.error('Invalid number of seats required.')
-                return False
+            if self.__shard_files:
+                return self.__shard_of(event=event).seats_available(event=event)
+            snapshot: AvailabilitySnapshot | None = self.__availability()
+            if snapshot is not None:
+                try:
+                    return snapshot.seats_available(event_id=event)
+                except TimeoutError as e:
+                    self.logger.warning('{}, reading the events from the database'.format(str(e)))
+            self.record_cursor.execute(
+                "SELECT seats_available FROM events WHERE id=? AND date>?", (event, datetime.datetime.now().timestamp())
+            )
+            row: tuple | None = self.record_cursor.fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
 
-            # check if there is a valid event with the given number of seats available and a valid date
-            self.database_cursor.execute(
-                "SELECT * FROM events WHERE seats_available>=? AND id=? AND date>?",
-                (seats, event, datetime.datetime.now().timestamp())
+    def list_events(self, after: tuple[float, int] | None = None, page_size: int = EVENT_PAGE_SIZE,
+                    event_filter: EventFilter = EventFilter()) -> bool | tuple[list[EventRecord], tuple[float, int] | None]:
+        """
+            Method used for listing the upcoming events a page at a time, ordered by date and id. A page starts after
+            the (date, id) of the last event of the previous page, so the pages stay consistent while events are added
+            or sold out and every page costs the same whatever its position in the listing.
+            :param after: cursor returned with the previous page, None for the first page
+            :param page_size: maximum number of events of the page
+            :param event_filter: date range, price range and minimum number of seats of the events listed
+            :return: tuple with the list of EventRecord and the cursor of the next page (None after the last page), or
+            False if an error occurred
+        """
+        try:
+            if self.__shard_files:
+                pages: bool | list[tuple[list[EventRecord], tuple[float, int] | None]] = self.__gather(
+                    lambda shard: shard.list_events(after=after, page_size=page_size, event_filter=event_filter)
+                )
+                if pages is False:
+                    return False
+                # every shard gives its first events after the cursor, the page is the first of all of them
+                events: list[EventRecord] = list(itertools.islice(
+                    heapq.merge(*(events for events, _ in pages), key=lambda record: (record.date, record.id)), page_size
+                ))
+            elif self.event_catalogue is not None:
+                events: list[EventRecord] = self.event_catalogue.page(after=after, page_size=page_size, event_filter=event_filter)
+            else:
+                events: list[EventRecord] | None = None
+                if (snapshot := self.__availability()) is not None:
+                    try:
+                        events = snapshot.page(after=after, page_size=page_size, event_filter=event_filter)
+                    except TimeoutError as e:
+                        self.logger.warning('{}, reading the events from the database'.format(str(e)))
+            if events is None:
+                conditions, parameters = event_filter.where()
+                self.record_cursor.execute(
+                    "SELECT {} FROM events WHERE (date, id)>(?, ?) AND {}{} ORDER BY date, id LIMIT ?".format(
+                        EVENT_COLUMNS, conditions, self.__moved_events_excluded(table='events')
+                    ),
+                    [*event_filter.start(now=datetime.datetime.now().timestamp(), after=after), *parameters, page_size]
+                )
+                events: list[EventRecord] = list(map(EventRecord._make, self.record_cursor.fetchall()))
+            cursor: tuple[float, int] | None = (events[-1].date, events[-1].id) if len(events) == page_size else None
+            return events, cursor
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
+
+    def iter_events(self, page_size: int = EVENT_PAGE_SIZE, event_filter: EventFilter = EventFilter()) -> Iterator[EventRecord]:
+        """
+            Generator over the upcoming events, read a page at a time with list_events so only one page is in memory
+            :param page_size: number of events read at once
+            :param event_filter: filters of the events, see list_events
+            :return: generator of EventRecord, stops early if a page could not be read
+        """
+        after: tuple[float, int] | None = None
+        while True:
+            page: bool | tuple[list[EventRecord], tuple[float, int] | None] = self.list_events(
+                after=after, page_size=page_size, event_filter=event_filter
             )
-            result: sqlite3.Row | None = self.database_cursor.fetchone()
-            if not result:
-                self.logger.info('No reservations can be made now because there are no seats available or events available.')
+            if page is False:
+                return
+            events, after = page
+            yield from events
+            if after is None:
+                return
+
+    def cancel_reservations(self, user: User | Identity, barcodes: list | None = None, event: int | None = None) -> bool | dict[int, bool]:
+        """
+            Method used for cancelling several reservations at once, in one transaction: the reservations are deleted
+            and the seats of every event are given back by a single statement each, whatever the number of barcodes.
+            A user cancels its own reservations, an admin can cancel the reservations of any user, e.g. all the
+            reservations of a cancelled event.
+
+            :param user: User object representing the user information, or its Identity
+            :param barcodes: barcodes of the reservations to cancel
+            :param event: event id, used when no barcodes are given to cancel all the reservations of the event (all
+            the ones of the user, or of every user for an admin)
+            :return: dictionary telling for every barcode if it was cancelled, False if the user is not valid, nothing
+            is given to cancel or an unexpected error occurred
+        """
+        try:
+            identity: Identity | None = self.authenticate(user=user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+                return False
+            if barcodes is None and event is None:
+                self.logger.error('No barcodes or event given to cancel.')
                 return False
+            if self.__shard_files:
+                return self.__cancel_in_shards(identity=identity, barcodes=barcodes, event=event)
 
-            # cast sqlite3.Row to dict
-            result: dict = dict(result)
+            released: dict[int, int] = self._run_in_transaction(lambda: self._release_seats(
+                user_id=None if identity.is_admin else identity.user_id, barcodes=barcodes, event=event
+            ))
+            outcomes: dict[int, bool] = {barcode: barcode in released for barcode in barcodes} if barcodes is not None \
+                else dict.fromkeys(released, True)
+            self.logger.info('Cancelled {} of {} reservations'.format(len(released), len(outcomes)))
+            return outcomes
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return False
 
-            # get the user id for correlating it with the event id
-            self.database_cursor.execute(
-                "SELECT id, email FROM users WHERE email=? and password=?",
-                (user.get_user(), user.get_hashed_password())
+    def __cancel_in_shards(self, identity: Identity, barcodes: list | None, event: int | None) -> bool | dict[int, bool]:
+        """
+            Cancel reservations in the shards holding them, every shard cancels its part in its own transaction
+            :return: see cancel_reservations
+        """
+        if barcodes is None:
+            return self.__shard_of(event=event, refresh=True).cancel_reservations(user=identity, event=event)
+        outcomes: dict[int, bool] = dict.fromkeys(barcodes, False)
+        for shard, held in self.__shards_of_barcodes(barcodes=barcodes).items():
+            cancelled: bool | dict[int, bool] = shard.cancel_reservations(user=identity, barcodes=held)
+            if cancelled is False:
+                return False
+            outcomes.update(cancelled)
+        self.logger.info('Cancelled {} of {} reservations'.format(sum(outcomes.values()), len(outcomes)))
+        return outcomes
+
+    def import_events(self, events: list[tuple], source: str | None = None, records: int = 0, finished: bool = False) -> bool | int:
+        """
+            Insert a chunk of events, or update the date and price of the events with the same name, in one
+            transaction along with the progress of the import they come from. The seats of an event already in the
+            database are its live counter of the seats left and are never taken from the file, and an event whose date
+            and price did not change is left as it is, so importing a file again does not touch the events table.
+            With shards, the events inserted or changed are also written to their shard, a new event goes to the shard
+            given by its id modulo the number of shards; an event a split did not move yet only changes here. A shard commits its events before the chunk is committed in
+            this database: when the chunk then fails, the new events are removed from the shards again, and the date
+            and price already written to the shard of an existing event are written again by the next import of the
+            chunk.
+            :param events: list of (name, date, price, seats_available) tuples
+            :param source: file the events are read from, its progress is recorded when given
+            :param records: records of the file read so far, this chunk included
+            :param finished: True for the last chunk of the file, the progress of the file is removed
+            :return: number of events inserted or updated, False if an error occurred
+        """
+        def upsert() -> int:
+            self.database_cursor.executemany(EVENT_UPSERT, events)
+            changed: int = self.database_cursor.rowcount
+            self.__snapshot_stale = changed > 0
+            self.__record_import(source=source, records=records, finished=finished)
+            return changed
+
+        # new events written to the shards by the last attempt of the transaction, by shard
+        stored: dict[int, list[int]] = {}
+
+        def upsert_into_shards() -> int:
+            stored.clear()
+            self.record_cursor.execute(
+                "SELECT id FROM events WHERE name IN (SELECT value FROM json_each(?))", (json.dumps([event[0] for event in events]), )
             )
-            # we know the user exists, we just directly cast to dict and get the id
-            user_information: dict = dict(self.database_cursor.fetchone())
-            user_id: int = user_information.get('id')
-
-            while True:
-                # generate barcodes and assure there are no other matching barcodes
-                barcodes: list = generate_barcodes(number_of_barcodes=seats)
-                found_barcodes = self.database_cursor.execute(
-                    "SELECT barcode FROM reservation WHERE barcode IN ({})".format(', '.join('?' for _ in range(0, seats))),
-                    tuple(barcode for barcode in barcodes)
+            existing: set[int] = {row[0] for row in self.record_cursor.fetchall()}
+            # the id of a changed event is only returned one statement at a time
+            changed: list[tuple] = []
+            for event in events:
+                self.record_cursor.execute('{} RETURNING {}'.format(EVENT_UPSERT, EVENT_COLUMNS), event)
+                changed.extend(self.record_cursor.fetchall())
+            self.record_cursor.execute(
+                "SELECT event_id, shard FROM event_shards WHERE event_id IN (SELECT value FROM json_each(?))",
+                (json.dumps([row[0] for row in changed]), )
+            )
+            shards: dict[int, int] = dict(self.record_cursor.fetchall())
+            new: list[tuple[int, int]] = [
+                (row[0], row[0] % len(self.__shard_files)) for row in changed if row[0] not in shards and row[0] not in existing
+            ]
+            self.record_cursor.executemany("INSERT INTO event_shards (event_id, shard) VALUES (?, ?)", new)
+            shards.update(new)
+            for event_id, shard in new:
+                stored.setdefault(shard, []).append(event_id)
+            for shard in set(shards.values()):
+                self.__shard(shard).__store_events(
+                    events=[row for row in changed if shards.get(row[0]) == shard], new=set(stored.get(shard, []))
                 )
-                if len(found_barcodes.fetchall()) == 0:
-                    break
+            self.__record_import(source=source, records=records, finished=finished)
+            return len(changed)
+
+        try:
+            return self._run_in_transaction(upsert_into_shards if self.__shard_files else upsert)
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            for shard, event_ids in stored.items():
+                self.__shard(shard).__discard_events(event_ids=event_ids)
+            return False
+
+    def __record_import(self, source: str | None, records: int, finished: bool):
+        """
+            Record the progress of an import in its transaction, see import_events
+            :return: None
+        """
+        if source is not None and finished:
+            self.database_cursor.execute("DELETE FROM event_imports WHERE source=?", (source, ))
+        elif source is not None:
+            self.database_cursor.execute(
+                "INSERT INTO event_imports (source, records, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (source) DO UPDATE SET records=excluded.records, updated=excluded.updated",
+                (source, records, datetime.datetime.now().timestamp())
+            )
 
-            # make reservations
+    def __store_events(self, events: list[tuple], new: set[int]):
+        """
+            Insert the events of a shard with their id, or update them, in a transaction of the shard. The seats of the
+            main database are not kept up to date (see database/shards.py), an event of the shard keeps its own seats
+            left and only gets its name, date and price.
+            :param events: list of (id, name, date, price, seats_available) tuples
+            :param new: ids of the events new to the directory of the shards, written with their seats; a row left with
+            the same id or name by an import whose chunk failed is replaced
+            :return: None
+        """
+        def store():
+            self.database_cursor.executemany(
+                "INSERT INTO events ({}) VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET name=excluded.name, "
+                "date=excluded.date, price=excluded.price".format(EVENT_COLUMNS),
+                [event for event in events if event[0] not in new]
+            )
             self.database_cursor.executemany(
-                "INSERT INTO reservation (user_id, event_id, barcode) VALUES (?, ?, ?)",
-                [(user_id, event, barcode) for barcode in barcodes]
+                "INSERT OR REPLACE INTO events ({}) VALUES (?, ?, ?, ?, ?)".format(EVENT_COLUMNS),
+                [event for event in events if event[0] in new]
             )
+            self.__snapshot_stale = True
 
-            # update the events table
+        self._run_in_transaction(store)
+
+    def __discard_events(self, event_ids: list[int]):
+        """
+            Remove from a shard the new events of an import whose chunk was not committed in the main database, they
+            are in no directory so they have no reservations
+            :param event_ids: ids of the events
+            :return: None
+        """
+        def discard():
             self.database_cursor.execute(
-                "UPDATE events SET seats_available=? WHERE id=?",
-                (result.get('seats_available') - seats, result.get('id'))
+                "DELETE FROM events WHERE id IN (SELECT value FROM json_each(?)) "
+                "AND NOT EXISTS (SELECT 1 FROM reservation WHERE event_id=events.id)",
+                (json.dumps(event_ids), )
             )
+            self.__snapshot_stale = True
 
-            # commit the changes
-            self.database.commit()
+        try:
+            self._run_in_transaction(discard)
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
 
-            # GENERATE PDFs
-            for barcode in barcodes:
-                generate_pdf(event_name=result['name'], email=user_information.get('email'), price=result['price'], date=result['date'], barcode=barcode)
+    def get_import_progress(self, source: str) -> int:
+        """
+            :param source: file being imported
+            :return: number of records of the file already imported, 0 if its import did not start or finished
+        """
+        self.database_cursor.execute("SELECT records FROM event_imports WHERE source=?", (source, ))
+        progress: sqlite3.Row | None = self.database_cursor.fetchone()
+        return progress['records'] if progress else 0
 
+    def make_reservation(self, user: User | Identity, event: int, seats: int = 1) -> bool | list:
+        """
+            Method to make a reservation for a user that provides an event id and a number of seats to reserve.
+            If the event has the number of seats available, generate valid barcodes for each reservation and create a
+            pdf for each reservation with all the details that are needed. Otherwise, return False because no such reservations
+            can be made or an unexpected error occurred.
+            With a ticket worker the pdfs are rendered in the background and the method returns as soon as the
+            reservation is committed, get_ticket_status tells when they are ready.
 
-            return True
+            :param user: User object with user information, or its Identity
+            :param event: event id
+            :param seats: number of seats to reserve for a given event
+            :return: list of barcodes reserved or return False if not possible or an unexpected error occurred
+        """
+        try:
+            # ensure nr of seats is valid
+            if seats < 1:
+                self.logger.error('Invalid number of seats required.')
+                return False
+
+            identity: Identity | None = self.authenticate(user=user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+                return False
+
+            if self.__shard_files:
+                return self.__reserve_in_shard(identity=identity, event=event, seats=seats)
+            reservation: tuple[dict, list] | None = self._run_in_transaction(
+                lambda: self._reserve_seats(user_id=identity.user_id, event=event, seats=seats)
+            )
+            if not reservation and not self.__unmoved_only and not self.database.in_transaction:
+                # a split may have moved the event to a shard since this instance read the directory
+                self.__read_shard_files()
+                if self.__shard_files:
+                    return self.__reserve_in_shard(identity=identity, event=event, seats=seats)
+            if not reservation:
+                self.logger.info('No reservations can be made now because there are no seats available or events available.')
+                return False
+            _, barcodes = reservation
+
+            if self.database.in_transaction:
+                # the reservation is part of a transaction of the caller, it may still be rolled back
+                self.__pending_tickets.extend(barcodes)
+            else:
+                self.generate_tickets(barcodes=barcodes)
+            return barcodes
         except Exception as e:
             self.logger.exception('Exception occurred: {}'.format(str(e)))
             return False
 
-    def cancel_reservation(self, user: User, barcode: int) -> bool:
+    def __reserve_in_shard(self, identity: Identity, event: int, seats: int) -> bool | list:
+        """
+            Make a reservation in the shard of the event, the directory is read again when it fails in case the event
+            was moved to another shard meanwhile
+            :return: see make_reservation
+        """
+        shard: Database = self.__shard_of(event=event)
+        self.__renew_barcode_lease(shard=shard, seats=seats)
+        barcodes: bool | list = shard.make_reservation(user=identity, event=event, seats=seats)
+        if barcodes is False:
+            moved: Database = self.__shard_of(event=event, refresh=True)
+            if moved is not shard:
+                self.__renew_barcode_lease(shard=moved, seats=seats)
+                barcodes = moved.make_reservation(user=identity, event=event, seats=seats)
+        return barcodes
+
+    def __renew_barcode_lease(self, shard: 'Database', seats: int):
+        """
+            Lease a new block of barcode counters of this database to a shard running out of them, see
+            database/shards.py. The block is committed here before the shard records it, one write lock after the
+            other: a failure in between loses the block, it is never issued twice. Two processes renewing the lease of
+            a shard at once give it a block each.
+            :param shard: Database of the shard the reservation is made in
+            :param seats: number of seats of the reservation
+            :return: None
+        """
+        if shard.__unmoved_only:
+            return  # the events not moved yet take their barcodes from the sequence of this database
+        left: int | None = get_allocator().leased_left(cursor=shard.record_cursor)
+        # a shard without a lease was added by a split that stopped before leasing it its first block; in a
+        # transaction of the caller the block could be rolled back after the shard recorded it
+        if (left is not None and left >= max(seats, SHARD_BARCODE_RENEW)) or self.database.in_transaction or shard.database.in_transaction:
+            return
+
+        def lease() -> tuple[int, int, list[int]]:
+            start, end = get_allocator().lease(cursor=self.database_cursor, count=max(seats, SHARD_BARCODE_BLOCK))
+            self.record_cursor.execute("SELECT counter FROM barcode_skips WHERE counter>=? AND counter<?", (start, end))
+            return start, end, [row[0] for row in self.record_cursor.fetchall()]
+
+        try:
+            start, end, skipped = self._run_in_transaction(lease)
+            shard._run_in_transaction(
+                lambda: get_allocator().extend_lease(cursor=shard.database_cursor, start=start, end=end, skipped=skipped)
+            )
+        except Exception as e:
+            # the reservation still gets the counters left, if there are enough
+            self.logger.warning('Could not lease barcodes to {}: {}'.format(shard.database_path, str(e)))
+            return
+        self.logger.info('Barcode counters [{}, {}) leased to {}'.format(start, end, shard.database_path))
+
+    def cancel_reservation(self, user: User | Identity, barcode: int) -> bool:
         """
             Method used for canceling a reservation for an event identified by a barcode made.
             If it does not exist a reservation for the user on the given barcode to
             be cancelled, then no action is made. Otherwise, the reservation is cancelled,
             and the tables in the database are updated appropriately.
 
-            :param user: User object representing the user information
+            :param user: User object representing the user information, or its Identity
             :param barcode: integer value representing the barcode of the reservation that needs to be cancelled
             :return: False if there is nothing to be done or something unexpected happened, True if everything was successful
         """
         try:
-            # get the user id to make the correlation between user id and event id from the reservation table
-            table_users: sqlite3.Cursor = self.database_cursor.execute(
-                "SELECT id FROM users WHERE email=? AND password=?",
-                (user.get_user(), user.get_hashed_password())
-            )
-
-            # cast to dict, we know the user exists
-            user_id: int = dict(table_users.fetchone()).get('id')
-
-            # search if there exists a reservation with the given inputs (user id and event id)
-            table_reservation: sqlite3.Cursor = self.database_cursor.execute(
-                "SELECT user_id, event_id, barcode FROM reservation WHERE user_id=? AND barcode=?",
-                (user_id, barcode)
-            )
+            # the user id makes the correlation between user and event in the reservation table
+            identity: Identity | None = self.authenticate(user=user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(user.get_user()))
+                return False
 
-            reservation: sqlite3.Row | None = table_reservation.fetchone()
-            if not reservation:
+            if self.__shard_files:
+                held: dict[Database, list[int]] = self.__shards_of_barcodes(barcodes=[barcode])
+                if held:
+                    return next(iter(held)).cancel_reservation(user=identity, barcode=barcode)
                 self.logger.error('There are no reservation for this user the barcode provided: {}.'.format(barcode))
                 return False
 
-            # cast to dict from sqlite3.Row
-            reservation: dict = dict(reservation)
-
-            # update reservation table -> DELETE ROW
-            self.database_cursor.execute(
-                "DELETE FROM reservation WHERE barcode=? AND user_id=? AND event_id=?",
-                (barcode, user_id, reservation.get('event_id'))
-            )
-
-            # update event table, increment nr of seats available
-            self.database.execute(
-                "UPDATE events SET seats_available=seats_available + 1 WHERE id=?",
-                (reservation.get('event_id'), )
-            )
-
-            # commit the changes in db
-            self.database.commit()
+            if self._run_in_transaction(lambda: self._release_seat(user_id=identity.user_id, barcode=barcode)) is None:
+                self.logger.error('There are no reservation for this user the barcode provided: {}.'.format(barcode))
+                return False
 
             return True
 
@@ -0,0 +1,173 @@
+"""
+    In-memory catalogue of the upcoming events, shared by the Database instances of a long-running process.
+
+    The catalogue keeps a snapshot of the events not passed yet, along with the version of the events table it reflects
+    (the events_version counter, advanced by a trigger on every change of a row of events). A view is served from the
+    snapshot:
+        - if PRAGMA data_version of the catalogue connection did not change, no other connection committed anything
+        since the last check and the snapshot is served as it is
+        - otherwise the events_version counter is read, one row, and the snapshot is served if it is still current
+        - otherwise the snapshot is built again
+    The reservations and cancellations committed by the process are applied to the snapshot as they are committed, so
+    they do not make it stale. Events leave the view when their date passes, without touching the database. The
+    listing pages of Database.list_events are cut from the same snapshot, sorted by (date, id). The events are kept as
+    EventRecord tuples, a change of seats replaces the record, so the pages share them with the snapshot.
+"""
+import bisect
+import datetime
+import itertools
+import pathlib
+import sqlite3
+import threading
+
+from database.connection_pool import get_pool
+from database.event_filter import EventFilter
+from event.event import EVENT_COLUMNS, EventRecord
+
+
+class EventCatalogue:
+    def __init__(self, database_path: pathlib.Path):
+        """
+            Constructor to open the connection the catalogue reads with, it is never used to write so PRAGMA
+            data_version tells about every commit, including those of the other connections of the process
+            :param database_path: path to the sqlite database file
+        """
+        self.database_path: pathlib.Path = database_path
+        self.__connection: sqlite3.Connection = get_pool(database_path=database_path).connect()
+        self.__lock: threading.Lock = threading.Lock()
+        self.__events: dict[int, EventRecord] = {}  # upcoming events by id, sold out ones included
+        self.__version: int = -1  # events_version the snapshot reflects, -1 before the first build
+        self.__data_version: int | None = None
+        self.__available: list[EventRecord] | None = None  # events with seats available sorted by (date, id), built when needed
+        self.__keys: list[tuple[float, int]] = []  # (date, id) of the available events, in order
+        self.__view: list[dict] | None = None  # answer of view(), built from the available events when it is needed
+        self.__view_dates: list[float] = []  # dates of the events of the answer, in order
+        self.hits: int = 0
+        self.rebuilds: int = 0
+
+    def view(self) -> list[dict]:
+        """
+            Upcoming events with seats available, in the format of Database.view_events, ordered by date
+            :return: list of dictionaries {id: {"name", "date", "price", "seats_available"}}, shared by the callers so
+            they must not modify it
+        """
+        now: float = datetime.datetime.now().timestamp()
+        with self.__lock:
+            self.__refresh(now=now)
+            if self.__view is None:
+                self.__render_view()
+            if self.__view_dates and self.__view_dates[0] <= now:
+                passed: int = bisect.bisect_right(self.__view_dates, now)
+                self.__view, self.__view_dates = self.__view[passed:], self.__view_dates[passed:]
+            return self.__view
+
+    def page(self, after: tuple[float, int] | None, page_size: int, event_filter: EventFilter) -> list[EventRecord]:
+        """
+            Page of the event listing, see Database.list_events
+            :param after: (date, id) of the last event of the previous page, None for the first page
+            :param page_size: maximum number of events
+            :param event_filter: filters of the listing
+            :return: list of EventRecord
+        """
+        now: float = datetime.datetime.now().timestamp()
+        with self.__lock:
+            self.__refresh(now=now)
+            available, keys = self.__available, self.__keys
+        # the lists are replaced, never modified, when the snapshot changes, so they can be read without the lock
+        start: int = bisect.bisect_right(keys, event_filter.start(now=now, after=after))
+        events: list[EventRecord] = []
+        for event in itertools.islice(available, start, None):
+            if len(events) == page_size or (event_filter.date_to is not None and event.date > event_filter.date_to):
+                break
+            if event_filter.matches(event):
+                events.append(event)
+        return events
+
+    def apply(self, changes: dict[int, int], version: int):
+        """
+            Apply the seats taken or given back by a committed transaction of this process
+            :param changes: change of seats_available by event id, e.g. {3: -2} for two seats reserved for event 3
+            :param version: events_version after the transaction, one change of a row of events per entry of changes
+            :return: None
+        """
+        with self.__lock:
+            if self.__version >= version:
+                return  # the snapshot was built after the commit
+            if self.__version != version - len(changes):
+                self.__version = -1  # another connection changed the events in between, build a new snapshot
+                return
+            for event_id, seats in changes.items():
+                event: EventRecord | None = self.__events.get(event_id)
+                if event:
+                    self.__events[event_id] = event._replace(seats_available=event.seats_available + seats)
+            self.__version = version
+            self.__available, self.__view = None, None
+
+    def invalidate(self):
+        """
+            Build a new snapshot on the next view
+            :return: None
+        """
+        with self.__lock:
+            self.__version = -1
+
+    def close(self):
+        self.__connection.close()
+
+    def __refresh(self, now: float):
+        """
+            Build a new snapshot if the current one is stale and the sorted available events if they are not built
+            :return: None
+        """
+        if self.__is_stale():
+            self.__build(now=now)
+            self.rebuilds += 1
+        else:
+            self.hits += 1
+        if self.__available is None:
+            self.__available = sorted(
+                (event for event in self.__events.values() if event.seats_available > 0),
+                key=lambda event: (event.date, event.id)
+            )
+            self.__keys = [(event.date, event.id) for event in self.__available]
+
+    def __is_stale(self) -> bool:
+        if self.__version < 0:
+            return True
+        data_version: int = self.__connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self.__data_version:
+            return False
+        self.__data_version = data_version
+        return self.__read_version() != self.__version
+
+    def __read_version(self) -> int:
+        return self.__connection.execute('SELECT version FROM events_version WHERE id=1').fetchone()[0]
+
+    def __build(self, now: float):
+        """
+            Read the upcoming events and the version they are at in one read transaction
+            :return: None
+        """
+        self.__connection.execute('BEGIN')
+        try:
+            version: int = self.__read_version()
+            cursor: sqlite3.Cursor = self.__connection.cursor()
+            cursor.row_factory = None
+            events: list[EventRecord] = list(map(EventRecord._make, cursor.execute(
+                "SELECT {} FROM events WHERE date>? ORDER BY date, id".format(EVENT_COLUMNS), (now, )
+            )))
+        finally:
+            self.__connection.execute('COMMIT')
+        self.__events = {event.id: event for event in events}
+        self.__version = version
+        self.__data_version = self.__connection.execute('PRAGMA data_version').fetchone()[0]
+        self.__available, self.__view = None, None
+
+    def __render_view(self):
+        """
+            Build the answer of view() from the available events
+            :return: None
+        """
+        available: list[EventRecord] = self.__available
+        self.__view = [event.view_entry() for event in available]
+        self.__view_dates = [event.date for event in available]
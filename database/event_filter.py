@@ -0,0 +1,58 @@
+import sys
+
+from dataclasses import dataclass
+
+from event.event import EventRecord
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    """
+        Filters of the event listing, applied by the SQL query of Database.list_events or by the event catalogue.
+        Only the events not passed yet are listed, the bounds are inclusive.
+    """
+    date_from: float | None = None
+    date_to: float | None = None
+    price_min: float | None = None
+    price_max: float | None = None
+    min_seats: int = 1
+
+    def start(self, now: float, after: tuple[float, int] | None) -> tuple[float, int]:
+        """
+            Key the listing starts after: the events not passed yet, after the cursor and from date_from, merged into
+            one (date, id) bound so the listing seeks to its first event instead of reading the ones before it
+            :param now: current timestamp
+            :param after: (date, id) of the last event of the previous page, None for the first page
+            :return: (date, id) the events of the page come after
+        """
+        bound: tuple[float, int] = (now, sys.maxsize)
+        if after is not None:
+            bound = max(bound, (after[0], after[1]))
+        if self.date_from is not None:
+            bound = max(bound, (self.date_from, 0))
+        return bound
+
+    def where(self) -> tuple[str, list]:
+        """
+            Conditions of the filters other than the start of the listing, see start()
+            :return: tuple with the SQL conditions, joined with AND, and their parameters
+        """
+        conditions: list[str] = ['seats_available>=?']
+        parameters: list = [self.min_seats]
+        for column, operator, value in (('date', '<=', self.date_to), ('price', '>=', self.price_min),
+                                        ('price', '<=', self.price_max)):
+            if value is not None:
+                conditions.append('{}{}?'.format(column, operator))
+                parameters.append(value)
+        return ' AND '.join(conditions), parameters
+
+    def matches(self, event: EventRecord) -> bool:
+        """
+            :param event: event of the catalogue
+            :return: True if the event passes the filters
+        """
+        return event.seats_available >= self.min_seats \
+            and (self.date_from is None or event.date >= self.date_from) \
+            and (self.date_to is None or event.date <= self.date_to) \
+            and (self.price_min is None or event.price >= self.price_min) \
+            and (self.price_max is None or event.price <= self.price_max)
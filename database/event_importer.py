@@ -0,0 +1,207 @@
+"""
+    Streaming import of event catalogues.
+
+    The events are read one record at a time from a JSON array, a JSON Lines file or a CSV file and written in chunks of
+    IMPORT_CHUNK_SIZE events, every chunk in its own transaction, so the memory used does not depend on the size of the
+    file. An event is inserted, or its date and price updated when an event with the same name exists, so a file can be
+    imported again: the seats of an existing event are the seats left after its reservations and are kept.
+    A record is either a list [name, date, price, seats_available] (the format of spectacole.json) or an object with
+    these keys, a CSV file has a header row with them. The date is a timestamp or a date in the DATE_FORMAT format.
+
+    The number of records imported is committed along with every chunk: an interrupted import starts again after the
+    last chunk committed.
+
+    Usage: python -m database.event_importer events.jsonl [--format jsonl] [--chunk-size 5000] [--restart]
+"""
+import argparse
+import csv
+import json
+import logging
+import pathlib
+import time
+
+from typing import IO, Iterator
+
+from configs.config import DATABASE, IMPORT_CHUNK_SIZE, IMPORT_READ_SIZE
+from database.database import Database
+from utilities.logging_util import init_logger
+from utilities.utils import convert_to_timestamp
+
+FIELDS: tuple[str, ...] = ('name', 'date', 'price', 'seats_available')
+
+
+def read_json_array(file: IO[str]) -> Iterator:
+    """
+        Read the elements of a JSON array one at a time, only the element being decoded is kept in memory
+        :param file: text file holding a JSON array
+        :return: generator of the decoded elements
+    """
+    decoder: json.JSONDecoder = json.JSONDecoder()
+    buffer: str = ''
+    position: int = 0
+    started: bool = False
+    end_of_file: bool = False
+    error: json.JSONDecodeError | None = None
+    while True:
+        # skip the whitespace and the separators before the next element
+        while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ',')):
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('The file does not hold a JSON array')
+                started, position = True, position + 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                element, end, error = None, None, e
+            # an element is complete if it is followed by something, a number could still go on in the next read
+            if end is not None and (end < len(buffer) or end_of_file):
+                yield element
+                position = end
+                continue
+        if end_of_file:
+            raise ValueError('The JSON array is not complete{}'.format(': {}'.format(error.msg) if error else ''))
+        data: str = file.read(IMPORT_READ_SIZE)
+        end_of_file = not data
+        buffer, position = buffer[position:] + data, 0
+
+
+def read_jsonl(file: IO[str]) -> Iterator:
+    """
+        :param file: text file with one JSON value per line, empty lines are skipped
+        :return: generator of the decoded values
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file: IO[str]) -> Iterator:
+    """
+        :param file: CSV file with a header row naming the FIELDS
+        :return: generator of dictionaries, one per row
+    """
+    return csv.DictReader(file)
+
+
+READERS: dict = {'json': read_json_array, 'jsonl': read_jsonl, 'csv': read_csv}
+EXTENSIONS: dict[str, str] = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+
+
+def parse_event(record) -> tuple[str, float, float, int]:
+    """
+        Validate a record of an imported file
+        :param record: list [name, date, price, seats_available] or dictionary with these keys
+        :return: (name, date, price, seats_available) tuple, raises ValueError if the record is not a valid event
+    """
+    try:
+        values: list = [record[field] for field in FIELDS] if isinstance(record, dict) else list(record)
+    except (KeyError, TypeError):
+        raise ValueError('expected a list or an object with the fields {}'.format(', '.join(FIELDS)))
+    if len(values) != len(FIELDS):
+        raise ValueError('expected {} fields, got {}'.format(len(FIELDS), len(values)))
+    name, date, price, seats = values
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('the name of the event is missing')
+    try:
+        date = float(date)
+    except ValueError:
+        date = convert_to_timestamp(date_string=date)
+    price, seats = float(price), int(seats)
+    if price < 0 or seats < 0:
+        raise ValueError('the price and the seats must not be negative')
+    return name.strip(), date, price, seats
+
+
+class EventImporter:
+    def __init__(self, database: Database, chunk_size: int = IMPORT_CHUNK_SIZE):
+        """
+            :param database: Database the events are written to
+            :param chunk_size: events written by one transaction
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database: Database = database
+        self.chunk_size: int = chunk_size
+
+    def run(self, path: pathlib.Path, file_format: str | None = None, restart: bool = False) -> bool | dict:
+        """
+            Import the events of a file, resuming the previous import of the same file if it was interrupted
+            :param path: file to import
+            :param file_format: one of READERS, guessed from the extension of the file when not given
+            :param restart: import the file from the start even if a previous import was interrupted
+            :return: dictionary with the "records" read, the events "written" (inserted or updated), the records
+            "rejected" and the "seconds" taken, or False if the import stopped because of an error
+        """
+        try:
+            file_format = file_format or EXTENSIONS[pathlib.Path(path).suffix.lower()]
+        except KeyError:
+            self.logger.error('Unknown format of {}, use one of: {}'.format(path, ', '.join(READERS)))
+            return False
+        source: str = str(pathlib.Path(path).resolve())
+        skip: int = 0 if restart else self.database.get_import_progress(source=source)
+        if skip:
+            self.logger.info('Resuming the import of {} after {} records'.format(path, skip))
+
+        records, written, rejected = skip, 0, 0
+        chunk: list[tuple] = []
+        start: float = time.perf_counter()
+        try:
+            with open(path, newline='' if file_format == 'csv' else None, encoding='utf-8') as file:
+                for index, record in enumerate(READERS[file_format](file)):
+                    if index < skip:
+                        continue
+                    records += 1
+                    try:
+                        chunk.append(parse_event(record=record))
+                    except (ValueError, TypeError) as e:
+                        rejected += 1
+                        self.logger.warning('Record {} rejected: {}'.format(records, str(e)))
+                    if len(chunk) == self.chunk_size:
+                        written += self.__write(chunk=chunk, source=source, records=records, finished=False)
+                        chunk = []
+                        self.__progress(records=records, imported=records - skip, start=start)
+            written += self.__write(chunk=chunk, source=source, records=records, finished=True)
+        except (OSError, ValueError) as e:
+            self.logger.error('Could not read {} after {} records: {}'.format(path, records, str(e)))
+            return False
+        except RuntimeError:
+            return False
+
+        seconds: float = time.perf_counter() - start
+        self.logger.info('Imported {} records of {} in {:.1f}s ({:.0f} records/second): {} events written, {} rejected'.format(
+            records - skip, path, seconds, (records - skip) / seconds if seconds else 0, written, rejected
+        ))
+        return {'records': records, 'written': written, 'rejected': rejected, 'seconds': seconds}
+
+    def __write(self, chunk: list[tuple], source: str, records: int, finished: bool) -> int:
+        """
+            Write a chunk and the progress of the import, raises RuntimeError if it could not be written
+            :return: number of events inserted or updated
+        """
+        written: bool | int = self.database.import_events(events=chunk, source=source, records=records, finished=finished)
+        if written is False:
+            self.logger.error('The import stopped after {} records, run it again to resume it'.format(records - len(chunk)))
+            raise RuntimeError('chunk not written')
+        return written
+
+    def __progress(self, records: int, imported: int, start: float):
+        elapsed: float = time.perf_counter() - start
+        self.logger.info('{} records imported ({:.0f} records/second)'.format(records, imported / elapsed if elapsed else 0))
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Import events from a JSON, JSON Lines or CSV file')
+    parser.add_argument('path', type=pathlib.Path, help='file to import')
+    parser.add_argument('--format', dest='file_format', choices=list(READERS), help='format of the file, guessed from its extension by default')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='events written by one transaction')
+    parser.add_argument('--restart', action='store_true', help='start from the beginning of the file instead of resuming')
+    parser.add_argument('--database', type=pathlib.Path, default=DATABASE, help='database file to import into')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    importer: EventImporter = EventImporter(database=Database(database_path=arguments.database), chunk_size=arguments.chunk_size)
+    summary: bool | dict = importer.run(path=arguments.path, file_format=arguments.file_format, restart=arguments.restart)
+    exit(0 if summary else 1)
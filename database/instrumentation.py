@@ -0,0 +1,298 @@
+"""
+    Instrumentation of the Database layer.
+
+    A Database given a Metrics instance runs its statements through an InstrumentedCursor and reports to it:
+        - the latency of every statement, in a histogram per statement, and the rows it changed or returned
+        - the time waited for the write lock (BEGIN IMMEDIATE) and the time of every commit
+        - the transactions retried because the database was busy, and those given up after the last retry
+        - the statements slower than the threshold, which are also logged
+        - the time taken to render PDF tickets, in this process or in the processes of a TicketWorker
+    Metrics can be shared by all the Database instances of a process, it is exported as a JSON snapshot or in the
+    Prometheus text format. Without Metrics a Database uses the plain sqlite3 cursor.
+"""
+import bisect
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from typing import Iterable
+
+from configs.config import SLOW_QUERY_THRESHOLD, METRICS_LATENCY_BUCKETS
+from utilities.logging_util import init_logger
+
+METRIC_PREFIX: str = 'spectacole'
+PLACEHOLDER_LIST: re.Pattern = re.compile(r'\bIN \(\?(, \?)*\)', re.IGNORECASE)  # IN lists built for a number of values
+SPACES: re.Pattern = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_key(sql: str) -> str:
+    """
+        Name a statement is recorded under: its text with the whitespace collapsed and the lists of placeholders
+        shortened, so an IN list of any length is one statement
+        :param sql: text of the statement
+        :return: normalized text
+    """
+    return PLACEHOLDER_LIST.sub('IN (?, ...)', SPACES.sub(' ', sql).strip())
+
+
+class Histogram:
+    """
+        Cumulative histogram of durations with fixed bucket bounds, in seconds, guarded by the lock of its Metrics
+    """
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds: tuple[float, ...] = bounds
+        self.counts: list[int] = [0] * len(bounds)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, seconds: float):
+        index: int = bisect.bisect_left(self.bounds, seconds)
+        if index < len(self.bounds):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list[int]:
+        """
+            :return: number of observations up to every bound, as Prometheus buckets count them
+        """
+        total: int = 0
+        counts: list[int] = []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def merge(self, other: 'Histogram'):
+        """
+            Add the observations of a histogram with the same bounds
+            :return: None
+        """
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count, 'sum': self.sum,
+            'buckets': {str(bound): count for bound, count in zip(self.bounds, self.cumulative())}
+        }
+
+
+class StatementHistogram(Histogram):
+    """
+        Latency histogram of a statement along with the rows it changed or returned
+    """
+    def __init__(self, bounds: tuple[float, ...]):
+        super().__init__(bounds=bounds)
+        self.rows: int = 0
+
+    def merge(self, other: 'StatementHistogram'):
+        super().merge(other=other)
+        self.rows += other.rows
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), 'rows': self.rows}
+
+
+class Metrics:
+    def __init__(self, slow_query_threshold: float = SLOW_QUERY_THRESHOLD, buckets: tuple[float, ...] = METRICS_LATENCY_BUCKETS):
+        """
+            :param slow_query_threshold: seconds above which a statement is logged as slow, None to log none
+            :param buckets: upper bounds of the latency histograms, in seconds
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.slow_query_threshold: float | None = slow_query_threshold
+        self.buckets: tuple[float, ...] = buckets
+        self.__lock: threading.Lock = threading.Lock()
+        # by text of the statement as it was run, statements with the same statement_key are merged when exported
+        self.__statements: dict[str, StatementHistogram] = {}
+        self.__histograms: dict[str, Histogram] = {}
+        self.__counters: dict[str, int] = {}
+
+    def observe_statement(self, sql: str, seconds: float, rows: int = 0):
+        """
+            Record the execution of a statement
+            :param sql: text of the statement
+            :param seconds: time taken by execute or executemany
+            :param rows: rows changed by the statement, or returned by a query
+            :return: None
+        """
+        with self.__lock:
+            histogram: StatementHistogram | None = self.__statements.get(sql)
+            if histogram is None:
+                histogram = self.__statements[sql] = StatementHistogram(bounds=self.buckets)
+            histogram.observe(seconds)
+            histogram.rows += rows
+        if self.slow_query_threshold is not None and seconds >= self.slow_query_threshold:
+            self.increment(name='slow_statements')
+            self.logger.warning('Slow statement ({:.1f} ms): {}'.format(seconds * 1000, statement_key(sql=sql)))
+
+    def add_rows(self, sql: str, rows: int):
+        """
+            Count rows fetched after the statement was recorded
+            :return: None
+        """
+        with self.__lock:
+            histogram: StatementHistogram | None = self.__statements.get(sql)
+            if histogram is not None:
+                histogram.rows += rows
+
+    def observe(self, name: str, seconds: float):
+        """
+            Record a duration in the histogram of the given name, e.g. "commit", "lock_wait" or "ticket_render"
+            :return: None
+        """
+        with self.__lock:
+            histogram: Histogram | None = self.__histograms.get(name)
+            if histogram is None:
+                histogram = self.__histograms[name] = Histogram(bounds=self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, value: int = 1):
+        """
+            Add to the counter of the given name, e.g. "busy_retries"
+            :return: None
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """
+            :return: dictionary with the "statements" (latency histogram and rows by statement), the "histograms" and
+            the "counters", it can be serialized to JSON
+        """
+        with self.__lock:
+            return {
+                'statements': {key: histogram.snapshot() for key, histogram in self.__merged_statements().items()},
+                'histograms': {name: histogram.snapshot() for name, histogram in self.__histograms.items()},
+                'counters': dict(self.__counters)
+            }
+
+    def prometheus(self) -> str:
+        """
+            :return: the metrics in the Prometheus text exposition format
+        """
+        lines: list[str] = []
+        with self.__lock:
+            statements: dict[str, StatementHistogram] = self.__merged_statements()
+            name: str = '{}_statement_seconds'.format(METRIC_PREFIX)
+            lines.append('# TYPE {} histogram'.format(name))
+            for key, histogram in statements.items():
+                lines.extend(self.__histogram_lines(name=name, labels='statement="{}"'.format(escape_label(key)), histogram=histogram))
+            lines.append('# TYPE {}_statement_rows_total counter'.format(METRIC_PREFIX))
+            for key, histogram in statements.items():
+                lines.append('{}_statement_rows_total{{statement="{}"}} {}'.format(METRIC_PREFIX, escape_label(key), histogram.rows))
+            for histogram_name, histogram in self.__histograms.items():
+                name = '{}_{}_seconds'.format(METRIC_PREFIX, histogram_name)
+                lines.append('# TYPE {} histogram'.format(name))
+                lines.extend(self.__histogram_lines(name=name, labels='', histogram=histogram))
+            for counter_name, value in self.__counters.items():
+                lines.append('# TYPE {}_{}_total counter'.format(METRIC_PREFIX, counter_name))
+                lines.append('{}_{}_total {}'.format(METRIC_PREFIX, counter_name, value))
+        return '\n'.join(lines) + '\n'
+
+    def __merged_statements(self) -> dict[str, StatementHistogram]:
+        """
+            Histograms of the statements by statement_key, must be called with the lock held
+        """
+        merged: dict[str, StatementHistogram] = {}
+        for sql, histogram in self.__statements.items():
+            key: str = statement_key(sql=sql)
+            if key not in merged:
+                merged[key] = StatementHistogram(bounds=self.buckets)
+            merged[key].merge(other=histogram)
+        return merged
+
+    @staticmethod
+    def __histogram_lines(name: str, labels: str, histogram: Histogram) -> Iterable[str]:
+        separator: str = ',' if labels else ''
+        for bound, count in zip(histogram.bounds, histogram.cumulative()):
+            yield '{}_bucket{{{}{}le="{}"}} {}'.format(name, labels, separator, bound, count)
+        yield '{}_bucket{{{}{}le="+Inf"}} {}'.format(name, labels, separator, histogram.count)
+        yield '{}_sum{} {}'.format(name, '{{{}}}'.format(labels) if labels else '', histogram.sum)
+        yield '{}_count{} {}'.format(name, '{{{}}}'.format(labels) if labels else '', histogram.count)
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class InstrumentedCursor:
+    """
+        sqlite3.Cursor reporting the latency and the rows of its statements to a Metrics instance. The rows of a query
+        are counted as they are fetched and reported when the next statement runs.
+    """
+    def __init__(self, cursor: sqlite3.Cursor, metrics: Metrics):
+        self.cursor: sqlite3.Cursor = cursor
+        self.metrics: Metrics = metrics
+        self.__sql: str = ''
+        self.__fetched: int = 0
+
+    def execute(self, sql: str, parameters=()) -> 'InstrumentedCursor':
+        start: float = time.perf_counter()
+        try:
+            self.cursor.execute(sql, parameters)
+        finally:
+            self.__record(sql=sql, seconds=time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql: str, parameters) -> 'InstrumentedCursor':
+        start: float = time.perf_counter()
+        try:
+            self.cursor.executemany(sql, parameters)
+        finally:
+            self.__record(sql=sql, seconds=time.perf_counter() - start)
+        return self
+
+    def fetchone(self) -> sqlite3.Row | None:
+        row: sqlite3.Row | None = self.cursor.fetchone()
+        if row is not None:
+            self.__fetched += 1
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[sqlite3.Row]:
+        rows: list[sqlite3.Row] = self.cursor.fetchmany(size) if size is not None else self.cursor.fetchmany()
+        self.__fetched += len(rows)
+        return rows
+
+    def fetchall(self) -> list[sqlite3.Row]:
+        rows: list[sqlite3.Row] = self.cursor.fetchall()
+        self.__fetched += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.__fetched += 1
+            yield row
+
+    @property
+    def rowcount(self) -> int:
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self) -> int | None:
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.__flush()
+        self.cursor.close()
+
+    def __record(self, sql: str, seconds: float):
+        self.__flush()
+        self.__sql = sql
+        # the rows changed are known once the statement ran, the rows of a query once they are fetched
+        self.metrics.observe_statement(sql=sql, seconds=seconds, rows=max(self.cursor.rowcount, 0))
+
+    def __flush(self):
+        """
+            Report the rows fetched for the previous statement
+            :return: None
+        """
+        if self.__fetched:
+            self.metrics.add_rows(sql=self.__sql, rows=self.__fetched)
+            self.__fetched = 0
@@ -0,0 +1,182 @@
+"""
+    Versioned schema migrations.
+
+    The schema is the result of the migrations below, applied in order. The version of a database is the highest
+    version recorded in its schema_migrations table, a database is migrated by applying the migrations after it.
+    Migrations only go forward, once released a migration is never changed: a change of the schema is a new migration
+    at the end of the list.
+
+    Every migration runs in its own short write transaction, so a database can be migrated while it is in use: with
+    WAL the readers keep reading the previous schema until the migration commits and writers wait for it like for any
+    other write transaction. Several processes starting at once apply every migration exactly once, the version is
+    checked again once the write lock is held.
+
+    Usage, to migrate the configured database: python -m database.migrations
+"""
+import datetime
+import sqlite3
+
+from dataclasses import dataclass
+
+from configs.config import DATABASE
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+
+
+# the statements of the first migrations use IF NOT EXISTS, the databases created before the migrations already have
+# some of these tables
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(1, 'base schema', (
+        'CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, email VARCHAR(255) NOT NULL UNIQUE, password VARCHAR(255) NOT NULL, is_admin INTEGER)',
+        'CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(255) UNIQUE, date REAL NOT NULL, price REAL NOT NULL, seats_available INTEGER)',
+        'CREATE TABLE IF NOT EXISTS reservation (user_id INTEGER, event_id INTEGER, barcode INTEGER UNIQUE, FOREIGN KEY (user_id) REFERENCES users(id), FOREIGN KEY (event_id) REFERENCES events(id))',
+    )),
+    # tickets waiting to be rendered, status is one of: pending, rendering, done, failed
+    Migration(2, 'ticket jobs', (
+        'CREATE TABLE IF NOT EXISTS ticket_jobs (barcode INTEGER PRIMARY KEY, status VARCHAR(16) NOT NULL, pdf_path VARCHAR(255), error VARCHAR(255), updated REAL NOT NULL)',
+    )),
+    # counter of the barcode allocator and the counters it skips because their barcode was issued before it existed
+    Migration(3, 'barcode sequence', (
+        'CREATE TABLE IF NOT EXISTS barcode_sequence (id INTEGER PRIMARY KEY CHECK (id=1), next INTEGER NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS barcode_skips (counter INTEGER PRIMARY KEY)',
+    )),
+    Migration(4, 'query indexes', (
+        # reservations of a user (get_user_info, get_ticket_status) read from the index alone
+        'CREATE INDEX IF NOT EXISTS reservation_user ON reservation (user_id, event_id, barcode)',
+        # upcoming events with free seats (view_events), the seats are checked in the index before reading the row
+        'CREATE INDEX IF NOT EXISTS events_date ON events (date, seats_available)',
+        # claimable ticket jobs, pending or rendering for too long
+        'CREATE INDEX IF NOT EXISTS ticket_jobs_status ON ticket_jobs (status, updated)',
+    )),
+    # counter of the changes of the events table, the event catalogue compares it with the version of its snapshot
+    Migration(5, 'events version', (
+        'CREATE TABLE IF NOT EXISTS events_version (id INTEGER PRIMARY KEY CHECK (id=1), version INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO events_version (id, version) VALUES (1, 0)',
+        'CREATE TRIGGER IF NOT EXISTS events_version_insert AFTER INSERT ON events BEGIN UPDATE events_version SET version=version+1 WHERE id=1; END',
+        'CREATE TRIGGER IF NOT EXISTS events_version_update AFTER UPDATE ON events BEGIN UPDATE events_version SET version=version+1 WHERE id=1; END',
+        'CREATE TRIGGER IF NOT EXISTS events_version_delete AFTER DELETE ON events BEGIN UPDATE events_version SET version=version+1 WHERE id=1; END',
+    )),
+    # the event listing is paginated on (date, id), an index on date is ordered by (date, rowid) which is the same;
+    # without seats_available in the key, selling a seat no longer moves the index entry of the event
+    Migration(6, 'events listing index', (
+        'CREATE INDEX IF NOT EXISTS events_date_id ON events (date, id)',
+        'DROP INDEX IF EXISTS events_date',
+    )),
+    # records of a file already imported by the event importer, kept until the import finishes so it can be resumed
+    Migration(7, 'event imports', (
+        'CREATE TABLE IF NOT EXISTS event_imports (source VARCHAR(1024) PRIMARY KEY, records INTEGER NOT NULL, updated REAL NOT NULL)',
+    )),
+    # reservations of an event, cancelled together when an event is called off
+    Migration(8, 'reservation event index', (
+        'CREATE INDEX IF NOT EXISTS reservation_event ON reservation (event_id)',
+    )),
+    # reservation history of a user, paginated on the rowid: an index on user_id alone is ordered by (user_id, rowid)
+    Migration(9, 'reservation history index', (
+        'CREATE INDEX IF NOT EXISTS reservation_history ON reservation (user_id)',
+    )),
+    # directory of the shards in the main database, and end of the block of barcode counters of a shard, see
+    # database/shards.py
+    Migration(10, 'event shards', (
+        'CREATE TABLE IF NOT EXISTS shard_files (shard INTEGER PRIMARY KEY, path VARCHAR(1024) NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS event_shards (event_id INTEGER PRIMARY KEY, shard INTEGER NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS barcode_lease (id INTEGER PRIMARY KEY CHECK (id=1), end INTEGER NOT NULL)',
+    )),
+    # tickets sold and cancelled, revenue and time of the last sale of every event, kept by triggers in the transaction
+    # of every reservation and cancellation so the sales report reads one row per event, see database/sales.py
+    Migration(11, 'event sales', (
+        'CREATE TABLE IF NOT EXISTS event_sales (event_id INTEGER PRIMARY KEY, sold INTEGER NOT NULL DEFAULT 0, '
+        'cancelled INTEGER NOT NULL DEFAULT 0, revenue REAL NOT NULL DEFAULT 0, last_sale REAL)',
+        'INSERT OR IGNORE INTO event_sales (event_id, sold, revenue) '
+        'SELECT r.event_id, count(*), count(*) * e.price FROM reservation r JOIN events e ON e.id=r.event_id GROUP BY r.event_id',
+        "CREATE TRIGGER IF NOT EXISTS event_sales_insert AFTER INSERT ON reservation BEGIN "
+        "INSERT INTO event_sales (event_id, sold, revenue, last_sale) "
+        "SELECT new.event_id, 1, price, (julianday('now') - 2440587.5) * 86400.0 FROM events WHERE id=new.event_id "
+        "ON CONFLICT (event_id) DO UPDATE SET sold=sold+1, revenue=revenue+excluded.revenue, last_sale=excluded.last_sale; END",
+        "CREATE TRIGGER IF NOT EXISTS event_sales_delete AFTER DELETE ON reservation BEGIN "
+        "UPDATE event_sales SET cancelled=cancelled+1, revenue=revenue-coalesce((SELECT price FROM events WHERE id=old.event_id), 0) "
+        "WHERE event_id=old.event_id; END",
+    )),
+    # price every ticket was sold at, so a cancellation takes back what was paid even after the price of the event
+    # changed; a reservation inserted without it gets the price of its event
+    Migration(12, 'reservation price', (
+        'ALTER TABLE reservation ADD COLUMN price REAL',
+        'UPDATE reservation SET price=(SELECT price FROM events WHERE id=reservation.event_id)',
+        'UPDATE event_sales SET revenue=coalesce((SELECT sum(price) FROM reservation WHERE event_id=event_sales.event_id), 0)',
+        'DROP TRIGGER IF EXISTS event_sales_insert',
+        'DROP TRIGGER IF EXISTS event_sales_delete',
+        "CREATE TRIGGER IF NOT EXISTS reservation_price AFTER INSERT ON reservation WHEN new.price IS NULL BEGIN "
+        "UPDATE reservation SET price=(SELECT price FROM events WHERE id=new.event_id) WHERE rowid=new.rowid; END",
+        "CREATE TRIGGER IF NOT EXISTS event_sales_insert AFTER INSERT ON reservation BEGIN "
+        "INSERT INTO event_sales (event_id, sold, revenue, last_sale) "
+        "SELECT new.event_id, 1, coalesce(new.price, price), (julianday('now') - 2440587.5) * 86400.0 FROM events WHERE id=new.event_id "
+        "ON CONFLICT (event_id) DO UPDATE SET sold=sold+1, revenue=revenue+excluded.revenue, last_sale=excluded.last_sale; END",
+        "CREATE TRIGGER IF NOT EXISTS event_sales_delete AFTER DELETE ON reservation BEGIN "
+        "UPDATE event_sales SET cancelled=cancelled+1, revenue=revenue-coalesce(old.price, 0) WHERE event_id=old.event_id; END",
+    )),
+    # blocks of barcode counters leased to a shard while its current block is being used, started in order once it is
+    # used up, see database/barcodes.py
+    Migration(13, 'barcode blocks', (
+        'CREATE TABLE IF NOT EXISTS barcode_blocks (start INTEGER PRIMARY KEY, end INTEGER NOT NULL)',
+    )),
+    # the reservations of a user are found with reservation_user, which starts with user_id: the index of migration 9
+    # only cost every reservation and cancellation one more index to write
+    Migration(14, 'drop reservation history index', (
+        'DROP INDEX IF EXISTS reservation_history',
+    )),
+)
+LATEST_VERSION: int = MIGRATIONS[-1].version
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    """
+        :param connection: connection to the database
+        :return: version of the schema of the database, 0 for a database without migrations
+    """
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied REAL NOT NULL)'
+    )
+    return connection.execute('SELECT coalesce(max(version), 0) FROM schema_migrations').fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection, target: int = LATEST_VERSION) -> list[int]:
+    """
+        Apply the migrations the database does not have yet, each in its own write transaction
+        :param connection: connection to the database, without an open transaction
+        :param target: version to migrate to, defaults to the latest
+        :return: versions applied by this call
+    """
+    applied: list[int] = []
+    if schema_version(connection=connection) >= target:
+        return applied
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # another process may have applied it while this one was waiting for the write lock
+            if schema_version(connection=connection) < migration.version:
+                for statement in migration.statements:
+                    connection.execute(statement)
+                connection.execute(
+                    'INSERT INTO schema_migrations (version, name, applied) VALUES (?, ?, ?)',
+                    (migration.version, migration.name, datetime.datetime.now().timestamp())
+                )
+                applied.append(migration.version)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+    return applied
+
+
+if __name__ == '__main__':
+    database_connection: sqlite3.Connection = sqlite3.connect(DATABASE, isolation_level=None)
+    versions: list[int] = migrate(connection=database_connection)
+    print('Applied migrations: {}'.format(versions) if versions else 'The database is up to date')
+    print('Schema version: {}'.format(schema_version(connection=database_connection)))
+    database_connection.close()
@@ -0,0 +1,198 @@
+import logging
+import pathlib
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from configs.config import DATABASE, RESERVATION_BATCH_SIZE, RESERVATION_BATCH_MAX_WAIT
+from database.database import Database
+from database.event_catalogue import EventCatalogue
+from database.instrumentation import Metrics
+from database.shards import is_sharded, shard_files
+from user.identity import Identity
+from user.user import User
+from utilities.logging_util import init_logger
+
+if TYPE_CHECKING:
+    from tickets.worker import TicketWorker
+
+
+@dataclass
+class QueuedOperation:
+    action: str  # 'reservation' or 'cancel'
+    user: User | Identity
+    event: int | None = None
+    seats: int = 1
+    barcode: int | None = None
+    future: Future = field(default_factory=Future)
+
+
+class ReservationQueue:
+    """
+        Single writer for reservations and cancellations.
+        Callers from any thread submit their operations, a writer thread owning its own connection collects them and
+        applies up to batch_size of them in one transaction, so a whole batch costs a single commit (and fsync) instead
+        of one per operation. Every operation runs in its own savepoint, a failing operation is rolled back alone and
+        only its caller is told it failed.
+        The queue writes the events of the main database, it does not work with a database with shards (see
+        database/shards.py): it refuses to start on one, and fails the batches once the database was split.
+    """
+    def __init__(self, database_path: pathlib.Path = DATABASE, batch_size: int = RESERVATION_BATCH_SIZE,
+                 max_wait: float = RESERVATION_BATCH_MAX_WAIT, ticket_worker: 'TicketWorker | None' = None,
+                 event_catalogue: EventCatalogue | None = None, metrics: Metrics | None = None):
+        """
+            Constructor to initialize the logger and start the writer thread
+            :param database_path: path to the sqlite database file
+            :param batch_size: maximum number of operations committed in one transaction
+            :param max_wait: seconds the writer waits for more operations before committing an incomplete batch
+            :param ticket_worker: worker rendering the tickets in the background, otherwise the writer renders them
+            :param event_catalogue: catalogue the committed batches are applied to, see Database
+            :param metrics: metrics the statements and commits of the writer are reported to, see Database
+            :raises ValueError: if the events of the database are in shards
+        """
+        if is_sharded(database_path=database_path):
+            raise ValueError('The reservation queue cannot write to {}, its events are in shards'.format(database_path))
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = database_path
+        self.ticket_worker: 'TicketWorker | None' = ticket_worker
+        self.event_catalogue: EventCatalogue | None = event_catalogue
+        self.metrics: Metrics | None = metrics
+        self.batch_size: int = batch_size
+        self.max_wait: float = max_wait
+        self.__operations: queue.Queue[QueuedOperation | None] = queue.Queue()
+        self.__writer: threading.Thread = threading.Thread(target=self.__write_batches, name='reservation-writer', daemon=True)
+        self.__writer.start()
+
+    def submit_reservation(self, user: User | Identity, event: int, seats: int = 1) -> Future:
+        """
+            Queue a reservation, see Database.make_reservation
+            :return: Future resolved with the barcodes once the reservation is committed or False if it could not be made
+        """
+        operation: QueuedOperation = QueuedOperation(action='reservation', user=user, event=event, seats=seats)
+        self.__operations.put(operation)
+        return operation.future
+
+    def submit_cancellation(self, user: User | Identity, barcode: int) -> Future:
+        """
+            Queue a cancellation, see Database.cancel_reservation
+            :return: Future resolved with True once the cancellation is committed or False if it could not be made
+        """
+        operation: QueuedOperation = QueuedOperation(action='cancel', user=user, barcode=barcode)
+        self.__operations.put(operation)
+        return operation.future
+
+    def make_reservation(self, user: User | Identity, event: int, seats: int = 1) -> bool | list:
+        """
+            Blocking version of submit_reservation with the same result as Database.make_reservation
+        """
+        return self.submit_reservation(user=user, event=event, seats=seats).result()
+
+    def cancel_reservation(self, user: User | Identity, barcode: int) -> bool:
+        """
+            Blocking version of submit_cancellation with the same result as Database.cancel_reservation
+        """
+        return self.submit_cancellation(user=user, barcode=barcode).result()
+
+    def close(self):
+        """
+            Apply the operations already queued and stop the writer thread
+            :return: None
+        """
+        self.__operations.put(None)
+        self.__writer.join()
+
+    def __next_batch(self) -> tuple[list[QueuedOperation], bool]:
+        """
+            Block until an operation arrives, then collect more until the batch is full or max_wait passed
+            :return: tuple with the batch and True if the queue was closed
+        """
+        first: QueuedOperation | None = self.__operations.get()
+        if first is None:
+            return [], True
+        batch: list[QueuedOperation] = [first]
+        deadline: float = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout: float = deadline - time.monotonic()
+            try:
+                operation: QueuedOperation | None = self.__operations.get(timeout=timeout) if timeout > 0 else self.__operations.get_nowait()
+            except queue.Empty:
+                break
+            if operation is None:
+                return batch, True
+            batch.append(operation)
+        return batch, False
+
+    def __write_batches(self):
+        """
+            Writer thread loop, the connection is created here because sqlite connections belong to their thread
+            :return: None
+        """
+        database: Database = Database(
+            database_path=self.database_path, ticket_worker=self.ticket_worker, event_catalogue=self.event_catalogue,
+            metrics=self.metrics
+        )
+        closed: bool = False
+        while not closed:
+            batch, closed = self.__next_batch()
+            if not batch:
+                continue
+            try:
+                results: list = database._run_in_transaction(lambda: self.__apply_batch(database=database, batch=batch))
+            except Exception as e:
+                self.logger.exception('Batch of {} operations failed: {}'.format(len(batch), str(e)))
+                for operation in batch:
+                    operation.future.set_result(False)
+                continue
+
+            # the batch is committed, answer the callers before generating the tickets
+            for operation, result in zip(batch, results):
+                if operation.action == 'reservation':
+                    operation.future.set_result(result or False)
+                else:
+                    operation.future.set_result(result is not None)
+            reserved: list = [barcode for operation, result in zip(batch, results) if operation.action == 'reservation' and result for barcode in result]
+            if reserved:
+                database.generate_tickets(barcodes=reserved)
+
+    def __apply_batch(self, database: Database, batch: list[QueuedOperation]) -> list:
+        """
+            Apply the operations of a batch, in the transaction of the batch
+            :return: result of every operation, see __apply
+            :raises RuntimeError: if the database was split into shards since the queue started, checked while the
+            write lock is held so no split can commit before the batch
+        """
+        if shard_files(connection=database.database, database_path=self.database_path):
+            raise RuntimeError('The events of {} were moved to shards, the reservation queue cannot write them'.format(self.database_path))
+        return [self.__apply(database, operation) for operation in batch]
+
+    def __apply(self, database: Database, operation: QueuedOperation) -> list | int | None:
+        """
+            Apply one operation of a batch inside its own savepoint
+            :return: None if the operation failed, otherwise the barcodes reserved or the event of the cancellation
+        """
+        try:
+            # an Identity verified by the caller is used as it is, without looking the user up
+            identity: Identity | None = database.authenticate(user=operation.user)
+            if not identity:
+                self.logger.error('Could not find a user with email: {}'.format(operation.user.get_user()))
+                return None
+            if operation.action == 'cancel':
+                return database._run_in_transaction(
+                    lambda: database._release_seat(user_id=identity.user_id, barcode=operation.barcode)
+                )
+            if operation.seats < 1:
+                self.logger.error('Invalid number of seats required.')
+                return None
+            reservation: tuple[dict, list] | None = database._run_in_transaction(
+                lambda: database._reserve_seats(user_id=identity.user_id, event=operation.event, seats=operation.seats)
+            )
+            if not reservation:
+                return None
+            return reservation[1]
+        except Exception as e:
+            self.logger.exception('Exception occurred: {}'.format(str(e)))
+            return None
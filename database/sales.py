@@ -0,0 +1,94 @@
+"""
+    Sales counters of the events.
+
+    The event_sales table keeps, for every event, the tickets sold, the tickets cancelled, the revenue and the time of
+    the last sale. The triggers of the migration 'event sales' update it in the transaction of every reservation and
+    cancellation, so the sales report reads one row per event instead of counting the reservations. Every reservation
+    keeps the price its ticket was sold at: the revenue adds it when the ticket is sold and takes it back when it is
+    cancelled, so it is the sum of the prices paid for the tickets not cancelled whatever the changes of price.
+
+    verify compares the counters with the reservations, rebuild sets them from the reservations (the tickets cancelled
+    and the time of the last sale are kept). With shards, every shard keeps the counters of its events.
+
+    Usage: python -m database.sales verify
+           python -m database.sales rebuild
+"""
+import argparse
+import pathlib
+import sqlite3
+
+from configs.config import DATABASE
+from database.connection_pool import ConnectionPool, get_pool
+from database.shards import shard_files
+
+# counters of every event next to the ones computed from its reservations
+SALES_CHECK: str = "SELECT e.id, coalesce(s.sold, 0) - coalesce(s.cancelled, 0), coalesce(s.revenue, 0), " \
+                   "(SELECT count(*) FROM reservation r WHERE r.event_id=e.id), " \
+                   "(SELECT coalesce(sum(r.price), 0) FROM reservation r WHERE r.event_id=e.id) " \
+                   "FROM events e LEFT JOIN event_sales s ON s.event_id=e.id ORDER BY e.id"
+REVENUE_TOLERANCE: float = 0.005  # rounding of the revenue summed one ticket at a time
+
+
+def verify_sales(connection: sqlite3.Connection) -> list[str]:
+    """
+        :param connection: connection to a database, or to a shard
+        :return: the events whose counters do not match their reservations, empty if they all match
+    """
+    problems: list[str] = []
+    for event_id, tickets, revenue, reservations, paid in connection.execute(SALES_CHECK):
+        if tickets != reservations:
+            problems.append('event {}: {} tickets sold and not cancelled, {} reservations'.format(event_id, tickets, reservations))
+        elif abs(revenue - paid) > REVENUE_TOLERANCE:
+            problems.append('event {}: revenue {:.2f}, {:.2f} paid for its {} reservations'.format(event_id, revenue, paid, reservations))
+    return problems
+
+
+def rebuild_sales(connection: sqlite3.Connection) -> int:
+    """
+        Set the counters of every event from its reservations, in one write transaction
+        :param connection: connection to a database, or to a shard, without an open transaction
+        :return: number of events whose counters were set
+    """
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        rebuilt: int = connection.execute(
+            "INSERT OR REPLACE INTO event_sales (event_id, sold, cancelled, revenue, last_sale) "
+            "SELECT e.id, count(r.barcode) + coalesce(s.cancelled, 0), coalesce(s.cancelled, 0), coalesce(sum(r.price), 0), s.last_sale "
+            "FROM events e LEFT JOIN reservation r ON r.event_id=e.id LEFT JOIN event_sales s ON s.event_id=e.id GROUP BY e.id"
+        ).rowcount
+        connection.commit()
+    except BaseException:
+        connection.rollback()
+        raise
+    return rebuilt
+
+
+def sales_files(database_path: pathlib.Path) -> list[pathlib.Path]:
+    """
+        :return: the files keeping the counters of the events: the shards of a database with shards, the database itself
+        otherwise
+    """
+    pool: ConnectionPool = get_pool(database_path=database_path)
+    connection: sqlite3.Connection = pool.acquire()
+    try:
+        return shard_files(connection=connection, database_path=database_path) or [pathlib.Path(database_path)]
+    finally:
+        pool.release(connection=connection)
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Verify or rebuild the sales counters of the events')
+    parser.add_argument('command', choices=['verify', 'rebuild'], help='see the usage in database/sales.py')
+    parser.add_argument('--database', type=pathlib.Path, default=DATABASE, help='main database')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    inconsistent: bool = False
+    for path in sales_files(database_path=arguments.database):
+        with get_pool(database_path=path).checkout() as database_connection:
+            found: list[str] = verify_sales(connection=database_connection)
+            if arguments.command == 'rebuild':
+                print('{}: {} events rebuilt, {} did not match'.format(path, rebuild_sales(connection=database_connection), len(found)))
+                continue
+            inconsistent = inconsistent or bool(found)
+            print('{}: {}'.format(path, '\n\t'.join(['{} events do not match'.format(len(found))] + found) if found else 'the counters match the reservations'))
+    exit(1 if inconsistent else 0)
@@ -0,0 +1,326 @@
+"""
+    Event-sharded storage.
+
+    A database can be split into shard files holding the events, their reservations and their ticket jobs: the
+    reservations of events of different shards take the write locks of different files and are committed in parallel.
+    The main database keeps the users, the event imports and the catalogue of the events (the id and name of every
+    event, the seats of its row are the ones it was imported or moved with and are not kept up to date), along with the
+    directory of the shards: shard_files gives the file of every shard, relative to the main database, and event_shards
+    the shard of every event. Database sends the reservations of an event to its shard and gathers the listings and the
+    reservations of a user from every shard. While a split moves the events of the main database to the shards, an
+    event without a row in event_shards was not moved yet: Database keeps reserving and listing it in the main database
+    until its move is committed, and a split that stopped before the end is finished by running it again.
+
+    Every shard allocates its barcodes from blocks of SHARD_BARCODE_BLOCK counters leased from the sequence of the main
+    database, so a barcode is never issued by two shards: one when the shard is created, then a new one whenever fewer
+    than SHARD_BARCODE_RENEW counters are left before a reservation (see Database), so the shards only take from the
+    10^7 counters of the database the blocks they use.
+
+    An event is moved by copying its row, reservations, ticket jobs and sales counters to the new shard while the write
+    locks of both shards are held, so no reservation of the event can be made or cancelled during the move; a Database
+    still sending its reservations to the former shard finds the event missing there and reads the directory again.
+
+    Usage: python -m database.shards split --shards 4     split into 4 shards: add the missing shards and spread the
+                                                          events evenly over all of them
+           python -m database.shards rebalance            move events until every shard has as many events
+           python -m database.shards move --event X --shard K
+           python -m database.shards status
+"""
+import argparse
+import logging
+import math
+import pathlib
+import sqlite3
+
+from configs.config import DATABASE, SHARD_BARCODE_BLOCK
+from database.availability_snapshot import remove_snapshot, snapshot_path
+from database.barcodes import get_allocator
+from database.connection_pool import ConnectionPool, get_pool
+from event.event import EVENT_COLUMNS
+from utilities.logging_util import init_logger
+
+# the cursor of the reservation history of a user is shard * CURSOR_SPAN + rowid of the reservation in its shard
+CURSOR_SPAN: int = 2 ** 48
+
+
+def shard_files(connection: sqlite3.Connection, database_path: pathlib.Path) -> list[pathlib.Path]:
+    """
+        :param connection: connection to the main database
+        :param database_path: path of the main database, the files of the shards are relative to its directory
+        :return: path of the file of every shard, in the order of the shards; empty for a database without shards
+    """
+    return [pathlib.Path(database_path).parent / row[0] for row in connection.execute("SELECT path FROM shard_files ORDER BY shard")]
+
+
+def is_sharded(database_path: pathlib.Path) -> bool:
+    """
+        :param database_path: path of the main database
+        :return: True if the events of the database are in shards
+    """
+    pool: ConnectionPool = get_pool(database_path=database_path)
+    connection: sqlite3.Connection = pool.acquire()
+    try:
+        return bool(shard_files(connection=connection, database_path=database_path))
+    finally:
+        pool.release(connection=connection)
+
+
+def shard_path(database_path: pathlib.Path, shard: int) -> pathlib.Path:
+    """
+        :return: path of the file of a new shard, next to the main database
+    """
+    database_path = pathlib.Path(database_path)
+    return database_path.with_name('{}-shard{}{}'.format(database_path.stem, shard, database_path.suffix))
+
+
+class ShardManager:
+    """
+        Creates the shards of a database and moves events between them
+    """
+    def __init__(self, database_path: pathlib.Path = DATABASE):
+        """
+            Constructor to initialize the logger and check out a connection to the main database
+            :param database_path: path of the main database
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = pathlib.Path(database_path)
+        self.main: sqlite3.Connection = get_pool(database_path=self.database_path).acquire()
+        self.__shards: dict[int, sqlite3.Connection] = {}
+
+    def close(self):
+        """
+            Give the connections back to their pools
+            :return: None
+        """
+        files: list[pathlib.Path] = self.files()
+        for shard, connection in self.__shards.items():
+            get_pool(database_path=files[shard]).release(connection=connection)
+        self.__shards.clear()
+        get_pool(database_path=self.database_path).release(connection=self.main)
+
+    def files(self) -> list[pathlib.Path]:
+        return shard_files(connection=self.main, database_path=self.database_path)
+
+    def shard(self, shard: int) -> sqlite3.Connection:
+        """
+            :return: connection to a shard, the file gets the schema the first time it is opened
+        """
+        if shard not in self.__shards:
+            self.__shards[shard] = get_pool(database_path=self.files()[shard]).acquire()
+        return self.__shards[shard]
+
+    def shard_of(self, event: int) -> int | None:
+        """
+            :return: shard of the event, None for an event still in the main database
+        """
+        row: sqlite3.Row | None = self.main.execute("SELECT shard FROM event_shards WHERE event_id=?", (event, )).fetchone()
+        return row[0] if row else None
+
+    def add_shards(self, count: int) -> list[int]:
+        """
+            Create new shards, each with a block of barcode counters leased from the main database
+            :param count: number of shards to add
+            :return: the new shards
+        """
+        added: list[int] = []
+        for _ in range(count):
+            shard: int = len(self.files())
+            path: pathlib.Path = shard_path(database_path=self.database_path, shard=shard)
+            self.main.execute('BEGIN IMMEDIATE')
+            try:
+                self.main.execute("INSERT INTO shard_files (shard, path) VALUES (?, ?)", (shard, path.name))
+                self.main.commit()
+            except BaseException:
+                self.main.rollback()
+                raise
+            self.logger.info('Shard {} created in {}'.format(shard, path))
+            self.lease_barcodes(shard=shard)
+            added.append(shard)
+        return added
+
+    def lease_barcodes(self, shard: int):
+        """
+            Lease a block of barcode counters of the main database to a shard. The main database commits the lease
+            before the shard records it: a failure in between loses the block, it is never issued twice.
+            :param shard: index of the shard
+            :return: None
+        """
+        self.main.execute('BEGIN IMMEDIATE')
+        try:
+            start, end = get_allocator().lease(cursor=self.main.cursor(), count=SHARD_BARCODE_BLOCK)
+            skipped: list[int] = [row[0] for row in self.main.execute(
+                "SELECT counter FROM barcode_skips WHERE counter>=? AND counter<?", (start, end)
+            )]
+            self.main.commit()
+        except BaseException:
+            self.main.rollback()
+            raise
+        connection: sqlite3.Connection = self.shard(shard)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            get_allocator().extend_lease(cursor=connection.cursor(), start=start, end=end, skipped=skipped)
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        self.logger.info('Barcode counters [{}, {}) leased to shard {}'.format(start, end, shard))
+
+    def move_event(self, event: int, target: int) -> bool:
+        """
+            Move an event, its reservations and its ticket jobs to a shard. The target is committed first, then the
+            directory, then the source: a failure in between leaves a copy in the target that the next move replaces.
+            The write locks are taken in one global order, the main database then the shards by ascending index, the
+            order of the imports too, so concurrent moves (and imports) never wait on each other's locks.
+            :param event: event id
+            :param target: shard the event is moved to
+            :return: True if the event was moved, False if it was already there or does not exist
+        """
+        source: int | None = self.shard_of(event=event)
+        if source == target:
+            return False
+        source_connection: sqlite3.Connection = self.main if source is None else self.shard(source)
+        target_connection: sqlite3.Connection = self.shard(target)
+        locked: list[sqlite3.Connection] = [self.main] + [
+            self.shard(shard) for shard in sorted(shard for shard in (source, target) if shard is not None)
+        ]
+        try:
+            for connection in locked:
+                connection.execute('BEGIN IMMEDIATE')
+            # the event may have been moved by another process before the locks were taken
+            if self.shard_of(event=event) != source:
+                for connection in locked:
+                    connection.rollback()
+                return self.move_event(event=event, target=target)
+            row: tuple | None = source_connection.execute(
+                "SELECT {} FROM events WHERE id=?".format(EVENT_COLUMNS), (event, )
+            ).fetchone()
+            if row is None:
+                for connection in locked:
+                    connection.rollback()
+                return False
+            reservations: list[tuple] = [tuple(reservation) for reservation in source_connection.execute(
+                "SELECT user_id, event_id, barcode, price FROM reservation WHERE event_id=?", (event, )
+            )]
+            jobs: list[tuple] = [tuple(job) for job in source_connection.execute(
+                "SELECT t.barcode, t.status, t.pdf_path, t.error, t.updated FROM reservation r "
+                "JOIN ticket_jobs t ON t.barcode=r.barcode WHERE r.event_id=?", (event, )
+            )]
+            sales: tuple | None = source_connection.execute(
+                "SELECT event_id, sold, cancelled, revenue, last_sale FROM event_sales WHERE event_id=?", (event, )
+            ).fetchone()
+            target_connection.execute("DELETE FROM reservation WHERE event_id=?", (event, ))
+            target_connection.execute("INSERT OR REPLACE INTO events ({}) VALUES (?, ?, ?, ?, ?)".format(EVENT_COLUMNS), tuple(row))
+            target_connection.executemany("INSERT INTO reservation (user_id, event_id, barcode, price) VALUES (?, ?, ?, ?)", reservations)
+            target_connection.executemany(
+                "INSERT OR REPLACE INTO ticket_jobs (barcode, status, pdf_path, error, updated) VALUES (?, ?, ?, ?, ?)", jobs
+            )
+            # the copied reservations count as sales in the target and as cancellations in the source for the
+            # triggers, the counters of the event are moved as they were instead
+            target_connection.execute("DELETE FROM event_sales WHERE event_id=?", (event, ))
+            if sales is not None:
+                target_connection.execute(
+                    "INSERT INTO event_sales (event_id, sold, cancelled, revenue, last_sale) VALUES (?, ?, ?, ?, ?)", tuple(sales)
+                )
+            target_connection.commit()
+
+            # the row of an event leaving the main database stays there, it keeps its id and name for the imports
+            if source is not None:
+                source_connection.execute("DELETE FROM events WHERE id=?", (event, ))
+            source_connection.execute(
+                "DELETE FROM ticket_jobs WHERE barcode IN (SELECT barcode FROM reservation WHERE event_id=?)", (event, )
+            )
+            source_connection.execute("DELETE FROM reservation WHERE event_id=?", (event, ))
+            source_connection.execute("DELETE FROM event_sales WHERE event_id=?", (event, ))
+            self.main.execute("INSERT OR REPLACE INTO event_shards (event_id, shard) VALUES (?, ?)", (event, target))
+            self.main.commit()
+            source_connection.commit()
+        except BaseException:
+            for connection in locked:
+                if connection.in_transaction:
+                    connection.rollback()
+            raise
+        # the availability snapshots of both files no longer match their events, the next commit publishes them
+        for path in (self.database_path if source is None else self.files()[source], self.files()[target]):
+            remove_snapshot(path=snapshot_path(database_path=path))
+        self.logger.info('Event {} moved from {} to shard {} with {} reservations'.format(
+            event, 'the main database' if source is None else 'shard {}'.format(source), target, len(reservations)
+        ))
+        return True
+
+    def rebalance(self) -> int:
+        """
+            Move the events left in the main database to the shards with the fewest events, then move events from the
+            shards with more than their share to the ones with less
+            :return: number of events moved
+        """
+        shards: int = len(self.files())
+        if shards == 0:
+            raise RuntimeError('The database has no shards, create them with the split command')
+        events: dict[int | None, list[int]] = {shard: [] for shard in range(shards)}
+        events[None] = []
+        for event_id, shard in self.main.execute(
+            "SELECT e.id, s.shard FROM events e LEFT JOIN event_shards s ON s.event_id=e.id ORDER BY e.id"
+        ):
+            events.setdefault(shard, []).append(event_id)
+        share: int = math.ceil(sum(len(ids) for ids in events.values()) / shards)
+        surplus: list[int] = events.pop(None)
+        for shard in range(shards):
+            surplus.extend(events[shard][share:])
+            events[shard] = events[shard][:share]
+        moved: int = 0
+        for shard in sorted(range(shards), key=lambda index: len(events[index])):
+            while len(events[shard]) < share and surplus:
+                event_id: int = surplus.pop()
+                moved += self.move_event(event=event_id, target=shard)
+                events[shard].append(event_id)
+        return moved
+
+    def split(self, count: int) -> int:
+        """
+            Split the database into shards: add the shards it does not have yet, lease their first block of barcode
+            counters to the shards that did not get it, then spread the events evenly over all the shards. Every step
+            is committed as it is done and the events not moved yet are still reserved in the main database, so a split
+            that stopped (a crash, a full disk) is finished by running it again with the same count.
+            :param count: number of shards of the database once split
+            :return: number of events moved
+        """
+        self.add_shards(count=max(count - len(self.files()), 0))
+        for shard in range(len(self.files())):
+            if get_allocator().leased_left(cursor=self.shard(shard).cursor()) is None:
+                self.lease_barcodes(shard=shard)
+        return self.rebalance()
+
+    def status(self) -> list[dict]:
+        """
+            :return: for every shard, its file and its number of events and reservations
+        """
+        return [
+            {
+                'shard': shard, 'path': str(path),
+                'events': self.shard(shard).execute("SELECT count(*) FROM events").fetchone()[0],
+                'reservations': self.shard(shard).execute("SELECT count(*) FROM reservation").fetchone()[0],
+            }
+            for shard, path in enumerate(self.files())
+        ]
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Create the shards of a database and move events between them')
+    parser.add_argument('command', choices=['split', 'rebalance', 'move', 'status'], help='see the usage in database/shards.py')
+    parser.add_argument('--shards', type=int, default=2, help='for "split", number of shards of the database once split')
+    parser.add_argument('--event', type=int, help='for "move", event to move')
+    parser.add_argument('--shard', type=int, help='for "move", shard the event is moved to')
+    parser.add_argument('--database', type=pathlib.Path, default=DATABASE, help='main database')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    manager: ShardManager = ShardManager(database_path=arguments.database)
+    match arguments.command:
+        case 'split':
+            print('{} events moved'.format(manager.split(count=arguments.shards)))
+        case 'rebalance':
+            print('{} events moved'.format(manager.rebalance()))
+        case 'move':
+            print('moved' if manager.move_event(event=arguments.event, target=arguments.shard) else 'not moved')
+    for entry in manager.status():
+        print('shard {shard}: {events} events, {reservations} reservations ({path})'.format(**entry))
+    manager.close()
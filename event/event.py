@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import NamedTuple
 
 
 @dataclass
@@ -7,3 +8,40 @@ class Event:
     date: float
     price: float
     seats_available: int
+
+
+class EventRecord(NamedTuple):
+    """
+        An event as read from the events table. A tuple of the columns, the rows are read into it without building a
+        dictionary per row.
+    """
+    id: int
+    name: str
+    date: float
+    price: float
+    seats_available: int
+
+    def view_entry(self) -> dict:
+        """
+            :return: the event in the format of Database.view_events, {id: {"name", "date", "price", "seats_available"}}
+        """
+        return {self.id: {'name': self.name, 'date': self.date, 'price': self.price, 'seats_available': self.seats_available}}
+
+
+EVENT_COLUMNS: str = 'id, name, date, price, seats_available'  # columns of the events table in the order of EventRecord
+
+
+class EventSales(NamedTuple):
+    """
+        Sales of an event as kept in the event_sales table, see database/sales.py. The revenue is the price of the
+        tickets sold when they were sold, less the price of the tickets cancelled when they were cancelled.
+    """
+    id: int
+    name: str
+    date: float
+    price: float
+    sold: int
+    cancelled: int
+    revenue: float
+    last_sale: float | None
+
@@ -2,10 +2,10 @@ import argparse
 import logging
 import json
 
-from utilities.utils import check_email, check_positive, convert_timestamp
+from configs.config import EVENT_PAGE_SIZE, RESERVATION_PAGE_SIZE
+from utilities.utils import check_email, check_positive, check_date, check_price, convert_timestamp
 from utilities.logging_util import init_logger
-from user.user import User
-from database.database import Database
+from service.client import send_request
 
 if __name__ == '__main__':
     logger: logging.Logger = init_logger('MAIN LOGGER')
@@ -17,10 +17,13 @@ if __name__ == '__main__':
     If you do not have an account, you can register one using -a or --action and specify the action 'register' after that you can choose from the options below.\n
     Choose an action you want to do.
         - register: Register the user (email) and password
-        - view: View all the available events
+        - view: View the available events, a page at a time, optionally filtered by date, price and seats
         - reservation: Make a reservation for a given event
-        - cancel: Cancel reservation for a given event
-        - info: List the information for your user 
+        - cancel: Cancel reservations by barcode (-b B [B ...]) or for a given event (-e X)
+        - info: List the information for your user and your reservations, a page at a time
+        - tickets: List your tickets and if their PDF is ready
+        - stats: Show the query and rendering statistics of the reservation service (admins only)
+        - report: Show the tickets sold and cancelled and the revenue of every event, or of a given event (-e X) (admins only)
                                      ''')
 
     parser.add_argument(
@@ -47,15 +50,21 @@ if __name__ == '__main__':
             'view',
             'reservation',
             'cancel',
-            'info'
+            'info',
+            'tickets',
+            'stats',
+            'report'
         ],
         help='''
             Choose an action you want to do.\n
             - register: Register the user (email) and password \n
             - view: View all the available event \n
             - reservation: Make a reservation/s for a given event \n
-            - cancel: Cancel reservation identified by the given barcode \n 
+            - cancel: Cancel the reservations identified by the given barcodes, or all your reservations for an event \n 
             - info: List the information for your user \n
+            - tickets: List your tickets and if their PDF is ready \n
+            - stats: Show the query and rendering statistics of the reservation service (admins only) \n
+            - report: Show the tickets sold and cancelled and the revenue of every event (admins only) \n
         '''
     )
 
@@ -64,8 +73,11 @@ if __name__ == '__main__':
         "--event",
         required=False,
         type=check_positive,
-        help='''Available only for "reservation", it implies that you:
+        help='''Available for "reservation", "cancel", "info" and "report", it implies that you:
              - want to make a reservation for -e X event
+             - want to cancel all your reservations for -e X event (all the reservations of the event for an admin)
+             - want to list only your reservations for -e X event
+             - want to report only the sales of -e X event
              '''
     )
 
@@ -85,90 +97,195 @@ if __name__ == '__main__':
         "--barcode",
         required=False,
         type=check_positive,
+        nargs='+',
         help='''
-            Available for "cancel", it implies that you:
-            - want to make a cancellation for the reservation with barcode -b B
+            Available for "cancel" and "tickets", it implies that you:
+            - want to make a cancellation for the reservations with barcodes -b B [B ...], in one transaction
+            - want to know if the PDFs of the tickets with barcodes -b B [B ...] are ready
             '''
     )
 
+    parser.add_argument(
+        "--page-size",
+        required=False,
+        type=check_positive,
+        help='Available for "view" and "info", number of events ({} by default) or reservations ({} by default) read at once'
+        .format(EVENT_PAGE_SIZE, RESERVATION_PAGE_SIZE)
+    )
+
+    parser.add_argument(
+        "--upcoming",
+        action="store_true",
+        help='Available for "info", list only the reservations of the events still to come'
+    )
+
+    parser.add_argument(
+        "--from",
+        dest="date_from",
+        required=False,
+        type=check_date,
+        help='Available for "view", list the events starting from this date, e.g. "2024-06-01 18:00"'
+    )
+
+    parser.add_argument(
+        "--to",
+        dest="date_to",
+        required=False,
+        type=check_date,
+        help='Available for "view", list the events up to this date'
+    )
+
+    parser.add_argument(
+        "--min-price",
+        dest="price_min",
+        required=False,
+        type=check_price,
+        help='Available for "view", list the events costing at least this price'
+    )
+
+    parser.add_argument(
+        "--max-price",
+        dest="price_max",
+        required=False,
+        type=check_price,
+        help='Available for "view", list the events costing at most this price'
+    )
+
+    parser.add_argument(
+        "--min-seats",
+        required=False,
+        type=check_positive,
+        help='Available for "view", list the events with at least this many seats available'
+    )
+
+    parser.add_argument(
+        "--format",
+        required=False,
+        choices=['json', 'prometheus'],
+        default='json',
+        help='Available for "stats", format of the statistics'
+    )
+
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Run the action in this process even if the reservation service (python -m service.server) is running"
+    )
+
     # this should contain as keys "user", "password" and "action"
     command_information: dict = vars(parser.parse_args())
+    local: bool = command_information.pop('local')
+
+    local_database = None
+
+    def run(request: dict) -> dict:
+        """
+            Send the request to the service or, when it is not running, handle it in this process
+            :param request: request dictionary, see service.handlers.handle_request
+            :return: response dictionary
+        """
+        global local, local_database
+        # the service answers with an already warm database, when it is not running the action is done in this process;
+        # a request that reached the service is never done again here, even when no answer came back
+        result: dict | None = None if local else send_request(request=request)
+        if result is None:
+            from database.database import Database
+            from service.handlers import handle_request
+            local = True
+            local_database = local_database or Database()
+            result = handle_request(database=local_database, request=request)
+        return result
+
+    if command_information['action'] != 'view':
+        for field in ('date_from', 'date_to', 'price_min', 'price_max', 'min_seats'):
+            command_information.pop(field)
+    if command_information['action'] not in ('view', 'info'):
+        command_information.pop('page_size')
+    elif command_information['page_size'] is None:
+        command_information['page_size'] = EVENT_PAGE_SIZE if command_information['action'] == 'view' else RESERVATION_PAGE_SIZE
+    if command_information['action'] != 'info':
+        command_information.pop('upcoming')
+    if command_information['action'] != 'stats':
+        command_information.pop('format')
+    # one barcode keeps the single-barcode request, several are sent as a list
+    barcodes: list[int] | None = command_information.pop('barcode')
+    if barcodes and len(barcodes) == 1:
+        command_information['barcode'] = barcodes[0]
+    elif barcodes:
+        command_information['barcodes'] = barcodes
+    query_result: dict = run(request=command_information)
 
-    # we will always check first if there is a valid User
-    user: User = User(user=command_information['user'], password=command_information['password'])
-    database: Database = Database()
+    if not query_result['success']:
+        logger.error(query_result['message'])
+        exit(1)
+    logger.info(query_result['message'])
 
     match command_information['action']:
-        case 'register':
-            query_result: bool = database.register_user(user=user)
-            if query_result is True:
-                logger.info('Successfully registered!')
-                exit(0)
-            logger.error('Registration failed!')
-            exit(1)
         case 'view':
-            if not database.check_user(user=user):
-                logger.error('Invalid credentials. Please check that you entered them correctly or make sure you are registered.')
-                exit(1)
-            query_result: bool | list[dict] = database.view_events()
-            match query_result:
-                case False:
-                    logger.error('Could not list events ...')
+            # the events are shown a page at a time, the next page is asked with the cursor of the previous one
+            while True:
+                page: dict = query_result['data']
+                if page['events']:
+                    logger.info(''.join(
+                        "\n\n\tIdentifier: {}\n\tEvent name: {}\n\tDate: {}\n\tPrice: {} RON\n\tSeats available: {}"
+                        .format(event['id'], event['name'], convert_timestamp(timestamp=event['date']), event['price'], event['seats_available'])
+                        for event in page['events']
+                    ))
+                if page['cursor'] is None:
+                    break
+                query_result = run(request={**command_information, 'cursor': page['cursor']})
+                if not query_result['success']:
+                    logger.error(query_result['message'])
                     exit(1)
-                case []:
-                    logger.info('No events available to display')
-                    exit(0)
-            logger.info('Events available: ')
-
-            to_display: str = ""
-            for event_details in query_result:
-                print(event_details)
-                id_event, event_information = list(event_details.items())[0]
-                to_display += "\n\n\tIdentifier: {}\n\tEvent name: {}\n\tDate: {}\n\tPrice: {} RON\n\tSeats available: {}"\
-                    .format(id_event, event_information['name'], convert_timestamp(timestamp=event_information['date']), event_information['price'], event_information['seats_available'])
-            logger.info(to_display)
-            exit(0)
-        case 'reservation':
-            if not command_information.get('event'):
-                logger.error('An event must be given, -e X or --event X, X being an event id found after querying -a or --action view.')
-                exit(1)
-            if not database.check_user(user=user):
-                logger.error('Invalid credentials. Please check that you entered them correctly or make sure you are registered.')
-                exit(1)
-            if database.make_reservation(user=user, event=command_information['event'], seats=command_information.get("seats") or 1):
-                logger.info('Successfully made a reservation!')
-                exit(0)
-            logger.error('Could not make the reservation ...')
-            exit(1)
-        case 'cancel':
-            if not command_information.get('barcode'):
-                logger.error('No barcode provided')
-                exit(1)
-            if not database.check_user(user=user):
-                logger.error('Invalid credentials. Please check that you entered them correctly or make sure you are registered.')
-                exit(1)
-            if database.cancel_reservation(user=user, barcode=command_information.get('barcode')):
-                logger.info('Successfully made a cancelation!')
-                exit(0)
-            logger.error('Could not make cancellation ...')
-            exit(1)
         case 'info':
-            if not database.check_user(user=user):
-                logger.error('Invalid credentials. Please check that you entered them correctly or make sure you are registered.')
-                exit(1)
-            logger.info('User information:')
-            user_information: dict = database.get_user_info(user=user)
-            print(user_information)
-            to_display: str = "\n\tEmail: {}\n\tPassword: {}\n\t".format(user_information['email'], user_information['hashed_password'])
-            if isinstance(user_information['reservations'], str):
-                to_display += "Reservations: {}".format(user_information['reservations'])
-                logger.info(to_display)
+            # the seats reserved for every event come with the first page, the reservations are shown a page at a time
+            page: dict = query_result['data']
+            to_display: str = "\n\tEmail: {}\n\tPassword: {}\n\t".format(page['email'], page['hashed_password'])
+            if not page['events']:
+                logger.info(to_display + "Reservations: There are no reservations for the user.")
                 exit(0)
-            to_display += "Reservations:\n"
-            for reservation in user_information['reservations']:
-                to_display += "\t\tEvent name: {}\n\t\tDate: {}\n\t\tBarcode: {}\n\n"\
-                    .format(reservation['name'], convert_timestamp(timestamp=reservation['date']), reservation['barcode'])
-
-            logger.info(to_display)
-            exit(0)
-
+            to_display += "Seats reserved:\n"
+            for event in page['events']:
+                to_display += "\t\tEvent name: {}\n\t\tDate: {}\n\t\tSeats: {}\n\n"\
+                    .format(event['name'], convert_timestamp(timestamp=event['date']), event['seats'])
+            logger.info(to_display + "\tReservations:")
+            while True:
+                if page['reservations']:
+                    logger.info(''.join(
+                        "\n\t\tEvent name: {}\n\t\tDate: {}\n\t\tBarcode: {}\n"
+                        .format(reservation['name'], convert_timestamp(timestamp=reservation['date']), reservation['barcode'])
+                        for reservation in page['reservations']
+                    ))
+                if page['cursor'] is None:
+                    break
+                query_result = run(request={**command_information, 'cursor': page['cursor']})
+                if not query_result['success']:
+                    logger.error(query_result['message'])
+                    exit(1)
+                page = query_result['data']
+        case 'cancel' if isinstance(query_result['data'], list):
+            logger.info(''.join(
+                "\n\tBarcode: {}\t{}".format(outcome['barcode'], 'cancelled' if outcome['cancelled'] else 'not found')
+                for outcome in query_result['data']
+            ))
+        case 'stats':
+            print(query_result['data'] if command_information['format'] == 'prometheus' else json.dumps(query_result['data'], indent=2))
+        case 'report':
+            report: dict = query_result['data']
+            logger.info(''.join(
+                "\n\tIdentifier: {}\n\tEvent name: {}\n\tDate: {}\n\tPrice: {} RON\n\tSold: {}\n\tCancelled: {}\n\tRevenue: {:.2f} RON\n\tLast sale: {}\n"
+                .format(event['id'], event['name'], convert_timestamp(timestamp=event['date']), event['price'], event['sold'],
+                        event['cancelled'], event['revenue'], convert_timestamp(timestamp=event['last_sale']) if event['last_sale'] else '-')
+                for event in report['events']
+            ) + "\n\tTotal: {} sold, {} cancelled, {:.2f} RON".format(
+                report['totals']['sold'], report['totals']['cancelled'], report['totals']['revenue']
+            ))
+        case 'reservation':
+            logger.info('Barcodes: {}'.format(', '.join(str(barcode) for barcode in query_result['data']['barcodes'])))
+        case 'tickets':
+            to_display: str = ""
+            for ticket in query_result['data']:
+                to_display += "\n\tBarcode: {}\n\tStatus: {}\n\tPDF: {}\n".format(ticket['barcode'], ticket['status'], ticket['pdf_path'] or '-')
+            if to_display:
+                logger.info(to_display)
+    exit(0)
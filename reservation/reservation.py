@@ -0,0 +1,21 @@
+from typing import NamedTuple
+
+
+class ReservationRecord(NamedTuple):
+    """
+        A reservation of a user along with the name and date of its event, as listed by Database.get_user_info
+    """
+    barcode: int
+    event_id: int
+    name: str
+    date: float
+
+
+class ReservationSummary(NamedTuple):
+    """
+        The seats reserved by a user for one event, as counted by Database.reservation_summary
+    """
+    event_id: int
+    name: str
+    date: float
+    seats: int
@@ -0,0 +1,154 @@
+"""
+    Batch mode: run a JSON Lines file of requests in one process.
+
+    Every line is a request with the same fields as the command line of main.py ("user", "password", "action", "event",
+    "seats", "barcode"), every request gets one response line from service.handlers, written in the order of the
+    requests. The interpreter, the imports and the database connection are set up once for the whole file instead of
+    once per request, the verified credentials are cached and consecutive requests are committed together, up to
+    batch_size of them per transaction. Every request runs in its own savepoint: a failing request is rolled back alone.
+
+    With more than one worker the requests are split by user, the requests of a user are run in order by the same
+    worker while the workers run in parallel. The requests of different users may then reach the database in another
+    order than the one of the file, e.g. when they compete for the last seats of an event.
+
+    Usage: python -m service.batch requests.jsonl [--output responses.jsonl] [--batch-size 64] [--workers 1]
+"""
+import argparse
+import json
+import logging
+import pathlib
+import queue
+import sys
+import threading
+
+from typing import IO, Iterable
+
+from configs.config import DATABASE, RESERVATION_BATCH_SIZE
+from database.database import Database
+from service.handlers import handle_request, response
+from tickets.worker import TicketWorker
+from user.credential_cache import CredentialCache
+from utilities.logging_util import init_logger
+
+
+class BatchRunner:
+    def __init__(self, database_path: pathlib.Path = DATABASE, batch_size: int = RESERVATION_BATCH_SIZE, workers: int = 1):
+        """
+            :param database_path: path to the sqlite database file
+            :param batch_size: maximum number of requests committed in one transaction
+            :param workers: threads running requests, the requests of a user always go to the same one
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = database_path
+        self.batch_size: int = batch_size
+        self.workers: int = workers
+        self.credential_cache: CredentialCache = CredentialCache()
+
+    def run(self, lines: Iterable[str], output: IO[str]) -> int:
+        """
+            Run the requests and write their responses, the lines are read as the workers need them
+            :param lines: JSON requests, one per line, empty lines are skipped
+            :param output: text stream the responses are written to, one JSON line per request
+            :return: number of requests run
+        """
+        ticket_worker: TicketWorker = TicketWorker(database_path=self.database_path)
+        # a bounded queue per worker, the file is not read further ahead than the workers can keep up with
+        requests: list[queue.Queue] = [queue.Queue(maxsize=4 * self.batch_size) for _ in range(self.workers)]
+        responses: queue.Queue = queue.Queue()
+        threads: list[threading.Thread] = [
+            threading.Thread(target=self.__work, args=(requests[index], responses, ticket_worker), name='batch-{}'.format(index))
+            for index in range(self.workers)
+        ]
+        writer: threading.Thread = threading.Thread(target=self.__write, args=(responses, output), name='batch-writer')
+        for thread in threads + [writer]:
+            thread.start()
+
+        count: int = 0
+        try:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    request: dict = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('a request is a JSON object')
+                except ValueError as e:
+                    responses.put((count, response(False, 'Invalid request: {}'.format(str(e)))))
+                else:
+                    requests[hash(str(request.get('user'))) % self.workers].put((count, request))
+                count += 1
+        finally:
+            for worker_requests in requests:
+                worker_requests.put(None)
+            for thread in threads:
+                thread.join()
+            responses.put(None)
+            writer.join()
+            ticket_worker.close()
+        return count
+
+    def __work(self, requests: queue.Queue, responses: queue.Queue, ticket_worker: TicketWorker):
+        """
+            Worker thread loop: take the requests waiting, up to batch_size, and run them in one transaction
+            :return: None
+        """
+        database: Database = Database(
+            database_path=self.database_path, ticket_worker=ticket_worker, credential_cache=self.credential_cache
+        )
+        closed: bool = False
+        while not closed:
+            batch: list[tuple[int, dict]] = []
+            item: tuple[int, dict] | None = requests.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    break
+                try:
+                    item = requests.get_nowait()
+                except queue.Empty:
+                    break
+            closed = item is None
+            if not batch:
+                continue
+            try:
+                results: list[dict] = database._run_in_transaction(
+                    lambda: [handle_request(database=database, request=request) for _, request in batch]
+                )
+            except Exception as e:
+                self.logger.exception('Batch of {} requests failed: {}'.format(len(batch), str(e)))
+                results = [response(False, 'Could not run the request ...') for _ in batch]
+            for (index, _), result in zip(batch, results):
+                responses.put((index, result))
+        database.close()
+
+    @staticmethod
+    def __write(responses: queue.Queue, output: IO[str]):
+        """
+            Writer thread loop, the responses arrive in any order and are written in the order of the requests
+            :return: None
+        """
+        waiting: dict[int, dict] = {}
+        following: int = 0
+        while (item := responses.get()) is not None:
+            index, result = item
+            waiting[index] = result
+            while following in waiting:
+                output.write(json.dumps(waiting.pop(following)) + '\n')
+                following += 1
+        output.flush()
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Run a JSON Lines file of requests')
+    parser.add_argument('path', help='file with one JSON request per line, - for the standard input')
+    parser.add_argument('--output', help='file the responses are written to, the standard output by default')
+    parser.add_argument('--batch-size', type=int, default=RESERVATION_BATCH_SIZE, help='requests committed in one transaction')
+    parser.add_argument('--workers', type=int, default=1, help='threads running the requests of different users in parallel')
+    parser.add_argument('--database', type=pathlib.Path, default=DATABASE, help='database file')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    runner: BatchRunner = BatchRunner(database_path=arguments.database, batch_size=arguments.batch_size, workers=arguments.workers)
+    with open(arguments.path) if arguments.path != '-' else sys.stdin as input_file, \
+            open(arguments.output, 'w') if arguments.output else sys.stdout as output_file:
+        total: int = runner.run(lines=input_file, output=output_file)
+    runner.logger.info('{} requests run'.format(total))
@@ -0,0 +1,42 @@
+import json
+import socket
+
+from configs.config import SERVICE_HOST, SERVICE_PORT, SERVICE_UNIX_SOCKET, SERVICE_CLIENT_TIMEOUT
+
+
+def send_request(request: dict, host: str = SERVICE_HOST, port: int = SERVICE_PORT,
+                 unix_socket: str | None = SERVICE_UNIX_SOCKET, timeout: float = SERVICE_CLIENT_TIMEOUT) -> dict | None:
+    """
+        Send a request to the reservation service and wait for its response.
+        Only the standard library is imported here, so a client does not pay for the database or PDF imports.
+
+        :param request: request dictionary, see service.handlers
+        :param host: address of the service
+        :param port: port of the service
+        :param unix_socket: path of the Unix socket of the service, used instead of host and port when given
+        :param timeout: seconds to wait for the service
+        :return: response dictionary or None if the service is not running, in which case nothing was sent
+    """
+    try:
+        if unix_socket:
+            connection: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(timeout)
+            connection.connect(unix_socket)
+        else:
+            connection: socket.socket = socket.create_connection((host, port), timeout=timeout)
+    except OSError:
+        return None
+
+    # once the request is sent the service may have done it, so a missing answer is an error and not a reason to
+    # do the request again in the caller
+    line: bytes = b''
+    with connection:
+        try:
+            connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with connection.makefile('rb') as stream:
+                line = stream.readline()
+        except OSError:
+            pass
+    if not line:
+        return {'success': False, 'message': 'no answer from the service', 'data': None}
+    return json.loads(line)
@@ -0,0 +1,243 @@
+from configs.config import EVENT_PAGE_SIZE, EVENT_MAX_PAGE_SIZE, RESERVATION_PAGE_SIZE, RESERVATION_MAX_PAGE_SIZE
+from database.database import Database
+from database.event_filter import EventFilter
+from event.event import EventRecord, EventSales
+from reservation.reservation import ReservationRecord, ReservationSummary
+from user.identity import Identity
+from user.user import User
+
+ACTIONS: tuple[str, ...] = ('register', 'view', 'reservation', 'cancel', 'info', 'tickets', 'stats', 'report')
+# fields of a view request asking for a page of the listing instead of all the events
+LISTING_FIELDS: tuple[str, ...] = ('page_size', 'cursor', 'date_from', 'date_to', 'price_min', 'price_max', 'min_seats')
+# fields of an info request asking for a page of the reservation history instead of all the reservations
+HISTORY_FIELDS: tuple[str, ...] = ('page_size', 'cursor', 'upcoming', 'event')
+INVALID_CREDENTIALS: str = 'Invalid credentials. Please check that you entered them correctly or make sure you are registered.'
+
+
+def response(success: bool, message: str, data=None) -> dict:
+    """
+        Build the answer for a request, the same structure is used locally and by the service
+        :param success: True if the action was successful
+        :param message: message to display to the user
+        :param data: information requested, if any
+        :return: dictionary with the keys "success", "message" and "data"
+    """
+    return {'success': success, 'message': message, 'data': data}
+
+
+def reservation_response(barcodes: bool | list) -> dict:
+    if not barcodes:
+        return response(False, 'Could not make the reservation ...')
+    return response(True, 'Successfully made a reservation!', {'barcodes': barcodes})
+
+
+def cancel_response(success: bool) -> dict:
+    return response(success, 'Successfully made a cancelation!' if success else 'Could not make cancellation ...')
+
+
+def is_bulk_cancel(request: dict) -> bool:
+    """
+        :param request: request dictionary
+        :return: True for a cancellation of a list of barcodes ("barcodes") or of the reservations of an event ("event")
+    """
+    return request.get('action') == 'cancel' and (request.get('barcodes') is not None or (not request.get('barcode') and bool(request.get('event'))))
+
+
+def bulk_cancel_response(outcomes: bool | dict[int, bool]) -> dict:
+    if outcomes is False:
+        return response(False, 'Could not make the cancellations ...')
+    cancelled: int = sum(outcomes.values())
+    return response(
+        cancelled > 0, 'Cancelled {} of {} reservations'.format(cancelled, len(outcomes)),
+        [{'barcode': barcode, 'cancelled': outcome} for barcode, outcome in outcomes.items()]
+    )
+
+
+def listing_response(database: Database, request: dict) -> dict:
+    """
+        Answer a view request with one page of the listing, the request gives the cursor of the previous page
+        :param database: Database to read the events from
+        :param request: view request with any of the LISTING_FIELDS
+        :return: response with the data {"events": [...], "cursor": [date, id] or None after the last page}
+    """
+    try:
+        page_size: int = min(int(request.get('page_size') or EVENT_PAGE_SIZE), EVENT_MAX_PAGE_SIZE)
+        after: tuple[float, int] | None = (float(request['cursor'][0]), int(request['cursor'][1])) if request.get('cursor') else None
+        event_filter: EventFilter = EventFilter(
+            date_from=request.get('date_from'), date_to=request.get('date_to'), price_min=request.get('price_min'),
+            price_max=request.get('price_max'), min_seats=request.get('min_seats') or 1
+        )
+    except (TypeError, ValueError, IndexError, KeyError):
+        return response(False, 'Invalid page size or cursor.')
+    if page_size < 1:
+        return response(False, 'The page size must be a positive integer.')
+    page: bool | tuple[list[EventRecord], tuple[float, int] | None] = database.list_events(
+        after=after, page_size=page_size, event_filter=event_filter
+    )
+    if page is False:
+        return response(False, 'Could not list events ...')
+    events, cursor = page
+    return response(
+        True, 'Events available: ' if events or after else 'No events available to display',
+        {'events': [event._asdict() for event in events], 'cursor': list(cursor) if cursor else None}
+    )
+
+
+def history_response(database: Database, identity: Identity, request: dict) -> dict:
+    """
+        Answer an info request with one page of the reservation history, the request gives the cursor of the previous
+        page. The first page also has the seats reserved for every event.
+        :param database: Database to read the reservations from
+        :param identity: Identity of the user asking
+        :param request: info request with any of the HISTORY_FIELDS
+        :return: response with the data {"email": ..., "hashed_password": ..., "reservations": [...], "cursor": rowid or
+        None after the last page} and, for the first page, "events": [...]
+    """
+    try:
+        page_size: int = min(int(request.get('page_size') or RESERVATION_PAGE_SIZE), RESERVATION_MAX_PAGE_SIZE)
+        after: int | None = int(request['cursor']) if request.get('cursor') is not None else None
+        event: int | None = int(request['event']) if request.get('event') is not None else None
+    except (TypeError, ValueError):
+        return response(False, 'Invalid page size, cursor or event.')
+    if page_size < 1:
+        return response(False, 'The page size must be a positive integer.')
+    upcoming: bool = bool(request.get('upcoming'))
+    page: bool | tuple[list[ReservationRecord], int | None] = database.list_reservations(
+        user=identity, after=after, page_size=page_size, upcoming=upcoming, event=event
+    )
+    if page is False:
+        return response(False, 'Could not get the user information ...')
+    reservations, cursor = page
+    data: dict = {
+        'email': identity.email, 'hashed_password': identity.hashed_password,
+        'reservations': [reservation._asdict() for reservation in reservations], 'cursor': cursor
+    }
+    if after is None:
+        summary: bool | list[ReservationSummary] = database.reservation_summary(user=identity, upcoming=upcoming, event=event)
+        if summary is False:
+            return response(False, 'Could not get the user information ...')
+        data['events'] = [seats._asdict() for seats in summary]
+    return response(True, 'User information:' if reservations or after else 'There are no reservations for the user.', data)
+
+
+def stats_response(database: Database, identity: Identity, request: dict) -> dict:
+    """
+        Answer a stats request of an admin with the metrics of the Database layer
+        :param database: Database reporting to the metrics, the metrics are shared by the whole process
+        :param identity: Identity of the user asking
+        :param request: stats request, "format" is "json" (default) or "prometheus"
+        :return: response with the JSON snapshot, or the Prometheus text, as data
+    """
+    if not identity.is_admin:
+        return response(False, 'Only an admin can see the statistics.')
+    if database.metrics is None:
+        return response(False, 'The statistics are only collected by the reservation service.')
+    if request.get('format') == 'prometheus':
+        return response(True, 'Statistics:', database.metrics.prometheus())
+    return response(True, 'Statistics:', database.metrics.snapshot())
+
+
+def report_response(database: Database, identity: Identity, request: dict) -> dict:
+    """
+        Answer a report request of an admin with the sales of every event, or of the event of the request
+        :param database: Database to read the sales counters from
+        :param identity: Identity of the user asking
+        :param request: report request, optionally with an "event"
+        :return: response with {"events": [{"id", "name", "date", "price", "sold", "cancelled", "revenue", "last_sale"}, ...],
+        "totals": {"sold", "cancelled", "revenue"}} as data
+    """
+    if not identity.is_admin:
+        return response(False, 'Only an admin can see the sales report.')
+    sales: bool | list[EventSales] = database.sales_report(event=request.get('event'))
+    if sales is False:
+        return response(False, 'Could not read the sales ...')
+    return response(True, 'Sales:' if sales else 'There are no events to report.', {
+        'events': [event._asdict() for event in sales],
+        'totals': {
+            'sold': sum(event.sold for event in sales), 'cancelled': sum(event.cancelled for event in sales),
+            'revenue': sum(event.revenue for event in sales)
+        }
+    })
+
+
+def validate_request(database: Database, request: dict) -> tuple[dict | None, Identity | None]:
+    """
+        Check that a request has the fields its action needs and, except for registration, authenticate its user
+        :param database: Database used to check the credentials
+        :param request: dictionary with "user", "password", "action" and optionally "event", "seats", "barcode" and "barcodes"
+        :return: tuple with the error response (None if the request can be handled) and the Identity of the user (None
+        for a registration)
+    """
+    if request.get('action') not in ACTIONS:
+        return response(False, 'Unknown action: {}'.format(request.get('action'))), None
+    if not request.get('user') or not request.get('password'):
+        return response(False, 'A user and a password must be provided.'), None
+    if request['action'] == 'reservation' and not request.get('event'):
+        return response(False, 'An event must be given, -e X or --event X, X being an event id found after querying -a or --action view.'), None
+    if request['action'] == 'cancel' and not request.get('barcode') and not request.get('barcodes') and not request.get('event'):
+        return response(False, 'No barcode provided'), None
+    if request.get('barcodes') is not None and (not isinstance(request['barcodes'], list)
+                                                or not all(isinstance(barcode, int) for barcode in request['barcodes'])):
+        return response(False, 'The barcodes must be a list of integers.'), None
+    if request['action'] == 'register':
+        return None, None
+    identity: Identity | None = database.authenticate(user=User(user=request['user'], password=request['password']))
+    if not identity:
+        return response(False, INVALID_CREDENTIALS), None
+    return None, identity
+
+
+def handle_request(database: Database, request: dict) -> dict:
+    """
+        Run the action of a request against the database
+        :param database: Database to run the action against
+        :param request: dictionary with "user", "password", "action" and optionally "event", "seats", "barcode" and "barcodes"
+        :return: response dictionary, see response()
+    """
+    error, identity = validate_request(database=database, request=request)
+    if error:
+        return error
+
+    # the user is authenticated once, the methods get its Identity
+    match request['action']:
+        case 'register':
+            if database.register_user(user=User(user=request['user'], password=request['password'])) is True:
+                return response(True, 'Successfully registered!')
+            return response(False, 'Registration failed!')
+        case 'view' if any(request.get(field) is not None for field in LISTING_FIELDS):
+            return listing_response(database=database, request=request)
+        case 'view':
+            query_result: bool | list[dict] = database.view_events()
+            if query_result is False:
+                return response(False, 'Could not list events ...')
+            return response(True, 'Events available: ' if query_result else 'No events available to display', query_result)
+        case 'reservation':
+            return reservation_response(
+                database.make_reservation(user=identity, event=request['event'], seats=request.get('seats') or 1)
+            )
+        case 'cancel' if is_bulk_cancel(request=request):
+            return bulk_cancel_response(database.cancel_reservations(
+                user=identity, barcodes=request.get('barcodes'), event=request.get('event')
+            ))
+        case 'cancel':
+            return cancel_response(database.cancel_reservation(user=identity, barcode=request['barcode']))
+        case 'info' if any(request.get(field) is not None for field in HISTORY_FIELDS):
+            return history_response(database=database, identity=identity, request=request)
+        case 'info':
+            user_information: bool | dict = database.get_user_info(user=identity)
+            if user_information is False:
+                return response(False, 'Could not get the user information ...')
+            if isinstance(user_information['reservations'], list):
+                user_information['reservations'] = [reservation._asdict() for reservation in user_information['reservations']]
+            return response(True, 'User information:', user_information)
+        case 'tickets':
+            tickets: bool | list[dict] = database.get_ticket_status(
+                user=identity, barcodes=[request['barcode']] if request.get('barcode') else request.get('barcodes')
+            )
+            if tickets is False:
+                return response(False, 'Could not get the tickets ...')
+            return response(True, 'Tickets:' if tickets else 'There are no tickets for the user.', tickets)
+        case 'stats':
+            return stats_response(database=database, identity=identity, request=request)
+        case 'report':
+            return report_response(database=database, identity=identity, request=request)
@@ -0,0 +1,159 @@
+"""
+    Long-running reservation service.
+
+    The service keeps warm Database instances (connections, imports and logger already set up) and answers JSON requests,
+    one per line, on a local TCP or Unix socket. Every request line is a dictionary with the same fields as the
+    command line of main.py ("user", "password", "action", "event", "seats", "barcode"), every answer line is a
+    response dictionary from service.handlers.
+
+    Usage: python -m service.server [--host 127.0.0.1] [--port 8765] [--unix-socket PATH]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import pathlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from configs.config import DATABASE, SERVICE_HOST, SERVICE_PORT, SERVICE_UNIX_SOCKET, SERVICE_RESERVATION_QUEUE, \
+    SERVICE_DATABASE_THREADS
+from database.database import Database
+from database.event_catalogue import EventCatalogue
+from database.instrumentation import Metrics
+from database.reservation_queue import ReservationQueue
+from database.shards import is_sharded
+from tickets.worker import TicketWorker
+from service.handlers import handle_request, validate_request, response, reservation_response, cancel_response, \
+    is_bulk_cancel
+from user.credential_cache import CredentialCache
+from utilities.logging_util import init_logger
+
+
+class ReservationServer:
+    def __init__(self, database_path: pathlib.Path = DATABASE, use_reservation_queue: bool = SERVICE_RESERVATION_QUEUE,
+                 database_threads: int = SERVICE_DATABASE_THREADS):
+        """
+            Constructor to initialize the logger, the database worker threads and the reservation queue
+            :param database_path: path to the sqlite database file
+            :param use_reservation_queue: commit reservations and cancellations in batches through a ReservationQueue
+            :param database_threads: number of threads running database work
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.database_path: pathlib.Path = database_path
+        # statement latencies, lock waits, commits and ticket rendering of the whole service, see the stats action
+        self.metrics: Metrics = Metrics()
+        # tickets are rendered in the background, a reservation is answered as soon as it is committed
+        self.ticket_worker: TicketWorker = TicketWorker(database_path=database_path, metrics=self.metrics)
+        # the verified credentials are shared by the databases of all the threads, a user is looked up once per ttl
+        self.credential_cache: CredentialCache = CredentialCache()
+        # with shards, the seats are in the files of the shards: view requests are answered by the shards and every
+        # shard commits its reservations on its own instead of going through one reservation queue
+        sharded: bool = is_sharded(database_path=database_path)
+        # view requests are answered from memory, the reservations committed by the service keep it up to date
+        self.event_catalogue: EventCatalogue | None = None if sharded else EventCatalogue(database_path=database_path)
+        # every database thread checks out its own connection when it starts and keeps it, with WAL the readers of
+        # one thread are not blocked by the writer of another
+        self.__thread_state: threading.local = threading.local()
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=database_threads, thread_name_prefix='database', initializer=self.__init_database
+        )
+        self.reservation_queue: ReservationQueue | None = ReservationQueue(
+            database_path=database_path, ticket_worker=self.ticket_worker, event_catalogue=self.event_catalogue,
+            metrics=self.metrics
+        ) if use_reservation_queue and not sharded else None
+
+    def __init_database(self):
+        self.__thread_state.database = Database(
+            database_path=self.database_path, ticket_worker=self.ticket_worker, credential_cache=self.credential_cache,
+            event_catalogue=self.event_catalogue, metrics=self.metrics
+        )
+
+    @property
+    def database(self) -> Database:
+        """
+            Database of the current database thread
+        """
+        return self.__thread_state.database
+
+    async def __run(self, function, *arguments):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *arguments)
+
+    async def handle(self, request: dict) -> dict:
+        """
+            Answer one request, reservations and cancellations go through the reservation queue when there is one
+            :param request: request dictionary
+            :return: response dictionary
+        """
+        # a bulk cancellation is already a single transaction, it does not go through the queue
+        if self.reservation_queue is None or request.get('action') not in ('reservation', 'cancel') or is_bulk_cancel(request=request):
+            return await self.__run(lambda: handle_request(database=self.database, request=request))
+
+        error, identity = await self.__run(lambda: validate_request(database=self.database, request=request))
+        if error:
+            return error
+        if request['action'] == 'reservation':
+            return reservation_response(await asyncio.wrap_future(
+                self.reservation_queue.submit_reservation(user=identity, event=request['event'], seats=request.get('seats') or 1)
+            ))
+        return cancel_response(await asyncio.wrap_future(
+            self.reservation_queue.submit_cancellation(user=identity, barcode=request['barcode'])
+        ))
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+            Answer the requests of a client until it closes the connection
+            :return: None
+        """
+        try:
+            while line := await reader.readline():
+                try:
+                    request: dict = json.loads(line)
+                    answer: dict = await self.handle(request=request)
+                except Exception as e:
+                    self.logger.exception('Exception occurred: {}'.format(str(e)))
+                    answer: dict = response(False, 'Could not handle the request: {}'.format(str(e)))
+                writer.write(json.dumps(answer).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, unix_socket: str | None = SERVICE_UNIX_SOCKET):
+        """
+            Start listening and serve until the task is cancelled
+            :return: None
+        """
+        # create the connection before the first client arrives and render the tickets left pending by a previous run
+        await self.__run(lambda: self.ticket_worker.render_pending())
+        if unix_socket:
+            server: asyncio.AbstractServer = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            self.logger.info('Listening on {}'.format(unix_socket))
+        else:
+            server: asyncio.AbstractServer = await asyncio.start_server(self.handle_connection, host=host, port=port)
+            self.logger.info('Listening on {}:{}'.format(host, port))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.reservation_queue:
+                self.reservation_queue.close()
+            self.executor.shutdown()
+            self.ticket_worker.close()
+            if self.event_catalogue:
+                self.event_catalogue.close()
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Reservation service')
+    parser.add_argument('--host', default=SERVICE_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='port to listen on')
+    parser.add_argument('--unix-socket', default=SERVICE_UNIX_SOCKET, help='listen on a Unix socket instead of host and port')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    try:
+        asyncio.run(ReservationServer().serve(host=arguments.host, port=arguments.port, unix_socket=arguments.unix_socket))
+    except KeyboardInterrupt:
+        pass
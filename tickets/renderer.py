@@ -0,0 +1,190 @@
+"""
+    Template-cached PDF ticket rendering.
+
+    Every ticket has the same page: the labels, the lines and the geometry of the EAN-8 barcode never change, only the
+    event name, date, price, email and barcode do. The TicketRenderer computes the static parts once and, for every
+    canvas, stores the static layout as a form that each page stamps before writing the variable fields. The barcode
+    bars are drawn directly on the canvas from the EAN-8 bar patterns, without building a new widget and drawing for
+    every ticket. Only the public API of reportlab is used: the quiet zone, the height of the bars and the place of
+    the digits are read once from the drawing of a template Ean8BarcodeWidget, and benchmarks/ticket_barcode_check.py
+    compares the bars drawn with the drawing of the widget.
+"""
+import itertools
+
+from reportlab.graphics.barcode import eanbc
+from reportlab.graphics.shapes import Rect, String
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from configs.config import TICKET_ORDER_PDF
+from database.barcodes import ean8_check_digit
+from utilities.utils import convert_timestamp
+
+LAYOUT_FORM: str = 'ticket_layout'
+BARCODE_ORIGIN: tuple[float, float] = (15, 555)  # where generate_pdf draws the barcode drawing
+# EAN-8 bar patterns of the digits ("1" is a bar, "0" a space): the left half is in the L code, the right half in the
+# R code, between the start, center and end guards
+LEFT_CODES: tuple[str, ...] = ('0001101', '0011001', '0010011', '0111101', '0100011', '0110001', '0101111', '0111011', '0110111', '0001011')
+RIGHT_CODES: tuple[str, ...] = ('1110010', '1100110', '1101100', '1000010', '1011100', '1001110', '1010000', '1000100', '1001000', '1110100')
+EDGE_GUARD: str = '101'
+CENTER_GUARD: str = '01010'
+
+
+def barcode_digits(barcode: int) -> str:
+    """
+        :return: the 8 digits printed under the barcode, the widget keeps the first 7 digits and computes the check digit
+    """
+    value: str = str(barcode).zfill(8)[:7]
+    return value + str(ean8_check_digit(int(value)))
+
+
+class TicketRenderer:
+    def __init__(self):
+        """
+            Constructor to compute the geometry of the barcode once, from the drawing of a template widget with the
+            same defaults as the one used by utilities.utils.generate_pdf
+        """
+        template: eanbc.Ean8BarcodeWidget = eanbc.Ean8BarcodeWidget('0000000')
+        self.__bar_width: float = template.barWidth
+        self.__bar_height: float = template.barHeight
+        self.__font_name: str = template.fontName
+        self.__font_size: float = template.fontSize
+        shapes: list = template.draw().contents
+        # the first rectangle is the background, the first bar is the start guard after the quiet zone
+        bars: list[Rect] = [shape for shape in shapes if isinstance(shape, Rect)][1:]
+        self.__left_quiet: int = round(bars[0].x / self.__bar_width)
+        # the bars of the digits stop above the text, the guards go down to the bottom
+        self.__text_height: float = max(bar.y for bar in bars)
+        self.__text: list[tuple[float, float]] = [(string.x, string.y) for string in shapes if isinstance(string, String)]
+        guards: str = EDGE_GUARD + '0' * 28 + CENTER_GUARD + '0' * 28 + EDGE_GUARD
+        self.__short_bars: tuple[bool, ...] = (False, ) * self.__left_quiet + tuple(module == '0' for module in guards)
+
+    @staticmethod
+    def signal(digits: str) -> str:
+        """
+            Bar pattern of the 8 digits of a barcode, without the quiet zone
+        """
+        return ''.join(itertools.chain(
+            (EDGE_GUARD, ), (LEFT_CODES[int(digit)] for digit in digits[:4]),
+            (CENTER_GUARD, ), (RIGHT_CODES[int(digit)] for digit in digits[4:]), (EDGE_GUARD, )
+        ))
+
+    def barcode_shapes(self, barcode: int) -> tuple[list[tuple[float, float, float, float]], list[tuple[float, float, str]]]:
+        """
+            Shapes of the barcode relative to its origin, consecutive bars of the same height are one rectangle
+            :return: tuple with the (x, y, width, height) of the bars and the (x, y, text) of the two halves of the digits
+        """
+        digits: str = barcode_digits(barcode=barcode)
+        rects: list[tuple[float, float, float, float]] = []
+        position: int = self.__left_quiet
+        for bar, group in itertools.groupby(
+            enumerate(self.signal(digits=digits), start=self.__left_quiet), key=lambda item: (item[1], self.__short_bars[item[0]])
+        ):
+            length: int = len(list(group))
+            if bar[0] == '1':
+                offset: float = self.__text_height if bar[1] else 0
+                rects.append((position * self.__bar_width, offset, length * self.__bar_width, self.__bar_height - offset))
+            position += length
+        return rects, [(x, y, text) for (x, y), text in zip(self.__text, (digits[:4], digits[4:]))]
+
+    def __draw_barcode(self, canv: canvas.Canvas, barcode: int):
+        """
+            Draw the EAN-8 barcode like Ean8BarcodeWidget does
+        """
+        rects, texts = self.barcode_shapes(barcode=barcode)
+        x0, y0 = BARCODE_ORIGIN
+        path = canv.beginPath()
+        for x, y, width, height in rects:
+            path.rect(x0 + x, y0 + y, width, height)
+        canv.drawPath(path, stroke=0, fill=1)
+
+        canv.setFont(self.__font_name, self.__font_size)
+        for x, y, text in texts:
+            canv.drawCentredString(x0 + x, y0 + y, text)
+
+    @staticmethod
+    def __define_layout(canv: canvas.Canvas):
+        """
+            Store the static part of the page in the canvas, once per document
+        """
+        canv.beginForm(LAYOUT_FORM)
+        canv.setLineWidth(.3)
+        canv.setFont('Helvetica', 12)
+        canv.drawString(30, 750, 'RESERVATION DOCUMENT')
+        canv.line(480, 747, 580, 747)
+        canv.drawString(275, 725, "PRICE:")
+        canv.line(378, 723, 580, 723)
+        canv.drawString(30, 703, 'EVENT:')
+        canv.line(120, 700, 580, 700)
+        canv.drawString(30, 650, 'EMAIL:')
+        canv.line(120, 645, 580, 645)
+        canv.endForm()
+
+    def __draw_page(self, canv: canvas.Canvas, ticket: dict):
+        """
+            Stamp the layout and write the variable fields of a ticket on the current page
+        """
+        canv.doForm(LAYOUT_FORM)
+        canv.setFont('Helvetica', 12)
+        canv.drawString(500, 750, "{}".format(convert_timestamp(ticket['date'])))
+        canv.drawString(500, 725, "{}".format(ticket['price']))
+        canv.drawString(120, 703, "{}".format(ticket['name']))
+        canv.drawString(120, 650, "{}".format(ticket['email']))
+        self.__draw_barcode(canv=canv, barcode=ticket['barcode'])
+
+    def render(self, ticket: dict, pdf_path: str | None = None) -> str:
+        """
+            Render a single ticket, same page and same file name as utilities.utils.generate_pdf
+            :param ticket: dictionary with the barcode, name, date and price of the event and the email of the user
+            :param pdf_path: where to write the pdf, defaults to ./pdf_reservations/<barcode>_<date>_<email>.pdf
+            :return: path of the pdf created
+        """
+        return self.render_order(tickets=[ticket], pdf_path=pdf_path)
+
+    def render_order(self, tickets: list[dict], pdf_path: str | None = None) -> str:
+        """
+            Render the tickets of an order as one pdf with a page per ticket
+            :param tickets: list of ticket dictionaries, see render()
+            :param pdf_path: where to write the pdf, defaults to the file name of the first ticket
+            :return: path of the pdf created
+        """
+        first: dict = tickets[0]
+        pdf_path: str = pdf_path or "./pdf_reservations/{}_{}_{}.pdf".format(first['barcode'], first['date'], first['email'])
+        canv: canvas.Canvas = canvas.Canvas(pdf_path, pagesize=letter)
+        self.__define_layout(canv=canv)
+        for ticket in tickets:
+            self.__draw_page(canv=canv, ticket=ticket)
+            canv.showPage()
+        canv.save()
+        return pdf_path
+
+
+# one renderer per process, the ticket worker processes keep it between tickets
+_renderer: TicketRenderer | None = None
+
+
+def render_document(tickets: list[dict]) -> str:
+    """
+        Render one pdf with the given tickets, runs in the ticket worker processes so it only takes picklable values
+        :param tickets: list of dictionaries with the barcode, name, date and price of the event and the email of the user
+        :return: path of the pdf created
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = TicketRenderer()
+    return _renderer.render_order(tickets=tickets)
+
+
+def split_into_documents(tickets: list[dict], one_per_order: bool = TICKET_ORDER_PDF) -> list[list[dict]]:
+    """
+        Decide which tickets are rendered in the same pdf
+        :param tickets: list of ticket dictionaries
+        :param one_per_order: put the tickets of the same user for the same event in one pdf, otherwise one pdf per ticket
+        :return: list of documents, every document is a list of tickets
+    """
+    if not one_per_order:
+        return [[ticket] for ticket in tickets]
+    orders: dict[tuple, list[dict]] = {}
+    for ticket in tickets:
+        orders.setdefault((ticket['email'], ticket['name'], ticket['date']), []).append(ticket)
+    return list(orders.values())
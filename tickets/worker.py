@@ -0,0 +1,138 @@
+"""
+    Background rendering of PDF tickets.
+
+    make_reservation stores a pending job for every barcode in the ticket_jobs table in the same transaction as the
+    reservation. A TicketWorker renders the jobs in a process pool, so the reservation returns as soon as it is
+    committed, and records the outcome of every job. Jobs left pending (or stuck rendering) by a process that stopped
+    are picked up again by render_pending. With shards, the jobs are claimed and finished in the shard holding their
+    reservations.
+
+    Usage, to render the tickets of reservations made without the service: python -m tickets.worker
+"""
+import logging
+import pathlib
+import threading
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from configs.config import DATABASE, TICKET_WORKER_PROCESSES, TICKET_WORKER_POLL_INTERVAL
+from database.database import Database
+from database.instrumentation import Metrics
+from utilities.logging_util import init_logger
+from tickets.renderer import render_document, split_into_documents
+
+
+def render_document_timed(tickets: list[dict]) -> tuple[str, float]:
+    """
+        Render a pdf in a process of the pool and measure the time it took there, without the time spent waiting
+        :return: tuple with the path of the pdf and the seconds taken to render it
+    """
+    start: float = time.perf_counter()
+    pdf_path: str = render_document(tickets=tickets)
+    return pdf_path, time.perf_counter() - start
+
+
+class TicketWorker:
+    def __init__(self, database_path: pathlib.Path = DATABASE, processes: int = TICKET_WORKER_PROCESSES,
+                 metrics: Metrics | None = None):
+        """
+            Constructor to initialize the logger, the process pool and the connection used for the job table
+            :param database_path: path to the sqlite database file
+            :param processes: number of processes rendering tickets
+            :param metrics: metrics the rendering time of the pdfs is reported to
+        """
+        self.logger: logging.Logger = init_logger(type(self).__name__)
+        self.executor: ProcessPoolExecutor = ProcessPoolExecutor(max_workers=processes)
+        self.metrics: Metrics | None = metrics
+        # the jobs are claimed by the submitting threads and finished by the thread of the pool calling back, so the
+        # connection, and those of the shards opened through it, are shared behind a lock
+        self.database: Database = Database(database_path=database_path, metrics=metrics)
+        self.__lock: threading.Lock = threading.Lock()
+        self.__in_flight: set[Future] = set()
+
+    def submit(self, barcodes: list) -> int:
+        """
+            Render the tickets of the given barcodes in the background
+            :param barcodes: barcodes of committed reservations
+            :return: number of tickets submitted
+        """
+        with self.__lock:
+            claimed: list[tuple[Database, list[dict]]] = [
+                (database, database._claim_ticket_jobs(barcodes=held))
+                for database, held in self.database._ticket_databases(barcodes=barcodes)
+            ]
+        return sum(self.__render(database=database, tickets=tickets) for database, tickets in claimed)
+
+    def render_pending(self, limit: int = 100) -> int:
+        """
+            Render the tickets still pending, e.g. of reservations made while no worker was running
+            :param limit: maximum number of tickets submitted
+            :return: number of tickets submitted
+        """
+        with self.__lock:
+            databases: list[Database] = [database for database, _ in self.database._ticket_databases()]
+        submitted: int = 0
+        for database in databases:
+            if submitted >= limit:
+                break
+            with self.__lock:
+                tickets: list[dict] = database._claim_ticket_jobs(limit=limit - submitted)
+            submitted += self.__render(database=database, tickets=tickets)
+        return submitted
+
+    def __render(self, database: Database, tickets: list[dict]) -> int:
+        """
+            Send claimed tickets to the process pool, one task per pdf
+            :param database: Database the tickets were claimed from, the database or a shard
+            :return: number of tickets submitted
+        """
+        for document in split_into_documents(tickets=tickets):
+            future: Future = self.executor.submit(render_document_timed, document)
+            self.__in_flight.add(future)
+            barcodes: list[int] = [ticket['barcode'] for ticket in document]
+            future.add_done_callback(lambda done, barcodes=barcodes: self.__finish(database=database, barcodes=barcodes, future=done))
+        return len(tickets)
+
+    def __finish(self, database: Database, barcodes: list[int], future: Future):
+        """
+            Record the outcome of a rendered pdf, called by the process pool when the pdf is done
+            :return: None
+        """
+        self.__in_flight.discard(future)
+        error: BaseException | None = future.exception()
+        if error:
+            self.logger.error('Could not render the tickets {}: {}'.format(barcodes, str(error)))
+        pdf_path: str | None = None
+        if not error:
+            pdf_path, seconds = future.result()
+            if self.metrics is not None:
+                self.metrics.observe(name='ticket_render', seconds=seconds)
+        with self.__lock:
+            for barcode in barcodes:
+                database._finish_ticket_job(barcode=barcode, pdf_path=pdf_path, error=str(error) if error else None)
+
+    def pending(self) -> int:
+        """
+            :return: number of tickets submitted and not rendered yet
+        """
+        return len(self.__in_flight)
+
+    def close(self, wait: bool = True):
+        """
+            Stop the process pool
+            :param wait: wait for the tickets already submitted, otherwise they stay claimed and are rendered again once
+            they are stale
+            :return: None
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+if __name__ == '__main__':
+    worker: TicketWorker = TicketWorker()
+    try:
+        while True:
+            worker.render_pending()
+            time.sleep(TICKET_WORKER_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        worker.close()
@@ -0,0 +1,74 @@
+import hmac
+import threading
+import time
+
+from collections import OrderedDict
+
+from configs.config import CREDENTIAL_CACHE_SIZE, CREDENTIAL_CACHE_TTL
+from user.identity import Identity
+
+
+class CredentialCache:
+    """
+        Bounded cache of verified credentials, shared by the Database instances of a long-running process.
+        An entry is the Identity of an email along with the hashed password it was verified with, it expires ttl
+        seconds after the verification and the least recently used entries are dropped beyond max_entries. The
+        Database of the process invalidates the entry of an email when it registers it or changes its password, a
+        change made by another process is seen once the entry expires.
+    """
+    def __init__(self, max_entries: int = CREDENTIAL_CACHE_SIZE, ttl: float = CREDENTIAL_CACHE_TTL):
+        """
+            :param max_entries: maximum number of emails in the cache
+            :param ttl: seconds a verification is trusted
+        """
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.__entries: OrderedDict[str, tuple[Identity, float]] = OrderedDict()
+        self.__lock: threading.Lock = threading.Lock()
+
+    def get(self, email: str, hashed_password: str) -> Identity | None:
+        """
+            :param email: email of the user
+            :param hashed_password: hashed password given by the user
+            :return: the Identity if these credentials were verified less than ttl seconds ago, None otherwise
+        """
+        with self.__lock:
+            entry: tuple[Identity, float] | None = self.__entries.get(email)
+            if entry is None:
+                return None
+            identity, expires = entry
+            if expires <= time.monotonic():
+                del self.__entries[email]
+                return None
+            if not hmac.compare_digest(identity.hashed_password, hashed_password):
+                return None
+            self.__entries.move_to_end(email)
+            return identity
+
+    def put(self, identity: Identity):
+        """
+            Remember credentials that were just verified
+            :param identity: Identity of the verified user
+            :return: None
+        """
+        with self.__lock:
+            self.__entries[identity.email] = (identity, time.monotonic() + self.ttl)
+            self.__entries.move_to_end(identity.email)
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        """
+            Forget the credentials of an email, e.g. after its password changed
+            :param email: email of the user
+            :return: None
+        """
+        with self.__lock:
+            self.__entries.pop(email, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Identity:
+    """
+        A user whose credentials were verified by Database.authenticate.
+        The Database methods taking a User also take an Identity and then use its user_id instead of looking the user
+        up again. It has the same getters as User.
+    """
+    user_id: int
+    email: str
+    hashed_password: str
+    is_admin: bool = False
+
+    def get_user(self) -> str:
+        return self.email
+
+    def get_hashed_password(self) -> str:
+        return self.hashed_password
@@ -1,24 +1,123 @@
+"""
+    Logging of the application.
+
+    The handlers are configured once per process, the first time a logger is asked for: the loggers only hand their
+    records to a queue and a listener thread formats and writes them, so logging costs the caller little more than a
+    put on the queue and nothing for the records below the level. The level and the format ("text" or "json", one
+    object per line) come from configs/config.py or the SPECTACOLE_LOG_LEVEL and SPECTACOLE_LOG_FORMAT environment
+    variables. The records still queued are written when the process exits.
+"""
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
 
+from typing import IO
 
-def init_logger(logger_name: str) -> logging.Logger:
+from configs.config import LOG_LEVEL, LOG_FORMAT
+
+TEXT_FORMAT: str = '[%(asctime)s] - [%(levelname)s] * [%(name)s] * [%(module)s -- %(funcName)s -- %(lineno)d] --> %(message)s'
+
+_lock: threading.Lock = threading.Lock()
+_handler: logging.Handler | None = None
+_listener: logging.handlers.QueueListener | None = None
+_level: int = logging.INFO
+
+
+class JsonFormatter(logging.Formatter):
     """
-        Create a logger with the given name that logs messages at the console and then return it for future use.
-        :param logger_name: string value representing the logger name
-        :return: logging.Logger instance
+        Formats a record as one JSON object per line
     """
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict = {
+            'time': self.formatTime(record), 'level': record.levelname, 'logger': record.name, 'module': record.module,
+            'function': record.funcName, 'line': record.lineno, 'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+        Queue handler leaving the formatting to the listener, the records never leave the process
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT, stream: IO[str] | None = None):
+    """
+        Set up the queue and the listener writing the records, only the first call of a process has an effect
+        :param level: name of the lowest level logged, e.g. "DEBUG" or "WARNING"
+        :param log_format: "text" or "json"
+        :param stream: stream the records are written to, the standard error by default
+        :return: None
+    """
+    global _handler, _listener, _level
+    with _lock:
+        if _handler is not None:
+            return
+        level_number: int | str = logging.getLevelName(level.upper())
+        _level = level_number if isinstance(level_number, int) else logging.INFO
+        stream_handler: logging.StreamHandler = logging.StreamHandler(stream=stream or sys.stderr)
+        stream_handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(fmt=TEXT_FORMAT))
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, stream_handler)
+        _listener.start()
+        # the loggers of the application propagate to the root logger, the level is checked by each of them
+        _handler = _QueueHandler(records)
+        logging.getLogger().addHandler(_handler)
+
+
+def shutdown_logging():
+    """
+        Write the records still queued and stop the listener, logging is set up again by the next init_logger
+        :return: None
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _handler, _listener = None, None
 
-    logger: logging.Logger = logging.getLogger(logger_name)
-    logger.setLevel(level=logging.DEBUG)
 
-    formatter: logging.Formatter = logging.Formatter(
-        fmt='[%(asctime)s] - [%(levelname)s] * [%(name)s] * [%(module)s -- %(funcName)s -- %(lineno)d] --> %(message)s'
-    )
+def _forget_after_fork():
+    """
+        The listener thread does not exist in a forked child, the child sets up its own logging
+        :return: None
+    """
+    global _lock, _handler, _listener
+    _lock = threading.Lock()
+    if _handler is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _handler, _listener = None, None
+    configure_logging()
+    if 'multiprocessing' in sys.modules:
+        # the processes of multiprocessing end without running the atexit functions, only its finalizers
+        from multiprocessing.util import Finalize
+        Finalize(None, shutdown_logging, exitpriority=0)
 
-    stream_handler: logging.StreamHandler = logging.StreamHandler()
-    stream_handler.setLevel(logging.DEBUG)
-    stream_handler.setFormatter(formatter)
 
-    logger.addHandler(hdlr=stream_handler)
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_after_fork)
 
+
+def init_logger(logger_name: str) -> logging.Logger:
+    """
+        Get the logger with the given name, logging is set up the first time
+        :param logger_name: string value representing the logger name
+        :return: logging.Logger instance
+    """
+    configure_logging()
+    logger: logging.Logger = logging.getLogger(logger_name)
+    logger.setLevel(level=_level)
     return logger
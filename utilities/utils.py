@@ -3,12 +3,6 @@ import datetime
 
 from argparse import ArgumentTypeError
 from configs.config import EMAIL_REGEX, DATE_FORMAT
-from random import randint
-from reportlab.graphics.barcode import eanbc
-from reportlab.graphics.shapes import Drawing
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.graphics import renderPDF
 
 
 def check_email(potential_email: str) -> str:
@@ -40,18 +34,33 @@ def check_positive(number: str) -> int:
     return int_number
 
 
-def generate_barcodes(number_of_barcodes: int) -> list:
+def check_date(date_string: str) -> float:
     """
-        Generate barcodes
-        :param number_of_barcodes: nr of barcodes to generate
-        :return: list of barcodes
+        Function that checks if a string is a date in the configured format, DATE_FORMAT.
+
+        :param date_string: string that represents a date
+        :return: the date as a timestamp or raises an Exception -> argparse.ArgumentTypeError if not
+    """
+    try:
+        return convert_to_timestamp(date_string=date_string)
+    except ValueError:
+        raise ArgumentTypeError('{} is not a valid date, expected format: {}'.format(date_string, DATE_FORMAT))
+
+
+def check_price(price: str) -> float:
+    """
+        Function that checks if a string value is a valid price, a number that is not negative.
+
+        :param price: string that represents a price
+        :return: float cast value or raises an Exception -> argparse.ArgumentTypeError if not
     """
-    barcodes = set()
-    while len(barcodes) < number_of_barcodes:
-        range_start = 10 ** 7
-        range_end = (10 ** 8) - 1
-        barcodes.add(randint(range_start, range_end))
-    return list(barcodes)
+    try:
+        float_price = float(price)
+    except ValueError:
+        raise ArgumentTypeError('{} is not a valid price.'.format(price))
+    if float_price < 0:
+        raise ArgumentTypeError('{} must not be negative.'.format(price))
+    return float_price
 
 
 def convert_timestamp(timestamp: float) -> str:
@@ -72,7 +81,7 @@ def convert_to_timestamp(date_string: str) -> float:
     return datetime.datetime.strptime(date_string, DATE_FORMAT).timestamp()
 
 
-def generate_pdf(event_name: str, date: float, price: float, barcode: int, email: str):
+def generate_pdf(event_name: str, date: float, price: float, barcode: int, email: str) -> str:
     """
         Function to generate a pdf with the given fields, event name, date, price, barcode and email
 
@@ -81,9 +90,17 @@ def generate_pdf(event_name: str, date: float, price: float, barcode: int, email
         :param price: price in float
         :param barcode: barcode generated value
         :param email: email of the user
-        :return: None, creates in ./pdf_reservations/ the given pdf below
+        :return: path of the pdf created in ./pdf_reservations/
     """
-    canv = canvas.Canvas("./pdf_reservations/{}_{}_{}.pdf".format(barcode, date, email), pagesize=letter)
+    # reportlab takes longer to import than most commands take to run, only the commands rendering a pdf load it
+    from reportlab.graphics.barcode import eanbc
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    from reportlab.graphics import renderPDF
+
+    pdf_path: str = "./pdf_reservations/{}_{}_{}.pdf".format(barcode, date, email)
+    canv = canvas.Canvas(pdf_path, pagesize=letter)
     canv.setLineWidth(.3)
     canv.setFont('Helvetica', 12)
     canv.drawString(30, 750, 'RESERVATION DOCUMENT')
@@ -107,4 +124,5 @@ def generate_pdf(event_name: str, date: float, price: float, barcode: int, email
     d.add(barcode_eanbc8)
     renderPDF.draw(d, canv, 15, 555)
     canv.save()
+    return pdf_path
 